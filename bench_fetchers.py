@@ -0,0 +1,144 @@
+"""
+Confronta i backend di fetch Hades (HTTP puro vs Chromium) contro un
+server Hades finto in locale: richieste/secondo e RSS del processo
+(incluso Chromium e i suoi figli).
+
+    python bench_fetchers.py [--requests 500] [--concurrency 8] [--backend http|chromium|all]
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from scraper.fetchers import HttpFetcher, PlaywrightFetcher, httpx
+from scraper.hades_session import HadesSession
+
+
+class StubHadesHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        qs = parse_qs(urlparse(self.path).query)
+        start = int(qs.get("start", ["0"])[0])
+        lim = int(qs.get("lim", ["35"])[0])
+        items = [
+            {
+                "urn": f"id:ad:stub:{start + i}",
+                "subject": f"Annuncio {start + i}",
+                "body": "descrizione " * 20,
+                "features": [{"uri": "/price", "values": [{"key": str(10 + i), "value": f"{10 + i} €"}]}],
+            }
+            for i in range(lim)
+        ]
+        body = json.dumps({"count_all": 100000, "ads": items}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHadesHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1/search/items"
+
+
+def _rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _children(pid):
+    out = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                out.extend(int(c) for c in f.read().split())
+    except OSError:
+        pass
+    return out
+
+
+def tree_rss_mb():
+    """RSS del processo corrente più tutti i discendenti (Linux)."""
+    total, stack = 0, [os.getpid()]
+    while stack:
+        pid = stack.pop()
+        total += _rss_kb(pid)
+        stack.extend(_children(pid))
+    return total / 1024
+
+
+async def drive(fetcher, n_requests, concurrency, lim=35):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            r = await fetcher.get({"q": "bench", "start": i * lim, "lim": lim, "sort": "datedesc"})
+            assert r.ok, r.status
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n_requests)))
+    return time.perf_counter() - t0
+
+
+async def bench_http(url, n_requests, concurrency):
+    if httpx is None:
+        print("http: httpx non installato, salto")
+        return
+    client = httpx.AsyncClient(limits=httpx.Limits(max_connections=concurrency))
+    try:
+        elapsed = await drive(HttpFetcher(client, url), n_requests, concurrency)
+        print(f"http:     {n_requests / elapsed:8.1f} req/s  rss {tree_rss_mb():7.1f} MB")
+    finally:
+        await client.aclose()
+
+
+async def bench_chromium(url, n_requests, concurrency):
+    from playwright.async_api import async_playwright
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        try:
+            context = await browser.new_context(locale="it-IT")
+            fetcher = await PlaywrightFetcher.create(context, HadesSession([], {}), url)
+            elapsed = await drive(fetcher, n_requests, concurrency)
+            print(f"chromium: {n_requests / elapsed:8.1f} req/s  rss {tree_rss_mb():7.1f} MB")
+        finally:
+            await browser.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--backend", choices=["http", "chromium", "all"], default="all")
+    args = parser.parse_args()
+
+    server, url = start_stub_server()
+    print(f"Stub Hades on {url}, baseline rss {tree_rss_mb():.1f} MB\n")
+    try:
+        if args.backend in ("http", "all"):
+            asyncio.run(bench_http(url, args.requests, args.concurrency))
+        if args.backend in ("chromium", "all"):
+            asyncio.run(bench_chromium(url, args.requests, args.concurrency))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
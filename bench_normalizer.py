@@ -0,0 +1,162 @@
+"""
+Micro-benchmark del normalizzatore annunci: il loop originale di run_search
+(feature_first/feature_value ripetuti, re.findall non compilata, import
+dentro il loop) contro scraper.normalizer, su payload sintetici.
+
+    python bench_normalizer.py [--ads 10000] [--repeat 3]
+"""
+import argparse
+import random
+import re
+import time
+
+from scraper.normalizer import first_image_url_browser, normalize_page, normalize_url, safe_get
+
+
+def make_ads(n, seed=42):
+    rnd = random.Random(seed)
+    words = ["iphone", "bici", "divano", "monitor", "graffi", "leggeri", "come nuovo", "non funziona",
+             "manca", "pezzo", "ottimo", "stato", "usato", "spedizione", "tavolo", "lampada"]
+    ads = []
+    for i in range(n):
+        price = rnd.randint(1, 5000)
+        features = [
+            {"uri": f"/extra_{k}", "values": [{"key": str(k), "value": f"v{k}"}]} for k in range(rnd.randint(4, 12))
+        ]
+        features += [
+            {"uri": "/price", "values": [{"key": str(price), "value": f"{price:,} €".replace(",", ".")}]},
+            {"uri": "/item_condition", "values": [{"key": "20", "value": "Usato - Come nuovo"}]},
+            {"uri": "/item_shipping_type", "values": [{"key": "1", "value": "TuttoSubito"}]},
+            {"uri": "/item_shippable", "values": [{"key": "true", "value": "true"}]},
+        ]
+        if rnd.random() < 0.5:
+            features.append({"uri": "/item_shipping_cost_tuttosubito", "values": [{"key": "6,90", "value": "6,90 €"}]})
+        rnd.shuffle(features)
+        ads.append({
+            "urn": f"id:ad:{i}",
+            "subject": " ".join(rnd.choices(words, k=5)),
+            "body": " ".join(rnd.choices(words, k=60)),
+            "dates": {"display": "Oggi", "display_iso8601": "2026-01-02T10:00:00+01:00"},
+            "category": {"value": "Informatica"},
+            "geo": {"region": {"value": "Lazio"}, "city": {"value": "Roma"}, "town": {"value": "Roma"}},
+            "features": features,
+            "urls": {"default": f"https://www.subito.it/annuncio/{i}.htm"},
+            "images": [{"base_url": f"https://s.sbito.it/img/{i}"}],
+            "favorites": rnd.randint(0, 50),
+        })
+    return ads
+
+
+# --- the original per-ad loop from run_search, kept verbatim as the baseline ---
+
+def legacy_feature_first(ad, uri):
+    feats = ad.get("features")
+    if not isinstance(feats, list):
+        return {}
+    for f in feats:
+        if isinstance(f, dict) and f.get("uri") == uri:
+            vals = f.get("values")
+            if isinstance(vals, list) and vals:
+                v0 = vals[0]
+                return v0 if isinstance(v0, dict) else {}
+    return {}
+
+
+def legacy_feature_value(ad, uri):
+    v0 = legacy_feature_first(ad, uri)
+    if not v0:
+        return ""
+    return str(v0.get("value") or v0.get("key") or "")
+
+
+def legacy_parse_number(value):
+    if value is None:
+        return None
+    s = str(value).strip()
+    if not s:
+        return None
+    m = re.findall(r"[-]?\d[\d\.\,]*", s)
+    if not m:
+        return None
+    num = m[0]
+    if "." in num and "," in num:
+        num = num.replace(".", "").replace(",", ".")
+    else:
+        if "," in num:
+            num = num.replace(",", ".")
+    try:
+        return float(num)
+    except ValueError:
+        return None
+
+
+def legacy_normalize(all_ads):
+    items_list = []
+    for ad in all_ads:
+        id_annuncio = ad.get("urn") or ""
+        nome = ad.get("subject") or ad.get("title") or ""
+        description = ad.get("body") or ""
+        prezzo_str = legacy_feature_value(ad, "/price")
+        prezzo_num = legacy_parse_number(legacy_feature_first(ad, "/price").get("key") or prezzo_str)
+        data_pub = safe_get(ad, "dates.display", "")
+        data_pub_iso_str = safe_get(ad, "dates.display_iso8601", "")
+        categoria = safe_get(ad, "category.value", "")
+        regione = safe_get(ad, "geo.region.value", "")
+        provincia = safe_get(ad, "geo.city.value", "")
+        comune = safe_get(ad, "geo.town.value", "")
+        condizione = legacy_feature_value(ad, "/item_condition")
+        spedizione_tipo = legacy_feature_value(ad, "/item_shipping_type")
+        costo_sped_str = legacy_feature_value(ad, "/item_shipping_cost_tuttosubito")
+        costo_sped_num = legacy_parse_number(legacy_feature_first(ad, "/item_shipping_cost_tuttosubito").get("key") or costo_sped_str)
+        spedibile_val = legacy_feature_value(ad, "/item_shippable")
+        spedibile = (spedibile_val.lower() == 'true')
+        if costo_sped_num is not None:
+            spedibile = True
+        likes_val = 0
+        if "favorites" in ad:
+            try:
+                likes_val = int(ad["favorites"])
+            except:
+                pass
+        url = normalize_url(ad)
+        img_url = first_image_url_browser(ad)
+        from scraper.text_flags import detect_defects
+        defects = detect_defects(nome, description)
+        items_list.append({
+            'subito_id': id_annuncio, 'title': nome, 'price_str': prezzo_str, 'price_num': prezzo_num,
+            'date_pub': data_pub, 'date_pub_iso': data_pub_iso_str, 'category': categoria, 'region': regione,
+            'province': provincia, 'town': comune, 'condition': condizione, 'shipping_type': spedizione_tipo,
+            'shipping_cost': costo_sped_num, 'shippable': spedibile, 'likes_count': likes_val,
+            'image_url': img_url, 'url': url, 'description': description,
+            'defect_flag': defects['flag'], 'defect_reason': defects['reason'],
+        })
+    return items_list
+
+
+def best_of(fn, ads, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(ads)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ads", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    ads = make_ads(args.ads)
+    assert legacy_normalize(ads) == normalize_page(ads), "normalizer output differs from the legacy loop"
+
+    before = best_of(legacy_normalize, ads, args.repeat)
+    after = best_of(normalize_page, ads, args.repeat)
+    print(f"{args.ads} ads, best of {args.repeat}")
+    print(f"before (run_search loop): {args.ads / before:10.0f} ads/s")
+    print(f"after  (normalizer):      {args.ads / after:10.0f} ads/s  ({before / after:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Confronto tra il risultato di una ricerca come lista di dict JSON (il
+formato salvato in sessione) e lo snapshot colonnare di scraper.snapshot:
+dimensione, tempo di caricamento (con e senza le descrizioni), accesso per
+riga e ordinamento.
+
+    python bench_snapshot.py [--ads 10000] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import time
+import zlib
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "subitissimo_project.settings")
+django.setup()
+
+from bench_normalizer import make_ads  # noqa: E402
+from scraper.normalizer import normalize_page  # noqa: E402
+from scraper.snapshot import Snapshot, snapshot_page  # noqa: E402
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ads", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    items = normalize_page(make_ads(args.ads))
+    as_json = json.dumps(items).encode()
+    as_json_z = zlib.compress(as_json)
+    for i, item in enumerate(items):
+        item['id'] = i + 1
+    light, heavy = Snapshot.from_rows(items).to_bytes()
+    snapshot = Snapshot.from_bytes(light, lambda: heavy)
+
+    # Same rows back (dates come back as datetimes)
+    for i in (0, len(items) // 2, len(items) - 1):
+        row = snapshot.row(i)
+        assert row['subito_id'] == items[i]['subito_id'] and row['price_num'] == items[i]['price_num']
+
+    print(f"{args.ads} ads, best of {args.repeat}")
+    print(f"{'':22}{'bytes':>12}{'load ms':>10}")
+    print(f"{'session JSON':22}{len(as_json):12d}{best_of(lambda: json.loads(as_json), args.repeat) * 1000:10.1f}")
+    print(f"{'JSON + zlib':22}{len(as_json_z):12d}"
+          f"{best_of(lambda: json.loads(zlib.decompress(as_json_z)), args.repeat) * 1000:10.1f}")
+    print(f"{'columnar snapshot':22}{len(light) + len(heavy):12d}"
+          f"{best_of(lambda: Snapshot.from_bytes(light, lambda: heavy).row(0), args.repeat) * 1000:10.1f}")
+    print(f"{'  light columns only':22}{len(light):12d}"
+          f"{best_of(lambda: Snapshot.from_bytes(light).records([0]), args.repeat) * 1000:10.1f}")
+
+    page = range(len(items) // 2, len(items) // 2 + 50)
+    print(f"50-row page from snapshot: {best_of(lambda: snapshot.rows(page), args.repeat) * 1000:.2f} ms")
+    print(f"50 ResultRow records:      {best_of(lambda: snapshot.records(page), args.repeat) * 1000:.2f} ms")
+    print(f"argsort price_num:         {best_of(lambda: snapshot.argsort('price_num'), args.repeat) * 1000:.1f} ms")
+    print(f"argsort date_pub_iso desc: "
+          f"{best_of(lambda: snapshot.argsort('date_pub_iso', descending=True), args.repeat) * 1000:.1f} ms")
+    # The stored permutations make a sorted page a slice
+    stored = Snapshot.from_bytes(light, lambda: heavy)
+    print(f"page by price (stored):    {best_of(lambda: snapshot_page(stored, 'price_asc'), args.repeat) * 1000:.2f} ms")
+    half = int('10' * (args.ads // 2), 2)
+    print(f"page, half filtered out:   "
+          f"{best_of(lambda: snapshot_page(stored, 'date_desc', mask=half), args.repeat) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Filtro "entro X km" su punti sintetici sparsi per l'Italia: scansione di
+tutti i punti con la haversine in Python contro scraper.spatial.GridIndex
+(celle candidate + haversine vettoriale, con numpy se installato).
+
+    python bench_spatial.py [--points 20000] [--radius 30] [--repeat 5]
+"""
+import argparse
+import math
+import random
+import time
+from array import array
+
+from scraper import spatial
+from scraper.spatial import GridIndex, haversine_km
+
+BOLOGNA = (44.4949, 11.3426)
+
+
+def make_points(n, seed=7):
+    rnd = random.Random(seed)
+    lats = array('d', (rnd.uniform(37.0, 46.5) for _ in range(n)))
+    lons = array('d', (rnd.uniform(7.0, 18.5) for _ in range(n)))
+    return lats, lons
+
+
+def brute_force(lats, lons, lat, lon, radius):
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    found = {}
+    for i, (lat2, lon2) in enumerate(zip(lats, lons)):
+        lat2, lon2 = math.radians(lat2), math.radians(lon2)
+        a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+        d = 2 * spatial.EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+        if d <= radius:
+            found[i] = d
+    return found
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--radius", type=float, default=30)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    lats, lons = make_points(args.points)
+    index = GridIndex(lats, lons)
+    expected = brute_force(lats, lons, *BOLOGNA, args.radius)
+    assert set(index.distances(*BOLOGNA, args.radius)) == set(expected), "grid index misses points"
+
+    print(f"{args.points} points, {args.radius:g} km around Bologna ({len(expected)} inside), best of {args.repeat}")
+    print(f"build grid index:          {best_of(lambda: GridIndex(lats, lons), args.repeat) * 1000:8.2f} ms")
+    print(f"scan all (pure Python):    "
+          f"{best_of(lambda: brute_force(lats, lons, *BOLOGNA, args.radius), args.repeat) * 1000:8.2f} ms")
+    label = f"grid index ({'numpy' if spatial.numpy is not None else 'no numpy'}):"
+    print(f"{label:27}{best_of(lambda: index.distances(*BOLOGNA, args.radius), args.repeat) * 1000:8.2f} ms")
+    print(f"all distances, vectorized: "
+          f"{best_of(lambda: haversine_km(*BOLOGNA, lats, lons), args.repeat) * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
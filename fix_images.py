@@ -3,12 +3,13 @@ import django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'subitissimo_project.settings')
 django.setup()
 
-from scraper.models import Item
+from scraper.models import Listing
 
 # Update image URLs to use the API endpoint
-items_to_update = []
-for item in Item.objects.filter(image_url__contains="s.sbito.it/img/"):
-    old_url = item.image_url
+# image_url lives on Listing since migration 0012
+listings_to_update = []
+for listing in Listing.objects.filter(image_url__contains="s.sbito.it/img/").only('id', 'image_url'):
+    old_url = listing.image_url
     new_url = old_url.replace("s.sbito.it/img/", "images.sbito.it/api/v1/sbt-ads-images-pro/images/")
     if "?rule=gallery-desktop-1x-auto" not in new_url:
         if "?" in new_url:
@@ -18,11 +19,11 @@ for item in Item.objects.filter(image_url__contains="s.sbito.it/img/"):
         else:
              new_url += "?rule=gallery-desktop-1x-auto"
     
-    item.image_url = new_url
-    items_to_update.append(item)
+    listing.image_url = new_url
+    listings_to_update.append(listing)
 
-if items_to_update:
-    Item.objects.bulk_update(items_to_update, ['image_url'])
-    print(f"Updated {len(items_to_update)} image URLs.")
+if listings_to_update:
+    Listing.objects.bulk_update(listings_to_update, ['image_url'], batch_size=500)
+    print(f"Updated {len(listings_to_update)} image URLs.")
 else:
-    print("No items needed updating.")
+    print("No listings needed updating.")
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import SearchQuery, Item
+from .models import SearchQuery, Item, Listing
 
 admin.site.register(SearchQuery)
 admin.site.register(Item)
+admin.site.register(Listing)
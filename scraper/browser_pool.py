@@ -0,0 +1,178 @@
+import asyncio
+import atexit
+import concurrent.futures
+import threading
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, List, Optional, TypeVar
+
+from playwright.async_api import Browser, BrowserContext, Error as PlaywrightError, async_playwright
+
+T = TypeVar("T")
+
+# Defaults for the process-wide pool
+POOL_MAX_SIZE = 2
+POOL_MAX_USES = 50
+POOL_PREWARM = 1
+
+
+class _Slot:
+    """Un browser Chromium con il suo context, più il numero di ricerche servite."""
+
+    def __init__(self, browser: Browser, context: BrowserContext):
+        self.browser = browser
+        self.context = context
+        self.uses = 0
+
+    def healthy(self) -> bool:
+        return self.browser.is_connected()
+
+
+class BrowserPool:
+    """
+    Pool di browser Chromium già avviati, condiviso dalle ricerche del processo.
+
+    Playwright è legato al thread/event loop che lo ha creato, quindi il pool
+    vive in un thread dedicato con il proprio loop: i chiamanti (thread dei
+    worker WSGI) inviano coroutine con `run()`, che prendono in prestito un
+    context con `lease()`; le ricerche concorrenti condividono così gli
+    stessi processi Chromium.
+    Ogni slot viene riciclato dopo `max_uses` ricerche o se il browser muore.
+    """
+
+    def __init__(self, max_size: int = POOL_MAX_SIZE, max_uses: int = POOL_MAX_USES,
+                 prewarm: int = POOL_PREWARM, headless: bool = True):
+        self.max_size = max(1, max_size)
+        self.max_uses = max(1, max_uses)
+        self.prewarm = min(prewarm, self.max_size)
+        self.headless = headless
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+        # Only touched from the pool loop
+        self._playwright = None
+        self._idle: List[_Slot] = []
+        self._size = 0
+        self._available: Optional[asyncio.Condition] = None
+
+    # --- lifecycle (any thread) ---
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="browser-pool", daemon=True)
+            thread.start()
+            self._loop = loop
+            self._thread = thread
+            asyncio.run_coroutine_threadsafe(self._start(), loop).result()
+
+    def close(self) -> None:
+        with self._start_lock:
+            if self._thread is None:
+                return
+            asyncio.run_coroutine_threadsafe(self._close(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=10)
+            self._loop.close()
+            self._loop = None
+            self._thread = None
+
+    def submit(self, coro: Awaitable[T]) -> "concurrent.futures.Future[T]":
+        """
+        Schedula `coro` sul loop del pool e ritorna subito un Future.
+        Dentro la coroutine i context si prendono con `lease()`.
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro: Awaitable[T]) -> T:
+        """Come `submit`, ma blocca il thread chiamante fino al risultato."""
+        return self.submit(coro).result()
+
+    # --- pool internals (pool loop only) ---
+
+    async def _start(self) -> None:
+        self._available = asyncio.Condition()
+        self._playwright = await async_playwright().start()
+        for _ in range(self.prewarm):
+            self._size += 1
+            try:
+                self._idle.append(await self._launch())
+            except PlaywrightError:
+                # Prewarm is best effort: searches served over HTTP may never need
+                # a browser, and a real launch error surfaces on the first lease
+                break
+
+    async def _close(self) -> None:
+        for slot in self._idle:
+            await self._dispose(slot)
+        self._idle.clear()
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def _launch(self) -> _Slot:
+        # The caller has already reserved the slot in self._size
+        try:
+            browser = await self._playwright.chromium.launch(headless=self.headless)
+            context = await browser.new_context(locale="it-IT")
+        except Exception:
+            self._size -= 1
+            raise
+        return _Slot(browser, context)
+
+    async def _dispose(self, slot: _Slot) -> None:
+        self._size -= 1
+        try:
+            await slot.browser.close()
+        except PlaywrightError:
+            # Already gone (crashed or killed)
+            pass
+
+    async def _acquire(self) -> _Slot:
+        async with self._available:
+            while True:
+                while self._idle:
+                    slot = self._idle.pop()
+                    if slot.healthy():
+                        return slot
+                    await self._dispose(slot)
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                await self._available.wait()
+        return await self._launch()
+
+    async def _release(self, slot: _Slot) -> None:
+        slot.uses += 1
+        async with self._available:
+            # Recycle crashed browsers and the ones that served enough searches
+            if not slot.healthy() or slot.uses >= self.max_uses:
+                await self._dispose(slot)
+            else:
+                self._idle.append(slot)
+            self._available.notify()
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[BrowserContext]:
+        slot = await self._acquire()
+        try:
+            yield slot.context
+        finally:
+            await self._release(slot)
+
+
+_pool: Optional[BrowserPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> BrowserPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+            atexit.register(_pool.close)
+        return _pool
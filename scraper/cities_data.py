@@ -1,113 +0,0 @@
-# Common Italian cities and provinces to speed up geocoding
-# Format: "lowercase_name": (lat, lon)
-ITALIAN_CITIES = {
-    # Grandi città
-    "roma": (41.9028, 12.4964),
-    "milano": (45.4642, 9.1900),
-    "napoli": (40.8518, 14.2681),
-    "torino": (45.0703, 7.6869),
-    "palermo": (38.1157, 13.3615),
-    "genova": (44.4056, 8.9463),
-    "bologna": (44.4949, 11.3426),
-    "firenze": (43.7696, 11.2558),
-    "bari": (41.1171, 16.8719),
-    "catania": (37.5079, 15.0830),
-    "venezia": (45.4408, 12.3155),
-    "verona": (45.4384, 10.9916),
-    "messina": (38.1938, 15.5540),
-    "padova": (45.4064, 11.8768),
-    "trieste": (45.6495, 13.7768),
-    "taranto": (40.4740, 17.2470),
-    "brescia": (45.5416, 10.2118),
-    "prato": (43.8777, 11.1022),
-    "parma": (44.8015, 10.3279),
-    "modena": (44.6471, 10.9252),
-    "reggio calabria": (38.1144, 15.6504),
-    "reggio emilia": (44.6990, 10.6300),
-    "perugia": (43.1107, 12.3908),
-    "livorno": (43.5485, 10.3106),
-    "ravenna": (44.4184, 12.2035),
-    "cagliari": (39.2238, 9.1217),
-    "foggia": (41.4622, 15.5446),
-    "rimini": (44.0678, 12.5695),
-    "salerno": (40.6824, 14.7681),
-    "ferrara": (44.8381, 11.6198),
-    "sassari": (40.7259, 8.5556),
-    "latina": (41.4676, 12.9038),
-    "monza": (45.5845, 9.2744),
-    "siracusa": (37.0755, 15.2866),
-    "pescara": (42.4618, 14.2161),
-    "bergamo": (45.6983, 9.6773),
-    "trento": (46.0748, 11.1217),
-    "forlì": (44.2227, 12.0407),
-    "vicenza": (45.5455, 11.5354),
-    "terni": (42.5638, 12.6445),
-    "bolzano": (46.4983, 11.3548),
-    "novara": (45.4469, 8.6232),
-    "piacenza": (45.0526, 9.6930),
-    "ancona": (43.6158, 13.5189),
-    "andria": (41.2312, 16.2971),
-    "udine": (46.0637, 13.2446),
-    "arezzo": (43.4611, 11.8810),
-    "cesena": (44.1391, 12.2432),
-    "lecce": (40.3515, 18.1750),
-    # Province (often users search or sell by province)
-    "agrigento": (37.3097, 13.5845),
-    "alessandria": (44.9136, 8.6154),
-    "aosta": (45.7349, 7.3131),
-    "ascoli piceno": (42.8547, 13.5749),
-    "asti": (44.8998, 8.2043),
-    "avellino": (40.9160, 14.7887),
-    "belluno": (46.1364, 12.2201),
-    "benevento": (41.1307, 14.7788),
-    "biella": (45.5629, 8.0581),
-    "brindisi": (40.6277, 17.9351),
-    "caltanissetta": (37.4901, 14.0617),
-    "campobasso": (41.5603, 14.6627),
-    "caserta": (41.0744, 14.3315),
-    "catanzaro": (38.9098, 16.5877),
-    "chieti": (42.3510, 14.1675),
-    "como": (45.8081, 9.0852),
-    "cosenza": (39.3006, 16.2559),
-    "cremona": (45.1332, 10.0213),
-    "crotone": (39.0807, 17.1264),
-    "cuneo": (44.3845, 7.5427),
-    "enna": (37.5670, 14.2804),
-    "fermo": (43.1601, 13.7180),
-    "frosinone": (41.6398, 13.3371),
-    "gorizia": (45.9412, 13.6212),
-    "grosseto": (42.7607, 11.1118),
-    "imperia": (43.8860, 8.0286),
-    "isernia": (41.5971, 14.2372),
-    "l'aquila": (42.3489, 13.3995),
-    "la spezia": (44.1025, 9.8241),
-    "lecco": (45.8566, 9.3902),
-    "lodi": (45.3136, 9.5028),
-    "lucca": (43.8429, 10.5027),
-    "macerata": (43.3006, 13.4534),
-    "mantova": (45.1564, 10.7914),
-    "massa": (44.0384, 10.1268),
-    "matera": (40.6690, 16.6042),
-    "nuoro": (40.3230, 9.3303),
-    "oristano": (39.9056, 8.5804),
-    "pavia": (45.1847, 9.1582),
-    "pesaro": (43.9125, 12.9155),
-    "pisa": (43.7228, 10.4017),
-    "pistoia": (43.9301, 10.9181),
-    "pordenone": (45.9575, 12.6605),
-    "potenza": (40.6385, 15.8056),
-    "ragusa": (36.9269, 14.7303),
-    "rieti": (42.4042, 12.8711),
-    "rovigo": (45.0700, 11.7820),
-    "savona": (44.3072, 8.4811),
-    "siena": (43.3188, 11.3308),
-    "sondrio": (46.1708, 9.8708),
-    "teramo": (42.6601, 13.6995),
-    "trapani": (37.9945, 12.5630),
-    "treviso": (45.6669, 12.2423),
-    "varese": (45.8206, 8.8251),
-    "verbania": (45.9398, 8.5518),
-    "vercelli": (45.3208, 8.4237),
-    "vibo valentia": (38.6749, 16.0963),
-    "viterbo": (42.4174, 12.1047)
-}
@@ -0,0 +1,130 @@
+import math
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import Item
+from .snapshot import results_version
+
+# Grid cell side in screen pixels (tiles are 256 px): points closer than this are merged
+CLUSTER_CELL_PX = 64
+# From this zoom on every ad is its own marker
+CLUSTER_MAX_ZOOM = 15
+MAX_ZOOM = 19
+
+MAP_CACHE_TIMEOUT = 60 * 60
+
+# GeoJSON coordinates are rounded to ~1 m
+COORD_DIGITS = 5
+
+BBox = Tuple[float, float, float, float]  # west, south, east, north
+
+
+class MapPoints:
+    """Gli annunci localizzati di una ricerca, in array paralleli (id, lat, lon, prezzo, titolo)."""
+
+    def __init__(self):
+        self.ids = array('q')
+        self.lats = array('d')
+        self.lons = array('d')
+        self.prices = array('d')  # NaN when missing
+        self.titles: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, search_id: int) -> "MapPoints":
+        rows = Item.objects.filter(search_query_id=search_id, latitude__isnull=False, longitude__isnull=False)
+        rows = rows.order_by('id').annotate(title=F('listing__title'))
+        points = cls()
+        for item_id, title, price, lat, lon in rows.values_list('id', 'title', 'price_num', 'latitude', 'longitude'):
+            points.ids.append(item_id)
+            points.lats.append(lat)
+            points.lons.append(lon)
+            points.prices.append(math.nan if price is None else price)
+            points.titles.append(title or '')
+        return points
+
+    def bbox(self) -> Optional[BBox]:
+        if not self.ids:
+            return None
+        return min(self.lons), min(self.lats), max(self.lons), max(self.lats)
+
+
+def get_map_points(search_id: int) -> MapPoints:
+    key = f"map-points:{search_id}:{results_version(search_id)}"
+    points = cache.get(key)
+    if points is None:
+        points = MapPoints.build(search_id)
+        cache.set(key, points, MAP_CACHE_TIMEOUT)
+    return points
+
+
+def cell_size(zoom: int) -> float:
+    """Lato della cella della griglia, in gradi, a un dato zoom."""
+    return 360 / 2 ** zoom * CLUSTER_CELL_PX / 256
+
+
+def grid_clusters(points: MapPoints, zoom: int) -> List[Tuple[float, float, int, int]]:
+    """
+    (lat, lon, quanti, indice) per cella della griglia a quello zoom: il
+    baricentro dei punti della cella, e l'indice del punto se è uno solo.
+    """
+    if zoom >= CLUSTER_MAX_ZOOM:
+        return [(points.lats[i], points.lons[i], 1, i) for i in range(len(points))]
+    size = cell_size(zoom)
+    cells: Dict[Tuple[int, int], List[float]] = {}
+    for i, (lat, lon) in enumerate(zip(points.lats, points.lons)):
+        key = (math.floor(lon / size), math.floor(lat / size))
+        cell = cells.get(key)
+        if cell is None:
+            cells[key] = [lat, lon, 1, i]
+        else:
+            cell[0] += lat
+            cell[1] += lon
+            cell[2] += 1
+    return [(lat / n, lon / n, n, i) for lat, lon, n, i in cells.values()]
+
+
+def _feature(points: MapPoints, lat: float, lon: float, count: int, i: int) -> Dict[str, Any]:
+    if count == 1:
+        price = points.prices[i]
+        properties = {'id': points.ids[i], 'title': points.titles[i], 'price': None if math.isnan(price) else price}
+    else:
+        properties = {'count': count}
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [round(lon, COORD_DIGITS), round(lat, COORD_DIGITS)]},
+        'properties': properties,
+    }
+
+
+def map_features(search_id: int, zoom: int, bbox: Optional[BBox] = None) -> Dict[str, Any]:
+    """
+    FeatureCollection GeoJSON dei marker di una ricerca a uno zoom: un punto
+    per annuncio o un cluster per cella. I cluster di ogni zoom sono in cache
+    per ricerca, così spostare la mappa costa solo il filtro sul riquadro.
+    """
+    zoom = max(0, min(zoom, MAX_ZOOM))
+    points = get_map_points(search_id)
+    key = f"map-clusters:{search_id}:{results_version(search_id)}:{min(zoom, CLUSTER_MAX_ZOOM)}"
+    clusters = cache.get(key)
+    if clusters is None:
+        clusters = grid_clusters(points, zoom)
+        cache.set(key, clusters, MAP_CACHE_TIMEOUT)
+
+    if bbox is not None:
+        west, south, east, north = bbox
+        clusters = [c for c in clusters if south <= c[0] <= north and west <= c[1] <= east]
+    collection: Dict[str, Any] = {
+        'type': 'FeatureCollection',
+        'features': [_feature(points, *cluster) for cluster in clusters],
+    }
+    # All the search's points, not just this bbox: the page fits the map to it on load
+    bounds = points.bbox()
+    if bounds is not None:
+        collection['bounds'] = [round(v, COORD_DIGITS) for v in bounds]
+    return collection
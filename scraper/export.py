@@ -0,0 +1,163 @@
+import csv
+import io
+import json
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from django.db.models import F
+
+from .models import Item
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # Parquet/Arrow export is optional
+    pyarrow = None
+
+# Rows fetched from the DB per round trip, and per Parquet/Arrow record batch
+EXPORT_CHUNK_SIZE = 2000
+
+# Export columns, in order; the LISTING ones are joined in from Listing
+EXPORT_FIELDS = (
+    'subito_id', 'title', 'price_str', 'price_num', 'previous_price', 'date_pub', 'date_pub_iso',
+    'category', 'region', 'province', 'town', 'condition', 'shipping_type', 'shipping_cost', 'shippable',
+    'likes_count', 'defect_flag', 'defect_reason', 'url', 'image_url', 'description',
+)
+LISTING_EXPORT_FIELDS = ('subito_id', 'title', 'previous_price', 'date_pub', 'likes_count', 'defect_reason', 'url',
+                         'image_url', 'description')
+
+# format -> (content type, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+ARROW_FORMATS = ('parquet', 'arrow')
+
+
+def available_formats() -> tuple:
+    if pyarrow is None:
+        return tuple(f for f in EXPORT_FORMATS if f not in ARROW_FORMATS)
+    return tuple(EXPORT_FORMATS)
+
+
+def export_rows(search_id: int, chunk_size: int = EXPORT_CHUNK_SIZE,
+                fields: Tuple[str, ...] = EXPORT_FIELDS) -> Iterator[Dict[str, Any]]:
+    """Gli annunci di una ricerca, una riga alla volta, letti dal DB a blocchi."""
+    items = Item.objects.filter(search_query_id=search_id).annotate(
+        **{field: F(f'listing__{field}') for field in LISTING_EXPORT_FIELDS if field in fields}
+    )
+    return items.order_by('id').values(*fields).iterator(chunk_size=chunk_size)
+
+
+class _Buffer:
+    """File finto per csv.writer: restituisce la riga invece di accumularla."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def iter_csv(rows: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    writer = csv.writer(_Buffer())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow([row[field] for field in EXPORT_FIELDS])
+
+
+def iter_ndjson(rows: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(row, default=str, ensure_ascii=False) + "\n"
+
+
+class _DrainSink(io.RawIOBase):
+    """
+    Sink in sola scrittura per i writer pyarrow: tiene i byte finché non
+    vengono svuotati con drain(), ma tell() conta tutto lo scritto, perché
+    il footer Parquet registra gli offset assoluti dei row group.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._offset = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrow_schema():
+    floats = ('price_num', 'previous_price', 'shipping_cost')
+    types = {field: pyarrow.float64() for field in floats}
+    types['shippable'] = pyarrow.bool_()
+    types['likes_count'] = pyarrow.int64()
+    types['date_pub_iso'] = pyarrow.timestamp('us', tz='UTC')
+    return pyarrow.schema([(field, types.get(field, pyarrow.string())) for field in EXPORT_FIELDS])
+
+
+def _record_batches(rows: Iterable[Dict[str, Any]], schema, batch_size: int) -> Iterator[Any]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield pyarrow.RecordBatch.from_pylist(batch, schema=schema)
+            batch = []
+    if batch:
+        yield pyarrow.RecordBatch.from_pylist(batch, schema=schema)
+
+
+def iter_arrow(rows: Iterable[Dict[str, Any]], fmt: str = 'parquet',
+               batch_size: int = EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Parquet (un row group per blocco) o Arrow IPC stream, scritti su un
+    buffer che viene svuotato dopo ogni blocco: in memoria c'è sempre un
+    solo blocco di righe.
+    """
+    if pyarrow is None:
+        raise RuntimeError("pyarrow is required for Parquet/Arrow export")
+    schema = _arrow_schema()
+    sink = _DrainSink()
+    if fmt == 'parquet':
+        writer = pyarrow.parquet.ParquetWriter(sink, schema, compression='zstd')
+    else:
+        writer = pyarrow.ipc.new_stream(sink, schema)
+
+    for batch in _record_batches(rows, schema, batch_size):
+        if fmt == 'parquet':
+            writer.write_batch(batch, row_group_size=batch_size)
+        else:
+            writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def iter_export(search_id: int, fmt: str, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[Any]:
+    """Chunk (str o bytes) dell'export di una ricerca nel formato `fmt`."""
+    rows = export_rows(search_id, chunk_size)
+    if fmt == 'csv':
+        return iter_csv(rows)
+    if fmt == 'ndjson':
+        return iter_ndjson(rows)
+    if fmt in ARROW_FORMATS:
+        return iter_arrow(rows, fmt, chunk_size)
+    raise ValueError(f"Unknown export format: {fmt}")
+
+
+def export_filename(query: Optional[str], search_id: int, fmt: str) -> str:
+    slug = "".join(c if c.isalnum() else "_" for c in (query or "search")).strip("_") or "search"
+    return f"{slug}_{search_id}.{EXPORT_FORMATS[fmt][1]}"
@@ -0,0 +1,165 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.core.cache import cache
+from django.db.models import Q, QuerySet
+
+from .models import Item
+
+# (GET param / Item field, label) of the facets shown on the results page
+FACETS = (
+    ('price', 'Prezzo'),
+    ('region', 'Regione'),
+    ('province', 'Provincia'),
+    ('category', 'Categoria'),
+    ('condition', 'Condizione'),
+    ('shipping_type', 'Spedizione'),
+    ('defect_flag', 'Difetti'),
+)
+# Filters that narrow the counts but are drawn elsewhere (the shipping buttons)
+HIDDEN_FACETS = ('shippable',)
+
+# Price buckets in euro: (value, label, min inclusive, max exclusive)
+PRICE_BUCKETS = (
+    ('0-50', '< 50 €', 0, 50),
+    ('50-100', '50–100 €', 50, 100),
+    ('100-250', '100–250 €', 100, 250),
+    ('250-500', '250–500 €', 250, 500),
+    ('500-1000', '500–1000 €', 500, 1000),
+    ('1000-', '> 1000 €', 1000, None),
+)
+
+# Value used for items without the field (no price, no region...)
+MISSING = '-'
+
+FACET_CACHE_TIMEOUT = 60 * 60
+
+
+def price_bucket(price: Optional[float]) -> str:
+    if price is None:
+        return MISSING
+    for value, _, low, high in PRICE_BUCKETS:
+        if price >= low and (high is None or price < high):
+            return value
+    return MISSING
+
+
+def _facet_value(field: str, row: Dict[str, Any]) -> str:
+    if field == 'price':
+        return price_bucket(row['price_num'])
+    if field == 'shippable':
+        return 'true' if row['shippable'] else 'false'
+    return row[field] or MISSING
+
+
+class FacetIndex:
+    """
+    Bitmap per valore di ogni faccetta di una ricerca: il bit i è acceso se
+    l'i-esimo annuncio (in ordine di id) ha quel valore. Si costruisce con
+    una sola lettura degli Item; i conteggi sono poi AND e popcount in memoria.
+    """
+
+    FIELDS = tuple(name for name, _ in FACETS) + HIDDEN_FACETS
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.size = len(rows)
+        self.all = (1 << self.size) - 1
+        self.bitmaps: Dict[str, Dict[str, int]] = {name: {} for name in self.FIELDS}
+        for i, row in enumerate(rows):
+            bit = 1 << i
+            for name in self.FIELDS:
+                values = self.bitmaps[name]
+                value = _facet_value(name, row)
+                values[value] = values.get(value, 0) | bit
+
+    @classmethod
+    def build(cls, search_id: int) -> "FacetIndex":
+        fields = [name for name in cls.FIELDS if name != 'price'] + ['price_num']
+        return cls(list(Item.objects.filter(search_query_id=search_id).order_by('id').values(*fields)))
+
+    def mask(self, selected: Dict[str, str], exclude: Optional[str] = None, base: Optional[int] = None) -> int:
+        """Righe che passano i filtri; `base` restringe in partenza (per esempio a un raggio)."""
+        mask = self.all if base is None else base
+        for name, value in selected.items():
+            if name != exclude:
+                mask &= self.bitmaps[name].get(value, 0)
+        return mask
+
+    def counts(self, selected: Dict[str, str], base: Optional[int] = None) -> Dict[str, Dict[str, int]]:
+        """
+        Per ogni faccetta, quanti annunci ha ciascun valore con i filtri
+        delle *altre* faccette applicati (così si può sempre cambiare valore).
+        """
+        result = {}
+        for name in self.FIELDS:
+            mask = self.mask(selected, exclude=name, base=base)
+            counts = {value: (bitmap & mask).bit_count() for value, bitmap in self.bitmaps[name].items()}
+            result[name] = {value: n for value, n in counts.items() if n}
+        return result
+
+
+def get_facet_index(search_id: int) -> FacetIndex:
+    # Keyed on the row count too, so a search still being saved isn't cached half-way
+    key = f"facets:{search_id}:{Item.objects.filter(search_query_id=search_id).count()}"
+    index = cache.get(key)
+    if index is None:
+        index = FacetIndex.build(search_id)
+        cache.set(key, index, FACET_CACHE_TIMEOUT)
+    return index
+
+
+def selected_filters(params) -> Dict[str, str]:
+    """Filtri attivi presi dai parametri GET."""
+    return {name: params[name] for name in FacetIndex.FIELDS if params.get(name)}
+
+
+def _price_q(value: str) -> Q:
+    if value == MISSING:
+        return Q(price_num__isnull=True)
+    for bucket, _, low, high in PRICE_BUCKETS:
+        if bucket == value:
+            q = Q(price_num__gte=low)
+            if high is not None:
+                q &= Q(price_num__lt=high)
+            return q
+    return Q(pk__in=[])
+
+
+def apply_filters(queryset: QuerySet, selected: Dict[str, str]) -> QuerySet:
+    for name, value in selected.items():
+        if name == 'price':
+            queryset = queryset.filter(_price_q(value))
+        elif name == 'shippable':
+            queryset = queryset.filter(shippable=value == 'true')
+        elif value == MISSING:
+            queryset = queryset.filter(Q(**{f'{name}__isnull': True}) | Q(**{name: ''}))
+        else:
+            queryset = queryset.filter(**{name: value})
+    return queryset
+
+
+def facet_options(counts: Dict[str, Dict[str, int]], selected: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Faccette pronte per il template: valori ordinati e conteggi."""
+    price_labels = {value: label for value, label, _, _ in PRICE_BUCKETS}
+    price_order = [value for value, _, _, _ in PRICE_BUCKETS] + [MISSING]
+    facets = []
+    for name, label in FACETS:
+        values: List[Tuple[str, int]] = list(counts.get(name, {}).items())
+        if name == 'price':
+            values.sort(key=lambda v: price_order.index(v[0]))
+        else:
+            values.sort(key=lambda v: (-v[1], v[0]))
+        # Keep the active value listed even when the other filters leave it empty
+        active = selected.get(name)
+        if active and active not in dict(values):
+            values.append((active, 0))
+        facets.append({
+            'name': name,
+            'label': label,
+            'active': active or '',
+            'options': [
+                {'value': value, 'count': n,
+                 'label': price_labels.get(value, 'n/d') if name == 'price' or value == MISSING else value}
+                for value, n in values
+            ],
+        })
+    return facets
@@ -0,0 +1,70 @@
+import threading
+from typing import Any, Dict, FrozenSet, Iterable, Optional
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import CacheVersion, Favorite
+
+# CacheVersion bumped with every change, in the same transaction; each process reloads its copy when it differs
+FAVORITES_VERSION = 'favorites'
+
+_ids: FrozenSet[str] = frozenset()
+_version: Optional[int] = None
+_lock = threading.Lock()
+
+
+def _current_version() -> int:
+    return CacheVersion.objects.filter(name=FAVORITES_VERSION).values_list('value', flat=True).first() or 0
+
+
+def _bump_version() -> int:
+    """Incrementa la versione (dentro la transazione del chiamante) e restituisce quella nuova."""
+    if not CacheVersion.objects.filter(name=FAVORITES_VERSION).update(value=F('value') + 1):
+        CacheVersion.objects.bulk_create([CacheVersion(name=FAVORITES_VERSION)], ignore_conflicts=True)
+        CacheVersion.objects.filter(name=FAVORITES_VERSION).update(value=F('value') + 1)
+    return _current_version()
+
+
+def favorite_ids() -> FrozenSet[str]:
+    """
+    subito_id dei preferiti, tenuti in memoria: a ogni chiamata si legge solo
+    la versione dal DB, e i preferiti si rileggono se qualcuno l'ha cambiata.
+    """
+    global _ids, _version
+    # Read before the ids, so a change in between only costs one more reload
+    version = _current_version()
+    with _lock:
+        if _version == version:
+            return _ids
+    ids = frozenset(Favorite.objects.values_list('subito_id', flat=True))
+    with _lock:
+        _ids, _version = ids, version
+    return ids
+
+
+def mark_favorites(rows: Iterable[Any]) -> None:
+    """Imposta is_favorite sulle righe di una pagina (ResultRow o oggetti simili)."""
+    ids = favorite_ids()
+    for row in rows:
+        row.is_favorite = row.subito_id in ids
+
+
+def toggle_favorite(subito_id: str, fields: Dict[str, Any]) -> bool:
+    """Aggiunge o toglie un preferito; True se ora è tra i preferiti."""
+    global _ids, _version
+    with transaction.atomic():
+        deleted, _ = Favorite.objects.filter(subito_id=subito_id).delete()
+        if not deleted:
+            Favorite.objects.create(subito_id=subito_id, **fields)
+        version = _bump_version()
+    added = not deleted
+
+    with _lock:
+        if _version is not None and version == _version + 1:
+            # Ours is the only change since our copy: update it in place
+            _ids = _ids | {subito_id} if added else _ids - {subito_id}
+            _version = version
+        else:
+            _version = None
+    return added
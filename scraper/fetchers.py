@@ -0,0 +1,148 @@
+import importlib.util
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from playwright.async_api import BrowserContext
+
+from .hades_session import HadesSession
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - optional dependency
+    httpx = None
+
+HADES_URL = "https://hades.subito.it/v1/search/items"
+
+# "http" uses the pooled HTTP client when httpx is installed, "chromium" forces the browser
+HADES_BACKEND = "http"
+
+# Connection pool for the HTTP backend, shared by every search in the process
+HTTP_MAX_CONNECTIONS = 20
+HTTP_TIMEOUT = 60.0
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class HadesResponse:
+    def __init__(self, status: int, payload: Optional[Dict[str, Any]], headers: Dict[str, str]):
+        self.status = status
+        self.payload = payload
+        self.headers = headers
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300 and self.payload is not None
+
+
+class HadesFetcher:
+    """Interfaccia comune per scaricare una pagina Hades."""
+
+    backend = ""
+
+    async def get(self, params: Dict[str, Any]) -> HadesResponse:
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        pass
+
+
+class PlaywrightFetcher(HadesFetcher):
+    """Richieste fatte dal context Chromium (fallback, lento ma sempre accettato)."""
+
+    backend = "chromium"
+
+    def __init__(self, context: BrowserContext, url: str = HADES_URL):
+        self.context = context
+        self.url = url
+
+    @classmethod
+    async def create(cls, context: BrowserContext, session: HadesSession, url: str = HADES_URL) -> "PlaywrightFetcher":
+        await context.add_cookies(session.cookies)
+        return cls(context, url)
+
+    async def get(self, params: Dict[str, Any]) -> HadesResponse:
+        r = await self.context.request.get(self.url, params=params, timeout=HTTP_TIMEOUT * 1000)
+        payload = await r.json() if r.ok else None
+        return HadesResponse(r.status, payload, r.headers)
+
+
+class HttpFetcher(HadesFetcher):
+    """
+    Client HTTP puro (keep-alive, HTTP/2 se `h2` è installato) che riusa
+    i cookie e gli header catturati dal bootstrap.
+    """
+
+    backend = "http"
+
+    def __init__(self, client: "httpx.AsyncClient", url: str = HADES_URL):
+        self.client = client
+        self.url = url
+
+    async def get(self, params: Dict[str, Any]) -> HadesResponse:
+        r = await self.client.get(self.url, params=params)
+        payload = None
+        if r.is_success:
+            try:
+                payload = r.json()
+            except ValueError:
+                payload = None
+        return HadesResponse(r.status_code, payload, dict(r.headers))
+
+
+class _HttpClientCache:
+    """
+    Un solo AsyncClient per sessione, così le connessioni restano calde tra
+    le ricerche. Ogni ricerca lo prende in prestito: quando arriva una sessione
+    nuova, il client vecchio si chiude solo alla fine del suo ultimo prestito.
+    """
+
+    def __init__(self):
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._session: Optional[HadesSession] = None
+        # client -> searches still using it
+        self._leases: Dict["httpx.AsyncClient", int] = {}
+
+    @staticmethod
+    def _open(session: HadesSession) -> "httpx.AsyncClient":
+        cookies = httpx.Cookies()
+        for c in session.cookies:
+            cookies.set(c["name"], c["value"], domain=c.get("domain", ""), path=c.get("path", "/"))
+        return httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            headers=session.headers,
+            cookies=cookies,
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS,
+                                max_keepalive_connections=HTTP_MAX_CONNECTIONS),
+        )
+
+    @asynccontextmanager
+    async def lease(self, session: HadesSession) -> AsyncIterator["httpx.AsyncClient"]:
+        if self._client is None or self._session is not session:
+            retired = self._client
+            self._client, self._session = self._open(session), session
+            if retired is not None and retired not in self._leases:
+                await retired.aclose()
+        client = self._client
+        self._leases[client] = self._leases.get(client, 0) + 1
+        try:
+            yield client
+        finally:
+            self._leases[client] -= 1
+            if not self._leases[client]:
+                del self._leases[client]
+                if client is not self._client:
+                    await client.aclose()
+
+
+_http_clients = _HttpClientCache()
+
+
+async def http_fetcher(stack: AsyncExitStack, session: HadesSession, url: str = HADES_URL) -> Optional[HttpFetcher]:
+    """
+    Il fetcher HTTP se il backend è abilitato e httpx è disponibile,
+    altrimenti None. Il client resta in prestito fino alla chiusura di `stack`.
+    """
+    if HADES_BACKEND != "http" or httpx is None:
+        return None
+    return HttpFetcher(await stack.enter_async_context(_http_clients.lease(session)), url)
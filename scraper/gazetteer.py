@@ -0,0 +1,112 @@
+import re
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+Coords = Tuple[float, float]
+
+GAZETTEER_PATH = Path(__file__).resolve().parent / 'data' / 'gazetteer.tsv'
+
+# Row kinds, from the most to the least precise
+KINDS = ('town', 'province', 'region')
+
+# Other spellings of the same place, after normalize_place
+PLACE_ALIASES = {
+    'monza e brianza': 'monza e della brianza',
+    'monza brianza': 'monza e della brianza',
+    'pesaro urbino': 'pesaro e urbino',
+    'bolzano bozen': 'bolzano',
+    'bozen': 'bolzano',
+    'reggio nell emilia': 'reggio emilia',
+    'reggio di calabria': 'reggio calabria',
+    'valle d aosta vallee d aoste': 'valle d aosta',
+    'trentino alto adige sudtirol': 'trentino alto adige',
+}
+
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_place(name: Optional[str]) -> str:
+    """Minuscolo, senza accenti né punteggiatura: 'Forlì-Cesena' -> 'forli cesena'."""
+    if not name:
+        return ''
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(c for c in name if not unicodedata.combining(c)).lower()
+    name = _NON_ALNUM_RE.sub(' ', name).strip()
+    return PLACE_ALIASES.get(name, name)
+
+
+class Gazetteer:
+    """
+    Comuni, province e regioni con le loro coordinate. Le chiavi normalizzate
+    (tipo, nome) stanno in una lista ordinata, cercata per bisezione, e le
+    coordinate in un array parallelo: qualche centinaio di KB anche con
+    tutti i comuni. Un comune omonimo si distingue con la provincia.
+    """
+
+    def __init__(self, rows: Iterable[Tuple[str, str, str, float, float]]):
+        entries = sorted(
+            (f"{kind}\t{normalize_place(name)}", normalize_place(province), lat, lon)
+            for kind, name, province, lat, lon in rows
+        )
+        self._keys: List[str] = [key for key, _, _, _ in entries]
+        self._provinces: List[str] = [province for _, province, _, _ in entries]
+        self._coords = array('d')
+        for _, _, lat, lon in entries:
+            self._coords.extend((lat, lon))
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @classmethod
+    def load(cls, path: Path = GAZETTEER_PATH) -> "Gazetteer":
+        return cls(read_gazetteer(path))
+
+    def lookup(self, kind: str, name: Optional[str], province: Optional[str] = None) -> Optional[Coords]:
+        key = f"{kind}\t{normalize_place(name)}"
+        if key.endswith('\t'):
+            return None
+        province = normalize_place(province)
+        # Homonyms sit next to each other; one in another province doesn't count
+        for i in range(bisect_left(self._keys, key), len(self._keys)):
+            if self._keys[i] != key:
+                break
+            if not province or self._provinces[i] in ('', province):
+                return self._coords[2 * i], self._coords[2 * i + 1]
+        return None
+
+    def find(self, name: Optional[str]) -> Optional[Coords]:
+        """Un luogo scritto dall'utente: comune, provincia o regione con quel nome."""
+        return self.lookup('town', name) or self.lookup('province', name) or self.lookup('region', name)
+
+    def resolve(self, town: Optional[str], province: Optional[str], region: Optional[str]) -> Optional[Coords]:
+        """Il comune, se c'è; altrimenti il capoluogo della provincia, altrimenti il centro della regione."""
+        return (self.lookup('town', town, province) or self.lookup('province', province)
+                or self.lookup('region', region))
+
+
+def read_gazetteer(path: Path = GAZETTEER_PATH) -> Iterable[Tuple[str, str, str, float, float]]:
+    """Righe (tipo, nome, provincia, lat, lon) del file TSV; vedi l'intestazione in data/gazetteer.tsv."""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip() or line.startswith('#'):
+                continue
+            kind, name, province, _region, lat, lon = line.rstrip('\n').split('\t')
+            yield kind, name, province, float(lat), float(lon)
+
+
+_gazetteer: Optional[Gazetteer] = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer() -> Gazetteer:
+    """Il gazetteer del pacchetto, letto alla prima richiesta."""
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                _gazetteer = Gazetteer.load()
+    return _gazetteer
@@ -0,0 +1,116 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .gazetteer import get_gazetteer
+from .models import GeoCache
+
+Coords = Tuple[float, float]
+
+# (town, province, region) as they appear on an ad
+Place = Tuple[Optional[str], Optional[str], Optional[str]]
+
+# Location keys kept in memory by this process, most recently used last
+GEO_CACHE_SIZE = 4096
+
+# location_key__in values per query, well under SQLite's variable limit
+GEO_QUERY_BATCH = 500
+
+# Places the geocoder found nothing for aren't looked up again for this long
+GEO_NEGATIVE_TTL = timedelta(days=30)
+
+# key -> (coords, expiry): a miss (coords None) is only trusted until its expiry timestamp
+_resolved: "OrderedDict[str, Tuple[Optional[Coords], float]]" = OrderedDict()
+_resolved_lock = threading.Lock()
+
+
+def location_key(town: Optional[str], province: Optional[str], region: Optional[str]) -> str:
+    """Chiave di GeoCache di un annuncio: il comune, altrimenti la provincia, altrimenti la regione."""
+    for value in (town, province, region):
+        value = (value or '').lower().strip()
+        if value:
+            return value
+    return ''
+
+
+def _remember(found: Dict[str, Tuple[Optional[Coords], float]]) -> None:
+    with _resolved_lock:
+        for key, entry in found.items():
+            _resolved[key] = entry
+            _resolved.move_to_end(key)
+        while len(_resolved) > GEO_CACHE_SIZE:
+            _resolved.popitem(last=False)
+
+
+def resolve_locations(keys: Iterable[str]) -> Dict[str, Optional[Coords]]:
+    """
+    Esiti salvati in GeoCache per un insieme di location key, in blocco:
+    prima la LRU del processo, poi una query IN per quelle che mancano.
+    Valgono None le chiavi che il geocoder non ha trovato da meno di
+    GEO_NEGATIVE_TTL; quelle mai cercate, o da ritentare, non compaiono.
+    """
+    now = time.time()
+    result: Dict[str, Optional[Coords]] = {}
+    missing: List[str] = []
+    with _resolved_lock:
+        for key in set(keys):
+            if not key:
+                continue
+            entry = _resolved.get(key)
+            if entry is None or entry[1] <= now:
+                missing.append(key)
+            else:
+                _resolved.move_to_end(key)
+                result[key] = entry[0]
+    if not missing:
+        return result
+
+    found: Dict[str, Tuple[Optional[Coords], float]] = {}
+    ttl = GEO_NEGATIVE_TTL.total_seconds()
+    for start in range(0, len(missing), GEO_QUERY_BATCH):
+        rows = GeoCache.objects.filter(location_key__in=missing[start:start + GEO_QUERY_BATCH])
+        for key, lat, lon, hit, updated_at in rows.values_list('location_key', 'latitude', 'longitude', 'found',
+                                                               'updated_at'):
+            if hit:
+                found[key] = ((lat, lon), math.inf)
+            elif updated_at.timestamp() + ttl > now:
+                found[key] = (None, updated_at.timestamp() + ttl)
+
+    _remember(found)
+    for key, entry in found.items():
+        result[key] = entry[0]
+    return result
+
+
+def resolve_places(places: Iterable[Place], unresolved: Optional[Dict[str, Place]] = None
+                   ) -> Dict[Place, Optional[Coords]]:
+    """
+    Coordinate dei luoghi distinti di una ricerca, senza rete: il comune nel
+    gazetteer, altrimenti in GeoCache, altrimenti il capoluogo di provincia
+    o il centro della regione dal gazetteer. Se passato, `unresolved` riceve
+    (per location key) i luoghi da chiedere al geocoder esterno.
+    """
+    gazetteer = get_gazetteer()
+    result: Dict[Place, Optional[Coords]] = {}
+    unknown: List[Place] = []
+    for place in set(places):
+        coords = gazetteer.lookup('town', place[0], place[1])
+        if coords is None:
+            unknown.append(place)
+        else:
+            result[place] = coords
+
+    cached = resolve_locations(location_key(*place) for place in unknown)
+    for place in unknown:
+        key = location_key(*place)
+        if key in cached:
+            result[place] = cached[key] or gazetteer.resolve(*place)
+            continue
+        result[place] = gazetteer.resolve(*place)
+        # Without a town the gazetteer already answers at the key's own precision
+        if unresolved is not None and key and (place[0] or result[place] is None):
+            unresolved.setdefault(key, place)
+    return result
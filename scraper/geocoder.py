@@ -0,0 +1,223 @@
+import asyncio
+import threading
+from itertools import islice
+from typing import Dict, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .geo import Coords, Place
+from .models import GeoCache, Item, SearchSnapshot
+from .rate_limit import AdaptiveRateLimiter, is_retryable, retry_after_seconds
+from .snapshot import store_snapshot
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - optional dependency, no external geocoding without it
+    httpx = None
+
+# Backend, server, User-Agent and rate come from settings.GEOCODER_*; these are the fixed knobs
+GEOCODER_RATE_MIN = 0.1
+GEOCODER_TIMEOUT = 10.0
+GEOCODER_ATTEMPTS = 3
+
+# Places taken off the queue together, and written to GeoCache with one query
+GEOCODER_BATCH_SIZE = 50
+
+
+class GeocoderError(Exception):
+    """Il servizio non ha risposto (rete, 429, 5xx): il luogo va ritentato, non ricordato come sconosciuto."""
+
+
+class Geocoder:
+    """Interfaccia comune dei geocoder esterni."""
+
+    async def geocode_many(self, places: Dict[str, Place]) -> Dict[str, Optional[Coords]]:
+        """
+        Per location key: le coordinate, o None se il servizio non conosce
+        il luogo. Le chiavi fallite per errori temporanei non compaiono.
+        """
+        raise NotImplementedError
+
+
+class NominatimGeocoder(Geocoder):
+    """
+    Geocoder per l'API /search di Nominatim o di un server compatibile:
+    una richiesta per luogo, tutte dallo stesso client e dal rate limiter
+    del geocoder, che rallenta su 429/5xx e rispetta il Retry-After.
+    """
+
+    def __init__(self, url: str, rate: float = 1.0, user_agent: str = 'subitissimo'):
+        self.url = url.rstrip('/') + '/search'
+        self.user_agent = user_agent
+        self.limiter = AdaptiveRateLimiter(rate=rate, min_rate=min(rate, GEOCODER_RATE_MIN), max_rate=rate, burst=1)
+
+    async def geocode_many(self, places: Dict[str, Place]) -> Dict[str, Optional[Coords]]:
+        async with httpx.AsyncClient(headers={'User-Agent': self.user_agent}, timeout=GEOCODER_TIMEOUT) as client:
+            found = await asyncio.gather(*(self._search(client, place) for place in places.values()),
+                                         return_exceptions=True)
+        result: Dict[str, Optional[Coords]] = {}
+        for key, coords in zip(places, found):
+            if isinstance(coords, GeocoderError):
+                continue
+            if isinstance(coords, BaseException):
+                raise coords
+            result[key] = coords
+        return result
+
+    async def _search(self, client: "httpx.AsyncClient", place: Place) -> Optional[Coords]:
+        params = {'q': ", ".join(part for part in place if part), 'format': 'jsonv2', 'limit': 1,
+                  'countrycodes': 'it'}
+        for _ in range(GEOCODER_ATTEMPTS):
+            await self.limiter.acquire()
+            try:
+                r = await client.get(self.url, params=params)
+            except httpx.HTTPError:
+                self.limiter.on_throttle()
+                continue
+            if r.is_success:
+                self.limiter.on_success()
+                try:
+                    matches = r.json()
+                    return (float(matches[0]['lat']), float(matches[0]['lon'])) if matches else None
+                except (ValueError, LookupError, TypeError):
+                    raise GeocoderError(f"Unexpected answer for {params['q']!r}")
+            if not is_retryable(r.status_code):
+                raise GeocoderError(f"HTTP {r.status_code} for {params['q']!r}")
+            self.limiter.on_throttle(retry_after_seconds(dict(r.headers)))
+        raise GeocoderError(f"No answer for {params['q']!r}")
+
+
+class GeocodingQueue:
+    """
+    Luoghi da chiedere al geocoder, fuori dalle richieste web: un thread per
+    processo svuota la coda a blocchi e si ferma quando è vuota. Ogni luogo
+    è in coda (o in lavorazione) una volta sola; le ricerche che lo aspettano
+    ricevono le coordinate nuove e uno snapshot aggiornato.
+    """
+
+    def __init__(self, backend: Geocoder, batch_size: int = GEOCODER_BATCH_SIZE):
+        self.backend = backend
+        self.batch_size = batch_size
+        # key -> (place, ids of the searches with ads there)
+        self._pending: Dict[str, Tuple[Place, Set[int]]] = {}
+        self._in_flight: Dict[str, Tuple[Place, Set[int]]] = {}
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+
+    def request(self, places: Dict[str, Place], search_id: Optional[int] = None) -> None:
+        with self._lock:
+            for key, place in places.items():
+                entry = self._in_flight.get(key) or self._pending.setdefault(key, (place, set()))
+                if search_id is not None:
+                    entry[1].add(search_id)
+            if self._pending and self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="geocoder", daemon=True)
+                self._worker.start()
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        """Aspetta che la coda sia vuota (per i comandi e i test)."""
+        with self._lock:
+            worker = self._worker
+        while worker is not None:
+            worker.join(timeout)
+            if worker.is_alive():
+                return
+            with self._lock:
+                worker = self._worker
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._worker = None
+                    return
+                batch = dict(islice(self._pending.items(), self.batch_size))
+                for key in batch:
+                    del self._pending[key]
+                self._in_flight.update(batch)
+            try:
+                self._lookup(batch)
+            except Exception:
+                # Best effort: the next search with ads there asks again
+                pass
+            finally:
+                with self._lock:
+                    for key in batch:
+                        self._in_flight.pop(key, None)
+                close_old_connections()
+
+    def _lookup(self, batch: Dict[str, Tuple[Place, Set[int]]]) -> None:
+        found = asyncio.run(self.backend.geocode_many({key: place for key, (place, _) in batch.items()}))
+        if not found:
+            return
+        now = timezone.now()
+        GeoCache.objects.bulk_create(
+            [GeoCache(location_key=key, latitude=coords[0] if coords else None,
+                      longitude=coords[1] if coords else None, found=coords is not None, updated_at=now)
+             for key, coords in found.items()],
+            update_conflicts=True, unique_fields=['location_key'],
+            update_fields=['latitude', 'longitude', 'found', 'updated_at'],
+        )
+
+        # Searches saved before the answer came still hold the province/region fallback
+        with self._lock:
+            waiting = {key: set(batch[key][1]) for key in found}
+        updated: Set[int] = set()
+        for key, coords in found.items():
+            if coords is None or not waiting[key]:
+                continue
+            town, province, region = batch[key][0]
+            rows = Item.objects.filter(search_query_id__in=waiting[key], town=town, province=province, region=region)
+            if rows.update(latitude=coords[0], longitude=coords[1]):
+                updated |= waiting[key]
+        # Searches still being saved get their snapshot when they finish
+        for search_id in SearchSnapshot.objects.filter(search_query_id__in=updated).values_list('search_query_id',
+                                                                                               flat=True):
+            store_snapshot(search_id)
+
+
+def make_geocoder(url: Optional[str] = None) -> Optional[Geocoder]:
+    """
+    Il geocoder di settings.GEOCODER_*, o None se è spento, senza server o
+    senza httpx. Con `url` si usa quel server anche se è spento.
+    """
+    if httpx is None:
+        return None
+    if url is None:
+        if settings.GEOCODER_BACKEND != "nominatim" or not settings.GEOCODER_URL:
+            return None
+        url = settings.GEOCODER_URL
+    return NominatimGeocoder(url, rate=settings.GEOCODER_RATE, user_agent=settings.GEOCODER_USER_AGENT)
+
+
+_queue: Optional[GeocodingQueue] = None
+_queue_lock = threading.Lock()
+_configured = False
+
+
+def get_queue() -> Optional[GeocodingQueue]:
+    global _queue, _configured
+    with _queue_lock:
+        if not _configured:
+            backend = make_geocoder()
+            _queue = GeocodingQueue(backend) if backend is not None else None
+            _configured = True
+        return _queue
+
+
+def set_geocoder(backend: Optional[Geocoder]) -> Optional[GeocodingQueue]:
+    """Sostituisce il geocoder del processo (None lo spegne), p.es. con uno verso un server locale."""
+    global _queue, _configured
+    with _queue_lock:
+        _queue = GeocodingQueue(backend) if backend is not None else None
+        _configured = True
+        return _queue
+
+
+def request_geocoding(places: Dict[str, Place], search_id: Optional[int] = None) -> None:
+    """Mette in coda i luoghi sconosciuti (location key -> luogo) di una ricerca; non aspetta le risposte."""
+    queue = get_queue()
+    if queue is not None and places:
+        queue.request(places, search_id)
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+
+from .fetchers import HadesFetcher, HadesResponse
+
+# "off": no cache, "live": TTL cache in front of Hades,
+# "record": always hit Hades and store every answer (no expiry),
+# "replay": serve only from the cache, never touch the network (offline benchmarks)
+HADES_CACHE_MODE = "live"
+HADES_CACHE_TTL = 5 * 60
+HADES_CACHE_MAX_BYTES = 64 * 1024 * 1024
+HADES_CACHE_PATH: Optional[Path] = None  # defaults to BASE_DIR / "hades_cache.sqlite3"
+
+# Only these params identify a Hades page
+CACHE_KEY_PARAMS = ("q", "start", "lim", "qso", "sh", "sort")
+
+MODE_OFF = "off"
+MODE_LIVE = "live"
+MODE_RECORD = "record"
+MODE_REPLAY = "replay"
+
+
+def cache_key(params: Dict[str, Any]) -> str:
+    return json.dumps({k: str(params[k]) for k in CACHE_KEY_PARAMS if k in params}, sort_keys=True)
+
+
+class HadesCache:
+    """
+    Cache su disco (SQLite) delle risposte Hades, con TTL per voce e
+    sfratto LRU quando si supera `max_bytes`. I corpi sono JSON compressi.
+    """
+
+    def __init__(self, path: Path, ttl: float = HADES_CACHE_TTL, max_bytes: int = HADES_CACHE_MAX_BYTES,
+                 mode: str = MODE_LIVE):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.mode = mode
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, status INTEGER NOT NULL, body BLOB NOT NULL, size INTEGER NOT NULL,"
+            " expires_at REAL, last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+
+    def get(self, key: str) -> Optional[HadesResponse]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT status, body, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            # Replay ignores expiry: the recorded set is the fixture
+            if row is None or (self.mode != MODE_REPLAY and row[2] is not None and row[2] <= now):
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return HadesResponse(row[0], json.loads(zlib.decompress(row[1])), {})
+
+    def put(self, key: str, response: HadesResponse) -> None:
+        if not response.ok:
+            return
+        body = zlib.compress(json.dumps(response.payload).encode())
+        now = time.time()
+        expires_at = None if self.mode == MODE_RECORD else now + self.ttl
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, status, body, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, response.status, body, len(body), expires_at, now),
+            )
+            self.stores += 1
+            self._evict()
+
+    def _evict(self) -> None:
+        # Expired entries first, then least recently used until we fit in max_bytes
+        cur = self._db.execute("DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+        self.evictions += cur.rowcount
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {
+            "mode": self.mode, "entries": entries, "bytes": size,
+            "hits": self.hits, "misses": self.misses, "stores": self.stores, "evictions": self.evictions,
+        }
+
+
+class CachedFetcher(HadesFetcher):
+    """Mette la cache davanti a un altro fetcher, mantenendone il backend."""
+
+    def __init__(self, inner: Optional[HadesFetcher], cache: HadesCache):
+        self.inner = inner
+        self.cache = cache
+        self.backend = inner.backend if inner is not None else "cache"
+
+    async def get(self, params: Dict[str, Any]) -> HadesResponse:
+        key = cache_key(params)
+        if self.cache.mode != MODE_RECORD:
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                return cached
+        if self.inner is None:
+            # Replay miss: no network, report it like a gateway timeout
+            return HadesResponse(504, None, {})
+        response = await self.inner.get(params)
+        await asyncio.to_thread(self.cache.put, key, response)
+        return response
+
+
+_cache: Optional[HadesCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[HadesCache]:
+    """La cache di processo, o None se HADES_CACHE_MODE è "off"."""
+    global _cache
+    if HADES_CACHE_MODE == MODE_OFF:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            path = HADES_CACHE_PATH or Path(settings.BASE_DIR) / "hades_cache.sqlite3"
+            _cache = HadesCache(path, mode=HADES_CACHE_MODE)
+        return _cache
+
+
+def with_cache(fetcher: Optional[HadesFetcher]) -> Optional[HadesFetcher]:
+    cache = get_cache()
+    if cache is None:
+        return fetcher
+    return CachedFetcher(fetcher, cache)
+
+
+def replaying() -> bool:
+    return HADES_CACHE_MODE == MODE_REPLAY
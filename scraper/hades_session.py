@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from playwright.async_api import BrowserContext
+
+BASE_SITE = "https://www.subito.it"
+
+# How long a bootstrapped cookie jar is reused before we reload the site
+SESSION_TTL = 30 * 60
+
+# Hades answers with these when the cookies are missing, stale or flagged
+BLOCKED_STATUSES = (401, 403)
+
+
+class HadesSession:
+    """Cookie jar e header ottenuti caricando subito.it in Chromium."""
+
+    def __init__(self, cookies: List[Dict[str, Any]], headers: Dict[str, str]):
+        self.cookies = cookies
+        self.headers = headers
+        self.created_at = time.monotonic()
+
+    def expired(self, ttl: float) -> bool:
+        return time.monotonic() - self.created_at >= ttl
+
+
+async def bootstrap(context: BrowserContext, search_url: str) -> HadesSession:
+    """
+    Carica la home e la pagina di ricerca per far impostare i cookie
+    che Hades richiede, poi li cattura insieme agli header del browser.
+    """
+    page = await context.new_page()
+    try:
+        await page.goto(BASE_SITE, wait_until="networkidle", timeout=60000)
+        await asyncio.sleep(1.0)
+        await page.goto(search_url, wait_until="networkidle", timeout=60000)
+        await asyncio.sleep(1.5)
+        user_agent = await page.evaluate("navigator.userAgent")
+    finally:
+        await page.close()
+
+    headers = {
+        "User-Agent": user_agent,
+        "Accept": "application/json",
+        "Accept-Language": "it-IT,it;q=0.9",
+        "Origin": BASE_SITE,
+        "Referer": BASE_SITE + "/",
+    }
+    return HadesSession(await context.cookies(), headers)
+
+
+class SessionCache:
+    """
+    Cache di processo della sessione Hades, con TTL.
+    Il bootstrap completo gira solo alla scadenza o quando Hades risponde
+    con uno stato di blocco (vedi `invalidate`).
+    """
+
+    def __init__(self, ttl: float = SESSION_TTL):
+        self.ttl = ttl
+        self._session: Optional[HadesSession] = None
+        self._lock = threading.Lock()
+        self._bootstrap_lock: Optional[asyncio.Lock] = None
+
+    def get(self) -> Optional[HadesSession]:
+        with self._lock:
+            session = self._session
+        if session is None or session.expired(self.ttl):
+            return None
+        return session
+
+    def invalidate(self, stale: Optional[HadesSession] = None) -> None:
+        # Only drop the session the caller saw fail, not a fresher one
+        with self._lock:
+            if stale is None or self._session is stale:
+                self._session = None
+
+    async def ensure(self, browser_context: Callable[[], Awaitable[BrowserContext]], search_url: str) -> HadesSession:
+        """
+        Ritorna una sessione valida. `browser_context` viene chiamato solo se
+        serve un bootstrap, così le ricerche servite dalla cache non
+        occupano un browser del pool.
+        """
+        if self._bootstrap_lock is None:
+            self._bootstrap_lock = asyncio.Lock()
+
+        # Single-flight: concurrent searches wait for one bootstrap
+        async with self._bootstrap_lock:
+            session = self.get()
+            if session is None:
+                session = await bootstrap(await browser_context(), search_url)
+                with self._lock:
+                    self._session = session
+        return session
+
+
+session_cache = SessionCache()
@@ -0,0 +1,141 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Dict, Iterator, Optional, Set
+
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from .models import SearchJob
+from .services import SearchProgress, run_search
+
+# Searches crawled at the same time by this process
+JOB_WORKERS = 4
+
+# How often running jobs write their progress to the DB
+PROGRESS_FLUSH_INTERVAL = 1.0
+
+# Queued/running jobs not touched for this long died with their process (restart, crash)
+JOB_STALE_AFTER = 5 * 60
+JOB_STALE_ERROR = "Interrupted: the server was restarted while the search was running"
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="search-job")
+
+# job id -> live progress, for jobs running in this process
+_active: Dict[int, SearchProgress] = {}
+# Jobs waiting for a worker of this process
+_queued: Set[int] = set()
+_active_lock = threading.Lock()
+_flusher_started = False
+
+
+def _save_progress(job_id: int, progress: SearchProgress) -> None:
+    # Only while running, so a late flush can't overwrite the final state
+    SearchJob.objects.filter(pk=job_id, status=SearchJob.STATUS_RUNNING).update(
+        pages_done=progress.pages_done,
+        pages_total=progress.pages_total,
+        items_count=progress.items,
+        pages_failed=len(progress.failed_pages),
+        search_query_id=progress.search_id,
+        # update() skips auto_now: this is the heartbeat fail_stale_jobs looks at
+        updated_at=timezone.now(),
+    )
+
+
+def _flush_loop() -> None:
+    while True:
+        time.sleep(PROGRESS_FLUSH_INTERVAL)
+        with _active_lock:
+            snapshot = list(_active.items())
+            queued = list(_queued)
+        try:
+            for job_id, progress in snapshot:
+                _save_progress(job_id, progress)
+            if queued:
+                SearchJob.objects.filter(pk__in=queued, status=SearchJob.STATUS_QUEUED).update(
+                    updated_at=timezone.now())
+        except Exception:
+            # Progress is best effort, the final state is written by the job itself
+            pass
+        finally:
+            close_old_connections()
+
+
+def _ensure_flusher() -> None:
+    global _flusher_started
+    with _active_lock:
+        if _flusher_started:
+            return
+        _flusher_started = True
+    threading.Thread(target=_flush_loop, name="search-job-progress", daemon=True).start()
+
+
+@contextmanager
+def tracking(job_id: int, progress: SearchProgress) -> Iterator[None]:
+    """Finché dura, il progresso del job viene salvato su DB, e il job risulta vivo."""
+    _ensure_flusher()
+    with _active_lock:
+        _active[job_id] = progress
+    try:
+        yield
+    finally:
+        with _active_lock:
+            _active.pop(job_id, None)
+
+
+def fail_stale_jobs(pk: Optional[int] = None, max_age: float = JOB_STALE_AFTER) -> int:
+    """
+    Segna come falliti i job in coda o in corso che nessun processo aggiorna
+    da più di `max_age` secondi (il loro processo è stato riavviato), o solo
+    il job `pk`. Restituisce quanti job sono stati chiusi.
+    """
+    now = timezone.now()
+    jobs = SearchJob.objects.filter(status__in=[SearchJob.STATUS_QUEUED, SearchJob.STATUS_RUNNING],
+                                    updated_at__lt=now - timedelta(seconds=max_age))
+    if pk is not None:
+        jobs = jobs.filter(pk=pk)
+    with _active_lock:
+        alive = set(_active) | _queued
+    return jobs.exclude(pk__in=alive).update(status=SearchJob.STATUS_FAILED, error=JOB_STALE_ERROR, updated_at=now)
+
+
+def _run_job(job_id: int) -> None:
+    progress = SearchProgress()
+    job = SearchJob.objects.get(pk=job_id)
+    job.status = SearchJob.STATUS_RUNNING
+    job.save(update_fields=['status', 'updated_at'])
+    try:
+        with tracking(job_id, progress):
+            # run_search saves the rows as Item of progress.search_id
+            items_list = run_search(job.query, limit=job.limit, title_only=job.title_only,
+                                    shippable_only=job.shippable_only, progress=progress,
+                                    incremental=job.incremental)
+
+        job.items_count = len(items_list)
+        job.status = SearchJob.STATUS_DONE
+    except Exception as e:
+        job.status = SearchJob.STATUS_FAILED
+        job.error = str(e)
+    finally:
+        with _active_lock:
+            _queued.discard(job_id)
+        job.pages_done = progress.pages_done
+        job.pages_total = progress.pages_total
+        job.pages_failed = len(progress.failed_pages)
+        job.search_query_id = progress.search_id
+        job.save()
+        connection.close()
+
+
+def submit_search(query: str, limit: int = 35, title_only: bool = False, shippable_only: bool = False,
+                  incremental: bool = False) -> SearchJob:
+    """Crea un job di ricerca e lo mette in coda sui worker del processo."""
+    job = SearchJob.objects.create(query=query, limit=limit, title_only=title_only, shippable_only=shippable_only,
+                                   incremental=incremental)
+    with _active_lock:
+        _queued.add(job.pk)
+    _ensure_flusher()
+    _executor.submit(_run_job, job.pk)
+    return job
@@ -0,0 +1,87 @@
+import re
+from typing import Any, Dict, List
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Listing
+from .text_flags import normalize_text
+
+# FTS5 table created by migration 0013 (SQLite only)
+FTS_TABLE = "scraper_listing_fts"
+
+# bm25 weights: a hit in the title counts as much as ten in the description
+FTS_WEIGHTS = (10.0, 1.0)
+SNIPPET_TOKENS = 16
+LOCAL_SEARCH_LIMIT = 50
+
+# Highlight markers: control chars that can't come from Subito text, swapped for <mark> after escaping
+_MARK_START = "\x02"
+_MARK_END = "\x03"
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def fts_available() -> bool:
+    return connection.vendor == "sqlite"
+
+
+def fts_query(text: str) -> str:
+    """
+    Query MATCH da testo libero: stessa normalizzazione di text_flags,
+    tutti i termini in AND, l'ultimo anche come prefisso (ricerca mentre si scrive).
+    """
+    tokens = _TOKEN_RE.findall(normalize_text(text))
+    if not tokens:
+        return ""
+    terms = [f'"{t}"' for t in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def _highlight(snippet: str) -> str:
+    html = escape(snippet or "").replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+    return mark_safe(html)
+
+
+def search_listings(text: str, limit: int = LOCAL_SEARCH_LIMIT) -> List[Dict[str, Any]]:
+    """
+    Cerca negli annunci già scaricati (titolo + descrizione), senza toccare
+    Subito. Su SQLite usa l'indice FTS5 con ranking bm25 e snippet evidenziati.
+    """
+    match = fts_query(text)
+    if not match:
+        return []
+
+    if not fts_available():
+        # No FTS index: plain substring match, newest first, no ranking
+        terms = normalize_text(text).split()
+        q = Q()
+        for term in terms:
+            q &= Q(title__icontains=term) | Q(description__icontains=term)
+        rows = list(Listing.objects.filter(q).order_by('-last_seen').values(
+            'subito_id', 'title', 'url', 'image_url', 'price_num', 'price_str', 'description')[:limit])
+        for row in rows:
+            row['snippet'] = escape(row.pop('description')[:200])
+            row['rank'] = None
+        return rows
+
+    sql = f"""
+        SELECT l.subito_id, l.title, l.url, l.image_url, l.price_num, l.price_str,
+               snippet({FTS_TABLE}, -1, %s, %s, '…', %s) AS snippet,
+               bm25({FTS_TABLE}, %s, %s) AS rank
+        FROM {FTS_TABLE}
+        JOIN scraper_listing l ON l.id = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH %s
+        ORDER BY rank
+        LIMIT %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [_MARK_START, _MARK_END, SNIPPET_TOKENS, *FTS_WEIGHTS, match, limit])
+        columns = [col[0] for col in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    for row in rows:
+        row['snippet'] = _highlight(row['snippet'])
+    return rows
@@ -0,0 +1,46 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from scraper.gazetteer import GAZETTEER_PATH
+
+
+class Command(BaseCommand):
+    help = ("Rigenera data/gazetteer.tsv con l'elenco completo dei comuni, da un CSV con nome, provincia, "
+            "regione e coordinate. Province e regioni del file attuale restano.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file')
+        parser.add_argument('--delimiter', default=',')
+        parser.add_argument('--name-column', default='name')
+        parser.add_argument('--province-column', default='province')
+        parser.add_argument('--region-column', default='region')
+        parser.add_argument('--lat-column', default='lat')
+        parser.add_argument('--lon-column', default='lon')
+        parser.add_argument('--output', '-o', default=str(GAZETTEER_PATH))
+
+    def handle(self, *args, **options):
+        columns = [options[f'{c}_column'] for c in ('name', 'province', 'region', 'lat', 'lon')]
+        towns = []
+        with open(options['csv_file'], encoding='utf-8-sig', newline='') as f:
+            reader = csv.DictReader(f, delimiter=options['delimiter'])
+            missing = [c for c in columns if c not in (reader.fieldnames or ())]
+            if missing:
+                raise CommandError(f"Missing columns: {', '.join(missing)}")
+            for row in reader:
+                name, province, region, lat, lon = (row[c].strip() for c in columns)
+                try:
+                    lat, lon = float(lat.replace(',', '.')), float(lon.replace(',', '.'))
+                except ValueError:
+                    continue
+                if name:
+                    towns.append(f"town\t{name}\t{province}\t{region}\t{lat:.4f}\t{lon:.4f}")
+        if not towns:
+            raise CommandError("No towns with coordinates in the file")
+
+        # Header comments, regions and provinces come from the current file
+        with open(GAZETTEER_PATH, encoding='utf-8') as f:
+            kept = [line.rstrip('\n') for line in f if line.strip() and not line.startswith('town\t')]
+        with open(options['output'], 'w', encoding='utf-8') as out:
+            out.write("\n".join(kept + sorted(towns, key=str.lower)) + "\n")
+        self.stdout.write(f"{len(towns)} towns written to {options['output']}")
@@ -0,0 +1,39 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from scraper.export import EXPORT_FORMATS, available_formats, iter_export
+from scraper.models import SearchQuery
+
+
+class Command(BaseCommand):
+    help = "Esporta gli annunci di una ricerca in CSV, NDJSON, Parquet o Arrow, in streaming."
+
+    def add_arguments(self, parser):
+        parser.add_argument('search_id', type=int)
+        parser.add_argument('--format', default='csv', choices=list(EXPORT_FORMATS))
+        parser.add_argument('--output', '-o', help="File di destinazione (default: stdout)")
+        parser.add_argument('--chunk-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        search_id = options['search_id']
+        fmt = options['format']
+        if not SearchQuery.objects.filter(pk=search_id).exists():
+            raise CommandError(f"Search {search_id} does not exist")
+        if fmt not in available_formats():
+            raise CommandError(f"Format '{fmt}' needs pyarrow")
+
+        kwargs = {'chunk_size': options['chunk_size']} if options['chunk_size'] else {}
+        binary = fmt not in ('csv', 'ndjson')
+        if options['output']:
+            mode = 'wb' if binary else 'w'
+            with open(options['output'], mode, **({} if binary else {'encoding': 'utf-8', 'newline': ''})) as out:
+                for chunk in iter_export(search_id, fmt, **kwargs):
+                    out.write(chunk)
+        elif binary:
+            for chunk in iter_export(search_id, fmt, **kwargs):
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+        else:
+            for chunk in iter_export(search_id, fmt, **kwargs):
+                self.stdout.write(chunk, ending='')
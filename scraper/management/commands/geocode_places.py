@@ -0,0 +1,49 @@
+from typing import Dict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from scraper import geocoder
+from scraper.geo import Place, resolve_places
+from scraper.models import GeoCache, Item
+
+
+class Command(BaseCommand):
+    help = ("Chiede al geocoder esterno i luoghi degli annunci salvati che non sono né nel gazetteer né in "
+            "GeoCache, e aspetta le risposte. Utile per le ricerche fatte prima che il geocoder ci fosse.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--search', type=int, action='append', dest='searches',
+                            help="Solo questa ricerca (ripetibile)")
+        parser.add_argument('--url', help="Server compatibile con Nominatim (default: GEOCODER_URL)")
+
+    def handle(self, *args, **options):
+        if options['url']:
+            if geocoder.httpx is None:
+                raise CommandError("The external geocoder needs httpx")
+            queue = geocoder.set_geocoder(geocoder.make_geocoder(options['url']))
+        else:
+            queue = geocoder.get_queue()
+        if queue is None:
+            raise CommandError("The external geocoder is turned off (GEOCODER_BACKEND, GEOCODER_URL) "
+                               "or httpx is missing")
+
+        rows = Item.objects.all()
+        if options['searches']:
+            rows = rows.filter(search_query_id__in=options['searches'])
+        by_search = {}
+        for search_id, *place in rows.values_list('search_query_id', 'town', 'province', 'region').distinct():
+            by_search.setdefault(search_id, []).append(tuple(place))
+
+        queued = set()
+        for search_id, places in by_search.items():
+            unresolved: Dict[str, Place] = {}
+            resolve_places(places, unresolved)
+            queue.request(unresolved, search_id)
+            queued.update(unresolved)
+        self.stdout.write(f"{len(queued)} places queued")
+        queue.join()
+
+        results = GeoCache.objects.filter(location_key__in=queued)
+        found = results.filter(found=True).count()
+        self.stdout.write(f"{found} found, {results.count() - found} unknown, "
+                          f"{len(queued) - results.count()} to retry")
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.6 on 2026-10-18 07:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0007_searchjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchjob',
+            name='incremental',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='CrawlState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=255)),
+                ('title_only', models.BooleanField(default=False)),
+                ('shippable_only', models.BooleanField(default=False)),
+                ('items', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('query', 'title_only', 'shippable_only'), name='unique_crawl_state')],
+            },
+        ),
+    ]
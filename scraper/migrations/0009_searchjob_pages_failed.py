@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 07:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0008_crawlstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchjob',
+            name='pages_failed',
+            field=models.IntegerField(default=0),
+        ),
+    ]
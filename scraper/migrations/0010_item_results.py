@@ -0,0 +1,32 @@
+# Generated by Django 5.1.6 on 2026-10-18 07:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0009_searchjob_pages_failed'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='searchjob',
+            name='results',
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='defect_flag',
+            field=models.CharField(blank=True, default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='defect_reason',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='description',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
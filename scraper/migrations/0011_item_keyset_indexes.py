@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-18 07:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0010_item_results'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['search_query', 'date_pub_iso', 'id'], name='item_search_date'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['search_query', 'price_num', 'id'], name='item_search_price'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['search_query', 'shippable', 'date_pub_iso', 'id'], name='item_search_ship_date'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['search_query', 'shippable', 'price_num', 'id'], name='item_search_ship_price'),
+        ),
+    ]
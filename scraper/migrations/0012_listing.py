@@ -0,0 +1,108 @@
+# Generated by Django 5.1.6 on 2026-10-18 07:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def items_to_listings(apps, schema_editor):
+    # One Listing per subito_id, filled from its most recent Item
+    Item = apps.get_model('scraper', 'Item')
+    Listing = apps.get_model('scraper', 'Listing')
+    listings = {}
+    for item in Item.objects.order_by('id').iterator():
+        listing = listings.get(item.subito_id)
+        if listing is None:
+            listing = listings[item.subito_id] = Listing.objects.create(
+                subito_id=item.subito_id, title=item.title, url=item.url)
+        for field in ('title', 'date_pub', 'likes_count', 'image_url', 'url', 'description', 'defect_reason',
+                      'price_str', 'price_num'):
+            setattr(listing, field, getattr(item, field))
+        item.listing = listing
+        item.save(update_fields=['listing'])
+    for listing in listings.values():
+        listing.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0011_item_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Listing',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subito_id', models.CharField(max_length=255, unique=True)),
+                ('title', models.CharField(max_length=255)),
+                ('date_pub', models.CharField(blank=True, max_length=100, null=True)),
+                ('likes_count', models.IntegerField(blank=True, default=0, null=True)),
+                ('image_url', models.URLField(blank=True, max_length=1000, null=True)),
+                ('url', models.URLField(max_length=1000)),
+                ('description', models.TextField(blank=True, default='')),
+                ('defect_reason', models.CharField(blank=True, default='', max_length=255)),
+                ('price_str', models.CharField(blank=True, max_length=50, null=True)),
+                ('price_num', models.FloatField(blank=True, null=True)),
+                ('previous_price', models.FloatField(blank=True, null=True)),
+                ('first_seen', models.DateTimeField(auto_now_add=True)),
+                ('last_seen', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='listing',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='items', to='scraper.listing'),
+        ),
+        migrations.CreateModel(
+            name='PriceObservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price_num', models.FloatField(blank=True, null=True)),
+                ('observed_at', models.DateTimeField(auto_now_add=True)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prices', to='scraper.listing')),
+                ('search_query', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='price_observations', to='scraper.searchquery')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['listing', 'observed_at'], name='price_obs_listing')],
+            },
+        ),
+        migrations.RunPython(items_to_listings, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='item',
+            name='date_pub',
+        ),
+        migrations.RemoveField(
+            model_name='item',
+            name='defect_reason',
+        ),
+        migrations.RemoveField(
+            model_name='item',
+            name='description',
+        ),
+        migrations.RemoveField(
+            model_name='item',
+            name='image_url',
+        ),
+        migrations.RemoveField(
+            model_name='item',
+            name='likes_count',
+        ),
+        migrations.RemoveField(
+            model_name='item',
+            name='subito_id',
+        ),
+        migrations.RemoveField(
+            model_name='item',
+            name='title',
+        ),
+        migrations.RemoveField(
+            model_name='item',
+            name='url',
+        ),
+        migrations.AlterField(
+            model_name='item',
+            name='listing',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='scraper.listing'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:00
+
+from django.db import migrations
+
+# External-content FTS5 index over Listing, kept in sync by triggers.
+# SQLite only: other backends fall back to icontains in local_search.
+FTS_CREATE = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS scraper_listing_fts USING fts5(
+        title, description,
+        content='scraper_listing', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS scraper_listing_fts_ai AFTER INSERT ON scraper_listing BEGIN
+        INSERT INTO scraper_listing_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS scraper_listing_fts_ad AFTER DELETE ON scraper_listing BEGIN
+        INSERT INTO scraper_listing_fts (scraper_listing_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS scraper_listing_fts_au AFTER UPDATE OF title, description ON scraper_listing BEGIN
+        INSERT INTO scraper_listing_fts (scraper_listing_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO scraper_listing_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    "INSERT INTO scraper_listing_fts (scraper_listing_fts) VALUES ('rebuild')",
+]
+
+FTS_DROP = [
+    "DROP TRIGGER IF EXISTS scraper_listing_fts_ai",
+    "DROP TRIGGER IF EXISTS scraper_listing_fts_ad",
+    "DROP TRIGGER IF EXISTS scraper_listing_fts_au",
+    "DROP TABLE IF EXISTS scraper_listing_fts",
+]
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in FTS_CREATE:
+        schema_editor.execute(sql)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in FTS_DROP:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0012_listing'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.6 on 2026-10-18 07:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0013_listing_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.BinaryField()),
+                ('size', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now=True)),
+                ('search_query', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='snapshot', to='scraper.searchquery')),
+            ],
+        ),
+    ]
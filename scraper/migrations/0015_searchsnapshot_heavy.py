@@ -0,0 +1,24 @@
+# Generated by Django 5.1.6 on 2026-10-18 07:47
+
+from django.db import migrations, models
+
+
+def drop_old_snapshots(apps, schema_editor):
+    # Version 1 snapshots can't be read any more; without one, results come from the DB
+    apps.get_model('scraper', 'SearchSnapshot').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0014_searchsnapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_old_snapshots, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='searchsnapshot',
+            name='heavy',
+            field=models.BinaryField(default=b''),
+        ),
+    ]
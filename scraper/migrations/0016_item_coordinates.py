@@ -0,0 +1,103 @@
+# Generated by Django 5.1.6 on 2026-10-18 07:58
+
+import re
+import unicodedata
+from pathlib import Path
+
+from django.db import migrations, models
+
+# Frozen copy of the scraper.gazetteer lookup as of this migration, so later changes there can't break it
+GAZETTEER_PATH = Path(__file__).resolve().parent.parent / 'data' / 'gazetteer.tsv'
+PLACE_ALIASES = {
+    'monza e brianza': 'monza e della brianza',
+    'monza brianza': 'monza e della brianza',
+    'pesaro urbino': 'pesaro e urbino',
+    'bolzano bozen': 'bolzano',
+    'bozen': 'bolzano',
+    'reggio nell emilia': 'reggio emilia',
+    'reggio di calabria': 'reggio calabria',
+    'valle d aosta vallee d aoste': 'valle d aosta',
+    'trentino alto adige sudtirol': 'trentino alto adige',
+}
+NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+BATCH_SIZE = 2000
+
+
+def normalize_place(name):
+    if not name:
+        return ''
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(c for c in name if not unicodedata.combining(c)).lower()
+    name = NON_ALNUM_RE.sub(' ', name).strip()
+    return PLACE_ALIASES.get(name, name)
+
+
+def read_places():
+    """(kind, name) -> [(province, (lat, lon))], from the gazetteer file if it is there."""
+    places = {}
+    try:
+        f = open(GAZETTEER_PATH, encoding='utf-8')
+    except OSError:
+        return places
+    with f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if line.startswith('#') or len(fields) != 6:
+                continue
+            kind, name, province, _region, lat, lon = fields
+            places.setdefault((kind, normalize_place(name)), []).append(
+                (normalize_place(province), (float(lat), float(lon))))
+    return places
+
+
+def resolve(places, town, province, region):
+    """The town, else the province capital, else the region centre."""
+    province = normalize_place(province)
+    for kind, name, in_province in (('town', town, province), ('province', province, ''), ('region', region, '')):
+        for candidate, coords in places.get((kind, normalize_place(name)), ()):
+            if not in_province or candidate in ('', in_province):
+                return coords
+    return None
+
+
+def locate_items(apps, schema_editor):
+    # Offline gazetteer only; GeoCache entries are picked up by new searches
+    places = read_places()
+    if not places:
+        return
+    Item = apps.get_model('scraper', 'Item')
+    resolved = {}
+    batch = []
+    for item in Item.objects.only('town', 'province', 'region').iterator(chunk_size=BATCH_SIZE):
+        key = (item.town, item.province, item.region)
+        if key not in resolved:
+            resolved[key] = resolve(places, *key)
+        if resolved[key] is not None:
+            item.latitude, item.longitude = resolved[key]
+            batch.append(item)
+        if len(batch) >= BATCH_SIZE:
+            Item.objects.bulk_update(batch, ['latitude', 'longitude'], batch_size=500)
+            batch = []
+    if batch:
+        Item.objects.bulk_update(batch, ['latitude', 'longitude'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0015_searchsnapshot_heavy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(locate_items, migrations.RunPython.noop),
+    ]
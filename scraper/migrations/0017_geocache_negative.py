@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0016_item_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='geocache',
+            name='found',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AlterField(
+            model_name='geocache',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='geocache',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0017_geocache_negative'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='crawlstate',
+            name='items',
+        ),
+        migrations.AddField(
+            model_name='crawlstate',
+            name='search_query',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='crawl_states', to='scraper.searchquery'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0019_cacheversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchsnapshot',
+            name='version',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -11,15 +11,59 @@ class SearchQuery(models.Model):
     def __str__(self):
         return self.query
 
+class Listing(models.Model):
+    """Un annuncio Subito, unico per subito_id e condiviso da tutte le ricerche che lo trovano."""
+    subito_id = models.CharField(max_length=255, unique=True)
+    title = models.CharField(max_length=255)
+    date_pub = models.CharField(max_length=100, blank=True, null=True)
+    likes_count = models.IntegerField(default=0, blank=True, null=True)
+
+    # Media
+    image_url = models.URLField(max_length=1000, blank=True, null=True)
+    url = models.URLField(max_length=1000)
+
+    # Text / defects
+    description = models.TextField(blank=True, default='')
+    defect_reason = models.CharField(max_length=255, blank=True, default='')
+
+    # Latest price, and the one before it changed ("price dropped" = price_num < previous_price)
+    price_str = models.CharField(max_length=50, blank=True, null=True)
+    price_num = models.FloatField(blank=True, null=True)
+    previous_price = models.FloatField(blank=True, null=True)
+
+    first_seen = models.DateTimeField(auto_now_add=True)
+    last_seen = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.title
+
+class PriceObservation(models.Model):
+    """Storico prezzi append-only: una riga solo quando il prezzo di un annuncio cambia."""
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='prices')
+    search_query = models.ForeignKey(SearchQuery, on_delete=models.SET_NULL, related_name='price_observations', blank=True, null=True)
+    price_num = models.FloatField(blank=True, null=True)
+    observed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['listing', 'observed_at'], name='price_obs_listing'),
+        ]
+
+    def __str__(self):
+        return f"{self.listing_id}: {self.price_num}"
+
 class Item(models.Model):
+    """
+    Un annuncio dentro una ricerca. Il contenuto sta in Listing; qui restano
+    solo le colonne con cui i risultati si ordinano e si filtrano, come erano
+    al momento della ricerca.
+    """
     search_query = models.ForeignKey(SearchQuery, on_delete=models.CASCADE, related_name='items')
-    subito_id = models.CharField(max_length=255)
-    title = models.CharField(max_length=255)
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='items')
     price_str = models.CharField(max_length=50, blank=True, null=True)
     price_num = models.FloatField(blank=True, null=True)
     
     # Dates
-    date_pub = models.CharField(max_length=100, blank=True, null=True)
     date_pub_iso = models.DateTimeField(blank=True, null=True)
     date_expiration = models.DateTimeField(blank=True, null=True)
     
@@ -28,33 +72,116 @@ class Item(models.Model):
     region = models.CharField(max_length=100, blank=True, null=True)
     province = models.CharField(max_length=100, blank=True, null=True)
     town = models.CharField(max_length=100, blank=True, null=True)
+    # Resolved from town/province/region when the item is saved (see scraper.geo)
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
     
     # Details
     condition = models.CharField(max_length=50, blank=True, null=True)
     shipping_type = models.CharField(max_length=50, blank=True, null=True)
     shipping_cost = models.FloatField(blank=True, null=True)
     shippable = models.BooleanField(default=False)
-    likes_count = models.IntegerField(default=0, blank=True, null=True)
-    
-    # Media
-    image_url = models.URLField(max_length=1000, blank=True, null=True)
-    url = models.URLField(max_length=1000)
+    defect_flag = models.CharField(max_length=10, blank=True, default='')
     
     class Meta:
         ordering = ['-date_pub_iso']
+        indexes = [
+            # Keyset pagination of a search's results, per sort and with the shippable filter
+            models.Index(fields=['search_query', 'date_pub_iso', 'id'], name='item_search_date'),
+            models.Index(fields=['search_query', 'price_num', 'id'], name='item_search_price'),
+            models.Index(fields=['search_query', 'shippable', 'date_pub_iso', 'id'], name='item_search_ship_date'),
+            models.Index(fields=['search_query', 'shippable', 'price_num', 'id'], name='item_search_ship_price'),
+        ]
 
     def __str__(self):
-        return self.title
+        return self.listing.title
+
+class SearchSnapshot(models.Model):
+    """Risultato compatto (colonnare, compresso) di una ricerca conclusa; vedi scraper.snapshot."""
+    search_query = models.OneToOneField(SearchQuery, on_delete=models.CASCADE, related_name='snapshot')
+    data = models.BinaryField()
+    heavy = models.BinaryField(default=b'')  # url, image_url, description; read only on demand
+    size = models.IntegerField(default=0)
+    # New on every rebuild; processes compare it with their in-memory copy and cache keys include it
+    version = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.search_query_id} ({self.size} bytes)"
+
+class SearchJob(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    query = models.CharField(max_length=255)
+    limit = models.IntegerField(default=35)
+    title_only = models.BooleanField(default=False)
+    shippable_only = models.BooleanField(default=False)
+    incremental = models.BooleanField(default=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+
+    # Progress
+    pages_done = models.IntegerField(default=0)
+    pages_total = models.IntegerField(default=0)
+    items_count = models.IntegerField(default=0)
+    pages_failed = models.IntegerField(default=0)
+
+    search_query = models.ForeignKey(SearchQuery, on_delete=models.SET_NULL, related_name='jobs', blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def finished(self):
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
+
+    def __str__(self):
+        return f"{self.query} ({self.status})"
+
+class CrawlState(models.Model):
+    """Ultimo risultato completo di una ricerca, base per i re-crawl incrementali."""
+    query = models.CharField(max_length=255)
+    title_only = models.BooleanField(default=False)
+    shippable_only = models.BooleanField(default=False)
+    # Its Items (and their Listings) are the previous result; None means crawl everything
+    search_query = models.ForeignKey(SearchQuery, on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name='crawl_states')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['query', 'title_only', 'shippable_only'], name='unique_crawl_state'),
+        ]
+
+    def __str__(self):
+        return self.query
 
 class GeoCache(models.Model):
     location_key = models.CharField(max_length=255, unique=True, db_index=True)
-    latitude = models.FloatField()
-    longitude = models.FloatField()
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    found = models.BooleanField(default=True)  # False: the geocoder knows nothing about it, see GEO_NEGATIVE_TTL
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.location_key} ({self.latitude}, {self.longitude})"
 
+class CacheVersion(models.Model):
+    """Contatore condiviso tra i processi: chi tiene dati in memoria li rilegge quando cambia (vedi scraper.favorites)."""
+    name = models.CharField(max_length=100, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
 class Favorite(models.Model):
     subito_id = models.CharField(max_length=255, unique=True)
     title = models.CharField(max_length=255)
@@ -0,0 +1,184 @@
+import re
+from typing import Any, Dict, List, Optional
+
+from .text_flags import detect_defects
+
+_NUMBER_RE = re.compile(r"[-]?\d[\d\.\,]*")
+
+_SHIPPING_COST_URI = "/item_shipping_cost_tuttosubito"
+
+
+def safe_get(d: Dict[str, Any], path: str, default=None):
+    cur: Any = d
+    for key in path.split("."):
+        if not isinstance(cur, dict) or key not in cur:
+            return default
+        cur = cur[key]
+    return cur
+
+
+def normalize_url(ad: Dict[str, Any]) -> str:
+    for p in ("urls.default", "urls.mobile", "urls.desktop", "url"):
+        u = safe_get(ad, p)
+        if isinstance(u, str) and u.strip():
+            return u.strip()
+    return ""
+
+
+def feature_first(ad: Dict[str, Any], uri: str) -> Dict[str, Any]:
+    feats = ad.get("features")
+    if not isinstance(feats, list):
+        return {}
+    for f in feats:
+        if isinstance(f, dict) and f.get("uri") == uri:
+            vals = f.get("values")
+            if isinstance(vals, list) and vals:
+                v0 = vals[0]
+                return v0 if isinstance(v0, dict) else {}
+    return {}
+
+
+def feature_value(ad: Dict[str, Any], uri: str) -> str:
+    v0 = feature_first(ad, uri)
+    if not v0:
+        return ""
+    return str(v0.get("value") or v0.get("key") or "")
+
+
+def parse_number(value: str) -> Optional[float]:
+    if value is None:
+        return None
+    s = str(value).strip()
+    if not s:
+        return None
+
+    m = _NUMBER_RE.search(s)
+    if not m:
+        return None
+    num = m.group(0)
+
+    # formato IT: 1.234,56
+    if "." in num and "," in num:
+        num = num.replace(".", "").replace(",", ".")
+    else:
+        if "," in num:
+            num = num.replace(",", ".")
+
+    try:
+        return float(num)
+    except ValueError:
+        return None
+
+
+def first_image_url_browser(ad: Dict[str, Any]) -> str:
+    """
+    URL immagine apribile direttamente nel browser:
+    usa images[0].base_url (dominio s.sbito.it), fallback su cdn_base_url.
+    """
+    imgs = ad.get("images")
+    if not isinstance(imgs, list) or not imgs:
+        return ""
+
+    img0 = imgs[0]
+    if not isinstance(img0, dict):
+        return ""
+
+    url = str(img0.get("base_url") or img0.get("cdn_base_url") or "")
+    
+    # Fix for hotlinking: usage images.sbito.it API instead of s.sbito.it CDN
+    if "s.sbito.it/img/" in url:
+        url = url.replace("s.sbito.it/img/", "images.sbito.it/api/v1/sbt-ads-images-pro/images/")
+    
+    if url and "?" not in url:
+        url += "?rule=gallery-desktop-1x-auto"
+    return url
+
+
+def index_features(ad: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    uri -> primo valore, in una sola passata su `features`.
+    Come feature_first, vince la prima feature con una lista di valori non vuota.
+    """
+    index: Dict[str, Dict[str, Any]] = {}
+    feats = ad.get("features")
+    if not isinstance(feats, list):
+        return index
+    for f in feats:
+        if not isinstance(f, dict):
+            continue
+        uri = f.get("uri")
+        if uri in index:
+            continue
+        vals = f.get("values")
+        if isinstance(vals, list) and vals:
+            v0 = vals[0]
+            index[uri] = v0 if isinstance(v0, dict) else {}
+    return index
+
+
+def _value(v0: Dict[str, Any]) -> str:
+    if not v0:
+        return ""
+    return str(v0.get("value") or v0.get("key") or "")
+
+
+def _get(d: Any, *keys: str) -> Any:
+    for key in keys:
+        if not isinstance(d, dict) or key not in d:
+            return ""
+        d = d[key]
+    return d
+
+
+def normalize_ad(ad: Dict[str, Any]) -> Dict[str, Any]:
+    """Converte un annuncio Hades grezzo nel dict usato da viste e template."""
+    feats = index_features(ad)
+    nome = ad.get("subject") or ad.get("title") or ""
+    description = ad.get("body") or ""
+
+    price = feats.get("/price", {})
+    prezzo_str = _value(price)
+    prezzo_num = parse_number(price.get("key") or prezzo_str)
+
+    shipping_cost = feats.get(_SHIPPING_COST_URI, {})
+    costo_sped_num = parse_number(shipping_cost.get("key") or _value(shipping_cost))
+
+    # Fallback: if we have a shipping cost, it is shippable
+    spedibile = costo_sped_num is not None or _value(feats.get("/item_shippable", {})).lower() == 'true'
+
+    likes_val = 0
+    if "favorites" in ad:
+        try:
+            likes_val = int(ad["favorites"])
+        except (TypeError, ValueError, OverflowError):
+            pass
+
+    defects = detect_defects(nome, description)
+
+    return {
+        'subito_id': ad.get("urn") or "",
+        'title': nome,
+        'price_str': prezzo_str,
+        'price_num': prezzo_num,
+        'date_pub': _get(ad, "dates", "display"),
+        'date_pub_iso': _get(ad, "dates", "display_iso8601"),  # Store as string
+        'category': _get(ad, "category", "value"),
+        'region': _get(ad, "geo", "region", "value"),
+        'province': _get(ad, "geo", "city", "value"),
+        'town': _get(ad, "geo", "town", "value"),
+        'condition': _value(feats.get("/item_condition", {})),
+        'shipping_type': _value(feats.get("/item_shipping_type", {})),
+        'shipping_cost': costo_sped_num,
+        'shippable': spedibile,
+        'likes_count': likes_val,
+        'image_url': first_image_url_browser(ad),
+        'url': normalize_url(ad),
+        'description': description,
+        'defect_flag': defects['flag'],
+        'defect_reason': defects['reason'],
+    }
+
+
+def normalize_page(ads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Normalizza una pagina (o un intero risultato) in blocco."""
+    return [normalize_ad(ad) for ad in ads]
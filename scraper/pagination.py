@@ -0,0 +1,124 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.db.models import Q, QuerySet
+
+# Rows per results page
+RESULTS_PAGE_SIZE = 50
+
+# sort -> (Item field, descending). Missing prices/dates always count as the
+# lowest value, so they come first ascending and last descending; ties are
+# broken by id in the same direction.
+SORTS = {
+    'price_asc': ('price_num', False),
+    'price_desc': ('price_num', True),
+    'date_desc': ('date_pub_iso', True),
+    'date_asc': ('date_pub_iso', False),
+}
+DEFAULT_SORT = 'date_desc'
+
+
+def encode_cursor(value: Any, pk: int, position: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([value, pk, position]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, field: str) -> Optional[Tuple[Any, int, int]]:
+    """(valore, id, posizione) dell'ultima riga vista, o None se il cursore non è valido."""
+    try:
+        value, pk, position = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if value is not None:
+            value = datetime.fromisoformat(value) if field == 'date_pub_iso' else float(value)
+        return value, int(pk), int(position)
+    except (TypeError, ValueError):
+        return None
+
+
+def seek_rows(queryset: QuerySet, values: Tuple[str, ...], field: str, descending: bool,
+              key: Optional[Tuple[Any, int]], limit: int) -> List[Dict[str, Any]]:
+    """
+    Le prime `limit` righe dopo `key` = (valore, id). L'ordinamento è spezzato
+    in due segmenti, righe con `field` nullo e non nullo, così ogni query è
+    una range scan semplice sull'indice (..., field, id) senza OR su NULL.
+    """
+    cmp = 'lt' if descending else 'gt'
+    sign = '-' if descending else ''
+    segments = ('value', 'null') if descending else ('null', 'value')
+    if key is not None:
+        segments = segments[segments.index('null' if key[0] is None else 'value'):]
+
+    rows: List[Dict[str, Any]] = []
+    for i, segment in enumerate(segments):
+        part = queryset.filter(**{f'{field}__isnull': segment == 'null'})
+        if key is not None and i == 0:
+            value, pk = key
+            if segment == 'null':
+                part = part.filter(**{f'id__{cmp}': pk})
+            else:
+                # The inclusive bound drives the index seek, the OR only trims ties on `value`
+                part = part.filter(Q(**{f'{field}__{cmp}': value}) | Q(**{f'id__{cmp}': pk}),
+                                   **{f'{field}__{cmp}e': value})
+        order = (f'{sign}id',) if segment == 'null' else (f'{sign}{field}', f'{sign}id')
+        rows += part.order_by(*order).values(*values)[:limit - len(rows)]
+        if len(rows) >= limit:
+            break
+    return rows
+
+
+class KeysetPage:
+    """Una pagina di risultati con i cursori per la successiva e la precedente."""
+
+    def __init__(self, rows: List[Dict[str, Any]], start: int, next_cursor: Optional[str],
+                 prev_cursor: Optional[str]):
+        self.rows = rows
+        self.start = start  # 0-based position of the first row in the full ordering
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+
+def keyset_page(queryset: QuerySet, fields: Tuple[str, ...], sort: Optional[str] = None, after: Optional[str] = None,
+                before: Optional[str] = None, page_size: int = RESULTS_PAGE_SIZE) -> KeysetPage:
+    """
+    Paginazione a cursore (seek) su `queryset`: ogni pagina è una range scan
+    sull'indice (search_query, [shippable,] campo, id), quindi costa uguale
+    alla prima e alla centesima pagina. `after`/`before` sono i cursori
+    restituiti dalla pagina precedente.
+    """
+    field, descending = SORTS.get(sort, SORTS[DEFAULT_SORT])
+    values = tuple(dict.fromkeys(fields + ('id', field)))
+
+    backwards = False
+    start = 0
+    key = decode_cursor(after, field) if after else None
+    if key is None and before:
+        key = decode_cursor(before, field)
+        backwards = key is not None
+
+    if key is not None:
+        value, pk, position = key
+        start = position + 1
+
+    # Going back = seeking forward in the reversed ordering, then flipping the rows
+    rows = seek_rows(queryset, values, field, descending != backwards,
+                     (value, pk) if key is not None else None, page_size + 1)
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+        has_next, has_prev = True, more
+        start = position - len(rows)
+    else:
+        has_next, has_prev = more, key is not None
+
+    next_cursor = prev_cursor = None
+    if rows and has_next:
+        last = rows[-1]
+        next_cursor = encode_cursor(last[field], last['id'], start + len(rows) - 1)
+    if rows and has_prev:
+        first = rows[0]
+        prev_cursor = encode_cursor(first[field], first['id'], start)
+    return KeysetPage(rows, start, next_cursor, prev_cursor)
@@ -0,0 +1,119 @@
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+from .fetchers import HadesFetcher, HadesResponse
+from .hades_session import BLOCKED_STATUSES
+
+# Requests/second shared by every search in the process
+RATE_INITIAL = 4.0
+RATE_MIN = 0.5
+RATE_MAX = 20.0
+RATE_BURST = 4
+# AIMD: add this much rate per healthy response, multiply by this on throttling
+RATE_INCREASE = 0.2
+RATE_DECREASE = 0.5
+
+# Retries per page, with jittered exponential backoff
+RETRY_ATTEMPTS = 4
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 30.0
+
+
+def retry_after_seconds(headers: Dict[str, str]) -> Optional[float]:
+    value = {k.lower(): v for k, v in (headers or {}).items()}.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(status: int) -> bool:
+    return status == 429 or status >= 500
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket (in forma GCRA) con rate adattivo: cresce di poco a ogni
+    risposta sana, si dimezza su 429/5xx e si ferma del tutto per il
+    Retry-After indicato da Hades.
+    Va usato da un solo event loop (quello del pool browser), quindi non
+    servono lock: tra lettura e scrittura dello stato non c'è nessun await.
+    """
+
+    def __init__(self, rate: float = RATE_INITIAL, min_rate: float = RATE_MIN, max_rate: float = RATE_MAX,
+                 burst: int = RATE_BURST):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = max(1, burst)
+        self._tat = 0.0  # theoretical arrival time of the next request
+        self._paused_until = 0.0
+
+    async def acquire(self) -> None:
+        now = time.monotonic()
+        interval = 1.0 / self.rate
+        ready = max(now, self._paused_until)
+        tat = max(self._tat, ready)
+        start = max(ready, tat - (self.burst - 1) * interval)
+        self._tat = tat + interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def on_success(self) -> None:
+        self.rate = min(self.max_rate, self.rate + RATE_INCREASE)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        self.rate = max(self.min_rate, self.rate * RATE_DECREASE)
+        if retry_after:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+
+class RetryingFetcher(HadesFetcher):
+    """
+    Passa ogni richiesta dal rate limiter e ritenta 429/5xx ed errori di
+    rete con backoff esponenziale e jitter. Gli stati di blocco (401/403)
+    tornano subito al chiamante, che rifà il bootstrap.
+    """
+
+    def __init__(self, inner: HadesFetcher, limiter: AdaptiveRateLimiter, attempts: int = RETRY_ATTEMPTS):
+        self.inner = inner
+        self.limiter = limiter
+        self.attempts = attempts
+        self.backend = inner.backend
+
+    async def get(self, params: Dict[str, Any]) -> HadesResponse:
+        response = HadesResponse(0, None, {})
+        for attempt in range(self.attempts + 1):
+            await self.limiter.acquire()
+            retry_after = None
+            try:
+                response = await self.inner.get(params)
+            except Exception:
+                # Network error from either backend: treat like a 5xx
+                response = HadesResponse(0, None, {})
+                self.limiter.on_throttle()
+            else:
+                if response.ok:
+                    self.limiter.on_success()
+                    return response
+                if response.status in BLOCKED_STATUSES or not is_retryable(response.status):
+                    return response
+                retry_after = retry_after_seconds(response.headers)
+                self.limiter.on_throttle(retry_after)
+
+            if attempt < self.attempts:
+                backoff = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt)
+                await asyncio.sleep(max(retry_after or 0.0, random.uniform(0, backoff)))
+        return response
+
+
+limiter = AdaptiveRateLimiter()
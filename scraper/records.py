@@ -0,0 +1,40 @@
+from datetime import datetime
+from typing import Any, Dict
+
+# What a results row / map marker needs; description and the other heavy
+# fields stay in the snapshot (or Listing) and are fetched on demand
+ROW_FIELDS = (
+    'id', 'subito_id', 'title', 'price_str', 'price_num', 'previous_price', 'date_pub', 'date_pub_iso',
+    'region', 'province', 'town', 'condition', 'shipping_cost', 'shippable', 'defect_flag', 'defect_reason',
+    'url', 'image_url',
+)
+
+
+class ResultRow:
+    """
+    Una riga dei risultati, senza la descrizione: __slots__ invece di un dict
+    per annuncio, così una pagina (o la mappa) tiene in memoria solo i campi
+    che mostra. `id` è l'Item, usato per chiedere i dettagli pesanti.
+    """
+
+    __slots__ = ROW_FIELDS + ('is_favorite', 'distance')
+
+    def __init__(self, **fields: Any):
+        for name in ROW_FIELDS:
+            setattr(self, name, fields.get(name))
+        self.is_favorite = fields.get('is_favorite', False)
+        self.distance = fields.get('distance')  # km from the place asked for, if any
+
+    @classmethod
+    def from_dict(cls, item: Dict[str, Any]) -> "ResultRow":
+        """Da un annuncio normalizzato (date ISO come stringa) o da una riga values()."""
+        row = cls(**item)
+        if isinstance(row.date_pub_iso, str):
+            try:
+                row.date_pub_iso = datetime.fromisoformat(row.date_pub_iso) if row.date_pub_iso else None
+            except ValueError:
+                row.date_pub_iso = None
+        return row
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
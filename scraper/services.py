@@ -1,31 +1,28 @@
-import time
-import json
-import re
-from typing import Any, Dict, List, Optional
+import asyncio
+import queue
+from contextlib import AsyncExitStack
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple
 from urllib.parse import quote_plus
 from datetime import datetime
-from playwright.sync_api import sync_playwright
-from .models import SearchQuery # Re-enabled for History
-
-BASE_SITE = "https://www.subito.it"
-HADES_URL = "https://hades.subito.it/v1/search/items"
+from playwright.async_api import BrowserContext
+from .browser_pool import get_pool
+from .fetchers import HadesFetcher, HadesResponse, PlaywrightFetcher, http_fetcher
+from .hades_cache import replaying, with_cache
+from .rate_limit import RetryingFetcher, limiter
+from .hades_session import BLOCKED_STATUSES, HadesSession, session_cache
+from .models import CrawlState, Item, Listing, PriceObservation, SearchQuery # Re-enabled for History
+from .geo import Place, resolve_places
+from .geocoder import request_geocoding
+from .snapshot import store_snapshot
+from .normalizer import normalize_ad, normalize_page, normalize_url
 
 SEARCH_TEMPLATE = "https://www.subito.it/annunci-italia/vendita/?q={q}"
 
-def safe_get(d: Dict[str, Any], path: str, default=None):
-    cur: Any = d
-    for key in path.split("."):
-        if not isinstance(cur, dict) or key not in cur:
-            return default
-        cur = cur[key]
-    return cur
-
-def normalize_url(ad: Dict[str, Any]) -> str:
-    for p in ("urls.default", "urls.mobile", "urls.desktop", "url"):
-        u = safe_get(ad, p)
-        if isinstance(u, str) and u.strip():
-            return u.strip()
-    return ""
+# Max Hades pages in flight for a single search
+HADES_CONCURRENCY = 6
+
+# Rows per INSERT when persisting results to Item
+ITEM_BATCH_SIZE = 500
 
 def pick_items(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
     for k in ("items", "results", "ads", "data"):
@@ -34,221 +31,377 @@ def pick_items(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
             return v
     return []
 
-def feature_first(ad: Dict[str, Any], uri: str) -> Dict[str, Any]:
-    feats = ad.get("features")
-    if not isinstance(feats, list):
-        return {}
-    for f in feats:
-        if isinstance(f, dict) and f.get("uri") == uri:
-            vals = f.get("values")
-            if isinstance(vals, list) and vals:
-                v0 = vals[0]
-                return v0 if isinstance(v0, dict) else {}
-    return {}
-
-def feature_value(ad: Dict[str, Any], uri: str) -> str:
-    v0 = feature_first(ad, uri)
-    if not v0:
-        return ""
-    return str(v0.get("value") or v0.get("key") or "")
-
-def parse_number(value: str) -> Optional[float]:
-    if value is None:
-        return None
-    s = str(value).strip()
-    if not s:
-        return None
+def hades_params(query: str, start: int, limit: int, title_only: bool, shippable_only: bool) -> Dict[str, Any]:
+    params: Dict[str, Any] = {"q": query, "start": start, "lim": limit, "sort": "datedesc"}
+    if title_only:
+        params["qso"] = "true"
+    if shippable_only:
+        params["sh"] = "true"
+    return params
 
-    m = re.findall(r"[-]?\d[\d\.\,]*", s)
-    if not m:
-        return None
-    num = m[0]
+class SearchProgress:
+    """
+    Avanzamento di una ricerca, aggiornato dal loop del pool e letto da
+    altri thread (es. il worker dei job che lo salva su DB).
+    """
 
-    # formato IT: 1.234,56
-    if "." in num and "," in num:
-        num = num.replace(".", "").replace(",", ".")
-    else:
-        if "," in num:
-            num = num.replace(",", ".")
+    def __init__(self):
+        self.pages_total = 0
+        self.pages_done = 0
+        self.items = 0
+        self.failed_pages: List[int] = []
+        self.search_id: Optional[int] = None
 
-    try:
-        return float(num)
-    except ValueError:
-        return None
+    def page_done(self, n_items: int) -> None:
+        self.pages_done += 1
+        self.items += n_items
 
-def first_image_url_browser(ad: Dict[str, Any]) -> str:
+    def page_failed(self, index: int) -> None:
+        self.failed_pages.append(index)
+
+def _shared(fetcher: HadesFetcher) -> HadesFetcher:
+    # Cache hits skip the network entirely; misses go through the process-wide
+    # rate limiter with retries
+    return with_cache(RetryingFetcher(fetcher, limiter))
+
+async def _open_fetcher(stack: AsyncExitStack, session: HadesSession,
+                        browser_context: Callable[[], Awaitable[BrowserContext]]) -> HadesFetcher:
+    fetcher = await http_fetcher(stack, session)
+    if fetcher is None:
+        fetcher = await PlaywrightFetcher.create(await browser_context(), session)
+    return _shared(fetcher)
+
+async def _fetch_first_page(stack: AsyncExitStack, search_url: str, params0: Dict[str, Any]) -> Tuple[HadesFetcher, HadesResponse]:
     """
-    URL immagine apribile direttamente nel browser:
-    usa images[0].base_url (dominio s.sbito.it), fallback su cdn_base_url.
+    Apre il fetcher (HTTP o Chromium) e scarica la prima pagina, gestendo
+    fallback e nuovo bootstrap. Un eventuale context del pool resta in
+    prestito fino alla chiusura di `stack`.
     """
-    imgs = ad.get("images")
-    if not isinstance(imgs, list) or not imgs:
-        return ""
+    if replaying():
+        # Offline replay from the response cache: no session, no network
+        fetcher = with_cache(None)
+        return fetcher, await fetcher.get(params0)
 
-    img0 = imgs[0]
-    if not isinstance(img0, dict):
-        return ""
+    context: Optional[BrowserContext] = None
 
-    url = str(img0.get("base_url") or img0.get("cdn_base_url") or "")
-    
-    # Fix for hotlinking: usage images.sbito.it API instead of s.sbito.it CDN
-    if "s.sbito.it/img/" in url:
-        url = url.replace("s.sbito.it/img/", "images.sbito.it/api/v1/sbt-ads-images-pro/images/")
-    
-    if url and "?" not in url:
-        url += "?rule=gallery-desktop-1x-auto"
-    return url
+    async def browser_context() -> BrowserContext:
+        # Lease Chromium from the pool only when bootstrap or fallback needs it
+        nonlocal context
+        if context is None:
+            context = await stack.enter_async_context(get_pool().lease())
+        return context
+
+    # Reuse the cached cookie jar; the full site bootstrap only runs when it expired
+    session = await session_cache.ensure(browser_context, search_url)
+    fetcher = await _open_fetcher(stack, session, browser_context)
+
+    resp0 = await fetcher.get(params0)
+    if resp0.status in BLOCKED_STATUSES and fetcher.backend != PlaywrightFetcher.backend:
+        # Hades refused the plain HTTP client: fall back to Chromium for this search
+        fetcher = _shared(await PlaywrightFetcher.create(await browser_context(), session))
+        resp0 = await fetcher.get(params0)
+    if resp0.status in BLOCKED_STATUSES:
+        # Cookies rejected: bootstrap again and retry once
+        session_cache.invalidate(session)
+        await (await browser_context()).clear_cookies()
+        session = await session_cache.ensure(browser_context, search_url)
+        fetcher = _shared(await PlaywrightFetcher.create(await browser_context(), session))
+        resp0 = await fetcher.get(params0)
+    return fetcher, resp0
+
+def _all_known(items: List[Dict[str, Any]], known: Set[str]) -> bool:
+    return all((ad.get("urn") or normalize_url(ad)) in known for ad in items)
+
+async def _crawl(search_url: str, query: str, limit: int, title_only: bool, shippable_only: bool,
+                 max_pages: int, concurrency: int,
+                 progress: SearchProgress,
+                 on_page: Optional[Callable[[int, List[Dict[str, Any]]], None]] = None,
+                 known: Optional[Set[str]] = None) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Scarica tutte le pagine Hades di una ricerca.
+    La prima pagina fornisce count_all; gli offset successivi vengono richiesti
+    in parallelo, con al massimo `concurrency` richieste in volo.
+    Con `known` (modalità incrementale) le pagine vengono invece richieste in
+    sequenza, fermandosi alla prima composta solo da urn già noti.
+    Ritorna le pagine nell'ordine degli offset (quindi datedesc) e count_all.
+    """
+    async with AsyncExitStack() as stack:
+        params0 = hades_params(query, 0, limit, title_only, shippable_only)
+        fetcher, resp0 = await _fetch_first_page(stack, search_url, params0)
+        if not resp0.ok:
+            return [], 0
+
+        first = resp0.payload
+        total_count = int(first.get("count_all") or 0)
 
-def run_search(query: str, limit: int = 35, title_only: bool = False, shippable_only: bool = False, max_pages: int = 200, sleep: float = 0.25) -> List[Dict[str, Any]]:
-    q_url = quote_plus(query)
-    search_url = SEARCH_TEMPLATE.format(q=q_url)
+        pages = (total_count + limit - 1) // limit if total_count > 0 else 0
+        pages = min(pages, max_pages)
+        progress.pages_total = max(pages, 1)
+        progress.page_done(len(pick_items(first)))
+        if on_page:
+            on_page(0, pick_items(first))
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def fetch_page(index: int) -> List[Dict[str, Any]]:
+            async with semaphore:
+                start = index * limit
+                params = hades_params(query, start, limit, title_only, shippable_only)
+                r = await fetcher.get(params)
+                if not r.ok:
+                    # Retries are exhausted: record the gap instead of losing it silently
+                    progress.page_failed(index)
+                items = pick_items(r.payload) if r.ok else []
+                progress.page_done(len(items))
+                if on_page:
+                    on_page(index, items)
+                return items
+
+        if known is not None:
+            fetched = [pick_items(first)]
+            for i in range(1, pages):
+                if _all_known(fetched[-1], known):
+                    break
+                fetched.append(await fetch_page(i))
+            return fetched, total_count
+
+        rest = await asyncio.gather(*(fetch_page(i) for i in range(1, pages)))
+        return [pick_items(first)] + list(rest), total_count
+
+def search_url_for(query: str, title_only: bool, shippable_only: bool) -> str:
+    search_url = SEARCH_TEMPLATE.format(q=quote_plus(query))
     if title_only:
         search_url += "&qso=true"
     if shippable_only:
         search_url += "&sh=true"  # Subito parameter for shipping
+    return search_url
+
+def dedupe_ads(items: List[Dict[str, Any]], seen: Set[str]) -> Iterator[Dict[str, Any]]:
+    for ad in items or []:
+        urn = ad.get("urn") or normalize_url(ad)
+        if urn and urn in seen:
+            continue
+        if urn:
+            seen.add(urn)
+        yield ad
+
+def _parse_iso(value: str) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+# Normalized keys stored on the shared Listing / on the per-search Item
+LISTING_FIELDS = ('title', 'date_pub', 'likes_count', 'image_url', 'url', 'description', 'defect_reason',
+                  'price_str', 'price_num')
+ITEM_FIELDS = ('price_str', 'price_num', 'category', 'region', 'province', 'town', 'condition', 'shipping_type',
+               'shipping_cost', 'shippable', 'defect_flag')
+
+def upsert_listings(search_id: int, items_list: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Inserisce o aggiorna in blocco i Listing di `items_list` e aggiunge una
+    PriceObservation per gli annunci nuovi o con il prezzo cambiato.
+    Restituisce subito_id -> id del Listing.
+    """
+    by_id = {item['subito_id']: item for item in items_list}
+    known = {
+        subito_id: (pk, price, previous)
+        for subito_id, pk, price, previous in Listing.objects.filter(subito_id__in=by_id)
+        .values_list('subito_id', 'id', 'price_num', 'previous_price')
+    }
+
+    listings = []
+    changed = []
+    for subito_id, item in by_id.items():
+        previous_price = None
+        if subito_id in known:
+            _, last_price, previous_price = known[subito_id]
+            if item['price_num'] != last_price:
+                previous_price = last_price
+                changed.append(subito_id)
+        else:
+            changed.append(subito_id)
+        listings.append(Listing(subito_id=subito_id, previous_price=previous_price,
+                                **{field: item[field] for field in LISTING_FIELDS}))
+
+    Listing.objects.bulk_create(
+        listings, update_conflicts=True, unique_fields=['subito_id'],
+        update_fields=list(LISTING_FIELDS) + ['previous_price', 'last_seen'],
+    )
+    ids = {listing.subito_id: listing.pk for listing in listings if listing.pk}
+    if len(ids) < len(listings):
+        # Backends that don't return ids from an upsert
+        ids.update(Listing.objects.filter(subito_id__in=by_id).values_list('subito_id', 'id'))
+
+    PriceObservation.objects.bulk_create([
+        PriceObservation(listing_id=ids[subito_id], search_query_id=search_id, price_num=by_id[subito_id]['price_num'])
+        for subito_id in changed
+    ])
+    return ids
+
+def save_results(search_id: int, items_list: List[Dict[str, Any]], batch_size: int = ITEM_BATCH_SIZE) -> None:
+    """Salva gli annunci normalizzati come Item della ricerca (e i loro Listing), a blocchi."""
+    # Without an urn there's nothing to key the Listing on
+    items_list = [item for item in items_list if item.get('subito_id')]
+    for i in range(0, len(items_list), batch_size):
+        chunk = items_list[i:i + batch_size]
+        listing_ids = upsert_listings(search_id, chunk)
+        places = [(item['town'], item['province'], item['region']) for item in chunk]
+        unresolved: Dict[str, Place] = {}
+        coords = resolve_places(places, unresolved)
+        items = []
+        for item, place in zip(chunk, places):
+            latitude, longitude = coords[place] or (None, None)
+            items.append(Item(search_query_id=search_id, listing_id=listing_ids[item['subito_id']],
+                              date_pub_iso=_parse_iso(item.get('date_pub_iso')), latitude=latitude,
+                              longitude=longitude, **{field: item[field] for field in ITEM_FIELDS}))
+        Item.objects.bulk_create(items)
+        # Looked up in the background; these items get the coordinates when the answer comes
+        request_geocoding(unresolved, search_id)
+
+def carry_over_items(search_id: int, previous_id: int, skip: Set[str], limit: int,
+                     batch_size: int = ITEM_BATCH_SIZE) -> List[Dict[str, Any]]:
+    """
+    Copia nella ricerca `search_id` gli Item della ricerca `previous_id` che
+    il re-crawl incrementale non ha riscaricato (quelli in `skip` sì), in
+    ordine, fino a `limit`. Il prezzo è quello attuale del Listing, che non
+    viene toccato. Restituisce gli annunci copiati, come dict normalizzati.
+    """
+    skip = set(skip)
+    own_fields = [field for field in ITEM_FIELDS if field not in LISTING_FIELDS]
+    rows = Item.objects.filter(search_query_id=previous_id).order_by('id').values_list(
+        'listing_id', 'listing__subito_id', 'date_pub_iso', 'latitude', 'longitude',
+        *own_fields, *(f'listing__{field}' for field in LISTING_FIELDS),
+    )
+    carried: List[Dict[str, Any]] = []
+    items: List[Item] = []
+    for listing_id, subito_id, date_pub_iso, latitude, longitude, *values in rows.iterator(chunk_size=batch_size):
+        if len(carried) >= limit:
+            break
+        if subito_id in skip:
+            continue
+        skip.add(subito_id)
+        item = dict(zip(own_fields + list(LISTING_FIELDS), values), subito_id=subito_id,
+                    date_pub_iso=date_pub_iso.isoformat() if date_pub_iso else None)
+        carried.append(item)
+        items.append(Item(search_query_id=search_id, listing_id=listing_id, date_pub_iso=date_pub_iso,
+                          latitude=latitude, longitude=longitude, **{field: item[field] for field in ITEM_FIELDS}))
+    Item.objects.bulk_create(items, batch_size=batch_size)
+    return carried
+
+def run_search(query: str, limit: int = 35, title_only: bool = False, shippable_only: bool = False, max_pages: int = 200, concurrency: int = HADES_CONCURRENCY, progress: Optional[SearchProgress] = None, incremental: bool = False) -> List[Dict[str, Any]]:
+    """
+    Con `incremental=True` riusa il risultato precedente della stessa
+    (query, title_only, shippable_only): scarica solo finché trova annunci
+    nuovi, salva quelli delle pagine scaricate con i dati appena letti e
+    copia dopo di loro i vecchi delle pagine non riscaricate.
+    """
+    search_url = search_url_for(query, title_only, shippable_only)
     
     # Save search history
-    total_count = 0 
     search_obj = SearchQuery.objects.create(query=query, limit=limit, title_only=title_only, shippable_only=shippable_only)
-    
-    all_ads: List[Dict[str, Any]] = []
-    seen = set()
-    total_count = 0
-
-    with sync_playwright() as p:
-        # Use headless=True for backend service
-        browser = p.chromium.launch(headless=True)
-        context = browser.new_context(locale="it-IT")
-        page = context.new_page()
-
-        try:
-            page.goto(BASE_SITE, wait_until="networkidle", timeout=60000)
-            time.sleep(1.0)
-            page.goto(search_url, wait_until="networkidle", timeout=60000)
-            time.sleep(1.5)
-            
-            # Cookies should be set now
-            
-            params0 = {"q": query, "start": 0, "lim": limit, "sort": "datedesc"}
-            if title_only:
-                params0["qso"] = "true"
-            if shippable_only:
-                params0["sh"] = "true"
-
-            resp0 = context.request.get(HADES_URL, params=params0, timeout=60000)
-            
-            if resp0.ok:
-                first = resp0.json()
-                items0 = pick_items(first)
-                total_count = int(first.get("count_all") or 0)
-                
-                # Helper to add ads
-                def add_ads_local(items):
-                    for ad in items or []:
-                        urn = ad.get("urn") or normalize_url(ad)
-                        if urn and urn in seen:
-                            continue
-                        if urn:
-                            seen.add(urn)
-                        all_ads.append(ad)
-                
-                add_ads_local(items0)
-                
-                pages = (total_count + limit - 1) // limit if total_count > 0 else 0
-                pages = min(pages, max_pages)
-                
-                for i in range(1, pages):
-                    start = i * limit
-                    params = {"q": query, "start": start, "lim": limit, "sort": "datedesc"}
-                    if title_only:
-                        params["qso"] = "true"
-                    if shippable_only:
-                        params["sh"] = "true"
-                        
-                    r = context.request.get(HADES_URL, params=params, timeout=60000)
-                    if not r.ok:
-                        continue
-                    payload = r.json()
-                    add_ads_local(pick_items(payload))
-                    time.sleep(sleep)
-                    
-        finally:
-            browser.close()
+    if progress is None:
+        progress = SearchProgress()
+    progress.search_id = search_obj.pk
+
+    previous_id: Optional[int] = None
+    known: Optional[Set[str]] = None
+    if incremental:
+        previous_id = CrawlState.objects.filter(
+            query=query, title_only=title_only, shippable_only=shippable_only,
+        ).values_list('search_query_id', flat=True).first()
+        if previous_id is not None:
+            known = set(Listing.objects.filter(items__search_query_id=previous_id).values_list('subito_id', flat=True))
+
+    # The crawl runs on the browser pool loop so it can share warm Chromium and HTTP connections
+    pages, total_count = get_pool().run(
+        _crawl(search_url, query, limit, title_only, shippable_only, max_pages, concurrency, progress, known=known)
+    )
+
+    # Pages come back in offset order, so deduping here keeps the datedesc order.
+    # Known ads on the fetched pages are kept too: their data is fresher than the previous result's
+    seen: Set[str] = set()
+    all_ads = [ad for items in pages for ad in dedupe_ads(items, seen)]
 
     # Update total results
     search_obj.total_results = total_count
     search_obj.save()
 
-    # Create Items list (dicts)
-    items_list = []
-    for ad in all_ads:
-        id_annuncio = ad.get("urn") or ""
-        nome = ad.get("subject") or ad.get("title") or ""
-        description = ad.get("body") or ""
-
-        prezzo_str = feature_value(ad, "/price")
-        prezzo_num = parse_number(feature_first(ad, "/price").get("key") or prezzo_str)
-
-        data_pub = safe_get(ad, "dates.display", "")
-        # Parse ISO date
-        data_pub_iso_str = safe_get(ad, "dates.display_iso8601", "")
-        # Maintain ISO string for session storage, can parse later
-        
-        categoria = safe_get(ad, "category.value", "")
-        regione = safe_get(ad, "geo.region.value", "")
-        provincia = safe_get(ad, "geo.city.value", "")
-        comune = safe_get(ad, "geo.town.value", "")
-
-        condizione = feature_value(ad, "/item_condition")
-        spedizione_tipo = feature_value(ad, "/item_shipping_type")
-
-        costo_sped_str = feature_value(ad, "/item_shipping_cost_tuttosubito")
-        costo_sped_num = parse_number(feature_first(ad, "/item_shipping_cost_tuttosubito").get("key") or costo_sped_str)
-
-        spedibile_val = feature_value(ad, "/item_shippable")
-        spedibile = (spedibile_val.lower() == 'true')
-        
-        # Fallback: if we have a shipping cost, it is shippable
-        if costo_sped_num is not None:
-            spedibile = True
-            
-        # Try to find likes/favorites in raw payload 
-        likes_val = 0
-        if "favorites" in ad:
-             try:
-                 likes_val = int(ad["favorites"])
-             except:
-                 pass
-        
-        url = normalize_url(ad)
-        img_url = first_image_url_browser(ad)
-        
-        # Defect Detection
-        from .text_flags import detect_defects
-        defects = detect_defects(nome, description)
-        
-        item_dict = {
-            'subito_id': id_annuncio,
-            'title': nome,
-            'price_str': prezzo_str,
-            'price_num': prezzo_num,
-            'date_pub': data_pub,
-            'date_pub_iso': data_pub_iso_str, # Store as string
-            'category': categoria,
-            'region': regione,
-            'province': provincia,
-            'town': comune,
-            'condition': condizione,
-            'shipping_type': spedizione_tipo,
-            'shipping_cost': costo_sped_num,
-            'shippable': spedibile,
-            'likes_count': likes_val,
-            'image_url': img_url,
-            'url': url,
-            'description': description,
-            'defect_flag': defects['flag'],
-            'defect_reason': defects['reason']
-        }
-        items_list.append(item_dict)
+    items_list = normalize_page(all_ads)
+    save_results(search_obj.pk, items_list)
+
+    if incremental and pages:
+        if previous_id is not None:
+            # The pages not fetched again come from the previous result; past count_all they have left Subito
+            items_list += carry_over_items(search_obj.pk, previous_id, {item['subito_id'] for item in items_list},
+                                           min(total_count, max_pages * limit) - len(items_list))
+        # After a failed page the next run must not stop before it: keep the last complete state
+        if not progress.failed_pages:
+            CrawlState.objects.update_or_create(
+                query=query, title_only=title_only, shippable_only=shippable_only,
+                defaults={'search_query_id': search_obj.pk},
+            )
 
+    store_snapshot(search_obj.pk)
     return items_list
+
+def iter_search(query: str, limit: int = 35, title_only: bool = False, shippable_only: bool = False, max_pages: int = 200, concurrency: int = HADES_CONCURRENCY, progress: Optional[SearchProgress] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Come run_search, ma restituisce gli annunci normalizzati pagina per pagina
+    man mano che arrivano da Hades. Le pagine sono riordinate per offset prima
+    di essere emesse, quindi l'ordine resta datedesc come in run_search.
+    """
+    search_url = search_url_for(query, title_only, shippable_only)
+
+    search_obj = SearchQuery.objects.create(query=query, limit=limit, title_only=title_only, shippable_only=shippable_only)
+    if progress is None:
+        progress = SearchProgress()
+    progress.search_id = search_obj.pk
+
+    # Pages are handed over from the pool loop thread; None marks the end of the crawl
+    pages: "queue.Queue[Optional[Tuple[int, List[Dict[str, Any]]]]]" = queue.Queue()
+    future = get_pool().submit(
+        _crawl(search_url, query, limit, title_only, shippable_only, max_pages, concurrency, progress,
+               on_page=lambda index, items: pages.put((index, items)))
+    )
+    future.add_done_callback(lambda f: pages.put(None))
+
+    seen: Set[str] = set()
+    pending: Dict[int, List[Dict[str, Any]]] = {}
+    next_index = 0
+    # Rows already sent to the client but not yet saved as Item
+    unsaved: List[Dict[str, Any]] = []
+    try:
+        while True:
+            msg = pages.get()
+            if msg is None:
+                break
+            index, items = msg
+            pending[index] = items
+            while next_index in pending:
+                for ad in dedupe_ads(pending.pop(next_index), seen):
+                    item = normalize_ad(ad)
+                    unsaved.append(item)
+                    yield item
+                next_index += 1
+            if len(unsaved) >= ITEM_BATCH_SIZE:
+                save_results(search_obj.pk, unsaved)
+                unsaved = []
+
+        # Anything left behind a missing page
+        for index in sorted(pending):
+            for ad in dedupe_ads(pending[index], seen):
+                item = normalize_ad(ad)
+                unsaved.append(item)
+                yield item
+        save_results(search_obj.pk, unsaved)
+
+        _, total_count = future.result()
+        search_obj.total_results = total_count
+        search_obj.save()
+        store_snapshot(search_obj.pk)
+    finally:
+        # Client went away (generator closed): stop crawling
+        future.cancel()
@@ -0,0 +1,455 @@
+import json
+import math
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .export import export_rows
+from .models import SearchSnapshot
+from .pagination import DEFAULT_SORT, RESULTS_PAGE_SIZE, SORTS, KeysetPage, decode_cursor, encode_cursor
+from .records import ROW_FIELDS, ResultRow
+from .spatial import GridIndex
+
+SNAPSHOT_VERSION = 4
+
+# Columns with a stored sort permutation (descending is the same one reversed)
+SORT_FIELDS = tuple(dict.fromkeys(field for field, _ in SORTS.values()))
+
+# Nearest first, from the distances passed to snapshot_page
+DISTANCE_SORT = 'distance'
+
+# Column encodings:
+#   f64  - array('d'), NaN for missing
+#   i64  - array('q'), INT_NULL for missing
+#   date - array('q') of epoch microseconds (UTC), INT_NULL for missing
+#   bool - array('b')
+#   dict - dictionary of distinct values + array('I') of codes (for low-cardinality strings)
+#   str  - utf-8 blob + array('I') of end offsets
+SNAPSHOT_COLUMNS = {
+    'id': 'i64',  # Item id; rows are stored in id order, so it's sorted
+    'subito_id': 'str',
+    'title': 'str',
+    'price_str': 'str',
+    'price_num': 'f64',
+    'previous_price': 'f64',
+    'date_pub': 'dict',
+    'date_pub_iso': 'date',
+    'category': 'dict',
+    'region': 'dict',
+    'province': 'dict',
+    'town': 'dict',
+    'latitude': 'f64',
+    'longitude': 'f64',
+    'condition': 'dict',
+    'shipping_type': 'dict',
+    'shipping_cost': 'f64',
+    'shippable': 'bool',
+    'likes_count': 'i64',
+    'defect_flag': 'dict',
+    'defect_reason': 'dict',
+    'url': 'str',
+    'image_url': 'str',
+    'description': 'str',
+}
+
+# Stored (and decompressed) separately, only when a row's details are asked for
+HEAVY_COLUMNS = ('description',)
+# What the results page and the map load per item on demand
+DETAIL_FIELDS = ('url', 'image_url', 'description')
+
+SNAPSHOT_COMPRESSION = 6
+
+INT_NULL = -(2 ** 63)
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_HEADER = struct.Struct("<I")
+
+
+def _to_micros(value: Any) -> int:
+    if not value:
+        return INT_NULL
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return INT_NULL
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+
+def _from_micros(value: int) -> Optional[datetime]:
+    return None if value == INT_NULL else _EPOCH + timedelta(microseconds=value)
+
+
+class _StrColumn:
+    """Stringhe in un unico blob utf-8, con gli offset di fine di ciascuna."""
+
+    def __init__(self, blob: bytes, ends: array):
+        self.blob = blob
+        self.ends = ends
+
+    @classmethod
+    def build(cls, values: Iterable[Optional[str]]) -> "_StrColumn":
+        parts = []
+        ends = array('I')
+        end = 0
+        for value in values:
+            data = (value or '').encode()
+            parts.append(data)
+            end += len(data)
+            ends.append(end)
+        return cls(b"".join(parts), ends)
+
+    def __len__(self) -> int:
+        return len(self.ends)
+
+    def __getitem__(self, i: int) -> str:
+        start = self.ends[i - 1] if i else 0
+        return self.blob[start:self.ends[i]].decode()
+
+
+class _DictColumn:
+    """Valori ripetuti codificati come indici in un dizionario."""
+
+    def __init__(self, values: List[Any], codes: array):
+        self.values = values
+        self.codes = codes
+
+    @classmethod
+    def build(cls, values: Iterable[Any]) -> "_DictColumn":
+        index: Dict[Any, int] = {}
+        codes = array('I')
+        for value in values:
+            code = index.get(value)
+            if code is None:
+                code = index[value] = len(index)
+            codes.append(code)
+        return cls(list(index), codes)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, i: int) -> Any:
+        return self.values[self.codes[i]]
+
+
+class Snapshot:
+    """
+    Risultato di una ricerca conclusa in forma colonnare: array tipizzati per
+    numeri, date e flag, dizionari per le stringhe ripetute (regione, comune,
+    categoria...). Si serializza in due blob compressi: le colonne leggere e
+    quelle pesanti (HEAVY_COLUMNS), che vengono decompresse solo al primo
+    accesso. Permette l'accesso casuale per riga senza ricostruire tutti i dict.
+    """
+
+    def __init__(self, size: int, columns: Dict[str, Any], heavy_loader: Optional[Callable[[], bytes]] = None,
+                 orders: Optional[Dict[str, array]] = None):
+        self.size = size
+        self.columns = columns
+        self._heavy_loader = heavy_loader
+        self.orders = orders or {}
+        self._spatial: Optional[GridIndex] = None
+
+    def _column(self, name: str) -> Any:
+        if name not in self.columns and name in HEAVY_COLUMNS and self._heavy_loader is not None:
+            _, heavy, _ = _decode(self._heavy_loader())
+            self.columns.update(heavy)
+            self._heavy_loader = None
+        return self.columns[name]
+
+    def __len__(self) -> int:
+        return self.size
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> "Snapshot":
+        rows = list(rows)
+        columns: Dict[str, Any] = {}
+        for name, kind in SNAPSHOT_COLUMNS.items():
+            values = [row.get(name) for row in rows]
+            if kind == 'f64':
+                columns[name] = array('d', (math.nan if v is None else v for v in values))
+            elif kind == 'i64':
+                columns[name] = array('q', (INT_NULL if v is None else v for v in values))
+            elif kind == 'date':
+                columns[name] = array('q', (_to_micros(v) for v in values))
+            elif kind == 'bool':
+                columns[name] = array('b', (bool(v) for v in values))
+            elif kind == 'dict':
+                columns[name] = _DictColumn.build(values)
+            else:
+                columns[name] = _StrColumn.build(values)
+        return cls(len(rows), columns)
+
+    # --- access ---
+
+    def value(self, name: str, i: int) -> Any:
+        kind = SNAPSHOT_COLUMNS[name]
+        raw = self._column(name)[i]
+        if kind == 'f64':
+            return None if math.isnan(raw) else raw
+        if kind == 'i64':
+            return None if raw == INT_NULL else raw
+        if kind == 'date':
+            return _from_micros(raw)
+        if kind == 'bool':
+            return bool(raw)
+        return raw
+
+    def row(self, i: int, fields: Sequence[str] = tuple(SNAPSHOT_COLUMNS)) -> Dict[str, Any]:
+        if not 0 <= i < self.size:
+            raise IndexError(i)
+        return {name: self.value(name, i) for name in fields}
+
+    def rows(self, indices: Iterable[int], fields: Sequence[str] = tuple(SNAPSHOT_COLUMNS)) -> List[Dict[str, Any]]:
+        return [self.row(i, fields) for i in indices]
+
+    def records(self, indices: Iterable[int]) -> List[ResultRow]:
+        return [ResultRow(**self.row(i, ROW_FIELDS)) for i in indices]
+
+    def find(self, item_id: int) -> Optional[int]:
+        """Riga dell'Item `item_id`, con una ricerca binaria sulla colonna id."""
+        ids = self.columns['id']
+        i = bisect_left(ids, item_id)
+        return i if i < self.size and ids[i] == item_id else None
+
+    def details(self, i: int) -> Dict[str, Any]:
+        return self.row(i, DETAIL_FIELDS)
+
+    def argsort(self, name: str, descending: bool = False) -> array:
+        """
+        Permutazione delle righe ordinate per `name`. Come nella paginazione,
+        i valori mancanti contano come i più bassi e a parità decide la riga.
+        """
+        kind = SNAPSHOT_COLUMNS[name]
+        column = self.columns[name]
+        if kind == 'f64':
+            missing = [math.isnan(v) for v in column]
+        elif kind in ('i64', 'date'):
+            missing = [v == INT_NULL for v in column]
+        else:
+            raise ValueError(f"Cannot sort on {kind} column {name}")
+        order = sorted(range(self.size), key=lambda i: (not missing[i], 0 if missing[i] else column[i], i),
+                       reverse=descending)
+        return array('I', order)
+
+    def spatial_index(self) -> GridIndex:
+        """Indice a griglia sulle coordinate, costruito al primo raggio chiesto."""
+        if self._spatial is None:
+            self._spatial = GridIndex(self.columns['latitude'], self.columns['longitude'])
+        return self._spatial
+
+    def order(self, name: str) -> array:
+        """Permutazione crescente per `name`: quella salvata, o calcolata una volta sola."""
+        if name not in self.orders:
+            self.orders[name] = self.argsort(name)
+        return self.orders[name]
+
+    # --- (de)serialization ---
+
+    def to_bytes(self) -> Tuple[bytes, bytes]:
+        """
+        (colonne leggere, colonne pesanti), ciascuna compressa a parte; le
+        permutazioni di ordinamento viaggiano con le colonne leggere.
+        """
+        light = [name for name in SNAPSHOT_COLUMNS if name not in HEAVY_COLUMNS]
+        orders = {name: self.order(name) for name in SORT_FIELDS}
+        return _encode(self, light, orders), _encode(self, HEAVY_COLUMNS)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, heavy: Optional[Callable[[], bytes]] = None) -> "Snapshot":
+        """`heavy` restituisce il blob delle colonne pesanti; viene chiamato al primo accesso."""
+        size, columns, orders = _decode(data)
+        return cls(size, columns, heavy, orders)
+
+
+def _encode(snapshot: Snapshot, names: Sequence[str], orders: Optional[Dict[str, array]] = None) -> bytes:
+    header: Dict[str, Any] = {'version': SNAPSHOT_VERSION, 'size': snapshot.size, 'byteorder': sys.byteorder,
+                              'columns': [], 'orders': list(orders or ())}
+    buffers: List[bytes] = [order.tobytes() for order in (orders or {}).values()]
+    for name in names:
+        kind = SNAPSHOT_COLUMNS[name]
+        column = snapshot.columns[name]
+        meta: Dict[str, Any] = {'name': name, 'kind': kind}
+        if kind == 'dict':
+            meta['values'] = column.values
+            parts = [column.codes.tobytes()]
+        elif kind == 'str':
+            parts = [column.ends.tobytes(), column.blob]
+        else:
+            parts = [column.tobytes()]
+        meta['lengths'] = [len(p) for p in parts]
+        header['columns'].append(meta)
+        buffers.extend(parts)
+    head = json.dumps(header, ensure_ascii=False).encode()
+    return zlib.compress(_HEADER.pack(len(head)) + head + b"".join(buffers), SNAPSHOT_COMPRESSION)
+
+
+def _decode(data: bytes) -> Tuple[int, Dict[str, Any], Dict[str, array]]:
+    raw = memoryview(zlib.decompress(data))
+    (head_len,) = _HEADER.unpack_from(raw)
+    offset = _HEADER.size
+    header = json.loads(bytes(raw[offset:offset + head_len]))
+    offset += head_len
+    if header['version'] != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {header['version']}")
+
+    swap = header['byteorder'] != sys.byteorder
+    orders: Dict[str, array] = {}
+    for name in header['orders']:
+        length = header['size'] * array('I').itemsize
+        orders[name] = _frombytes('I', raw[offset:offset + length], swap)
+        offset += length
+    columns: Dict[str, Any] = {}
+    for meta in header['columns']:
+        parts = []
+        for length in meta['lengths']:
+            parts.append(raw[offset:offset + length])
+            offset += length
+        kind = meta['kind']
+        if kind == 'dict':
+            columns[meta['name']] = _DictColumn(meta['values'], _frombytes('I', parts[0], swap))
+        elif kind == 'str':
+            columns[meta['name']] = _StrColumn(bytes(parts[1]), _frombytes('I', parts[0], swap))
+        else:
+            typecode = {'f64': 'd', 'i64': 'q', 'date': 'q', 'bool': 'b'}[kind]
+            columns[meta['name']] = _frombytes(typecode, parts[0], swap)
+    return header['size'], columns, orders
+
+
+def _frombytes(typecode: str, data: memoryview, swap: bool = False) -> array:
+    column = array(typecode)
+    column.frombytes(data)
+    if swap:
+        column.byteswap()
+    return column
+
+
+def build_snapshot(search_id: int) -> Snapshot:
+    return Snapshot.from_rows(export_rows(search_id, fields=tuple(SNAPSHOT_COLUMNS)))
+
+
+# Recently used snapshots, by search id, checked against SearchSnapshot.version on every load
+SNAPSHOT_CACHE_SIZE = 8
+_loaded: "OrderedDict[int, Tuple[int, Snapshot]]" = OrderedDict()
+_loaded_lock = threading.Lock()
+
+
+def results_version(search_id: int) -> int:
+    """
+    Versione dei risultati di una ricerca, da mettere nelle chiavi di cache
+    (frammenti renderizzati, mappa...): cambia ogni volta che lo snapshot
+    viene rifatto, anche da un altro processo. 0 finché non c'è snapshot.
+    """
+    return SearchSnapshot.objects.filter(search_query_id=search_id).values_list('version', flat=True).first() or 0
+
+
+def store_snapshot(search_id: int) -> SearchSnapshot:
+    """Costruisce e salva lo snapshot di una ricerca (in ordine di inserimento), con una versione nuova."""
+    data, heavy = build_snapshot(search_id).to_bytes()
+    # A timestamp, rather than a counter, so a deleted and rebuilt snapshot can't bring old fragments back
+    snapshot, _ = SearchSnapshot.objects.update_or_create(
+        search_query_id=search_id,
+        defaults={'data': data, 'heavy': heavy, 'size': len(data) + len(heavy), 'version': time.time_ns()},
+    )
+    with _loaded_lock:
+        _loaded.pop(search_id, None)
+    return snapshot
+
+
+def _heavy_loader(search_id: int) -> Callable[[], bytes]:
+    def load() -> bytes:
+        return bytes(SearchSnapshot.objects.filter(search_query_id=search_id).values_list('heavy', flat=True).get())
+    return load
+
+
+def load_snapshot(search_id: int) -> Optional[Snapshot]:
+    version = SearchSnapshot.objects.filter(search_query_id=search_id).values_list('version', flat=True).first()
+    if version is None:
+        return None
+    with _loaded_lock:
+        entry = _loaded.get(search_id)
+        if entry is not None and entry[0] == version:
+            _loaded.move_to_end(search_id)
+            return entry[1]
+    row = SearchSnapshot.objects.filter(search_query_id=search_id).values_list('version', 'data').first()
+    if row is None:
+        return None
+    version, data = row
+    try:
+        snapshot = Snapshot.from_bytes(bytes(data), _heavy_loader(search_id))
+    except ValueError:
+        # Written by an older version: the Items are still there, rebuild it
+        store_snapshot(search_id)
+        return load_snapshot(search_id)
+    with _loaded_lock:
+        _loaded[search_id] = (version, snapshot)
+        _loaded.move_to_end(search_id)
+        while len(_loaded) > SNAPSHOT_CACHE_SIZE:
+            _loaded.popitem(last=False)
+    return snapshot
+
+
+def snapshot_page(snapshot: Snapshot, sort: Optional[str] = None, mask: Optional[int] = None,
+                  after: Optional[str] = None, before: Optional[str] = None,
+                  page_size: int = RESULTS_PAGE_SIZE, distances: Optional[Dict[int, float]] = None) -> KeysetPage:
+    """
+    Come pagination.keyset_page, ma sullo snapshot: l'ordinamento è la
+    permutazione salvata, i filtri sono la bitmap `mask` delle faccette (il
+    bit i è la riga i), e una pagina è una fetta. I cursori sono gli stessi
+    della paginazione sul DB, quindi i due percorsi sono intercambiabili.
+    `distances` (riga -> km) permette l'ordinamento DISTANCE_SORT, con le
+    righe senza coordinate in fondo, e finisce in ResultRow.distance.
+    """
+    order: Sequence[int]
+    if sort == DISTANCE_SORT and distances is not None:
+        field = DISTANCE_SORT
+        order = sorted(distances, key=lambda i: (distances[i], i))
+        order += [i for i in range(snapshot.size) if i not in distances]
+    else:
+        field, descending = SORTS.get(sort, SORTS[DEFAULT_SORT])
+        order = snapshot.order(field)
+        if descending:
+            order = order[::-1]
+    if mask is not None and mask != (1 << snapshot.size) - 1:
+        keep = bin(mask)[:1:-1]  # keep[i] == '1' if row i passes the filters
+        order = [i for i in order if i < len(keep) and keep[i] == '1']
+
+    def sort_value(i: int) -> Any:
+        return distances.get(i) if field == DISTANCE_SORT else snapshot.value(field, i)
+
+    ids = snapshot.columns['id']
+    start = 0
+    cursor = after or before
+    key = decode_cursor(cursor, field) if cursor else None
+    if key is not None:
+        _, pk, position = key
+        if not (0 <= position < len(order) and ids[order[position]] == pk):
+            # Stale position (other filters, rebuilt snapshot): look the row up
+            row = snapshot.find(pk)
+            position = order.index(row) if row is not None and row in order else -1
+        if after:
+            start = position + 1
+        elif position >= 0:
+            start = max(0, position - page_size)
+            page_size = position - start
+
+    indices = order[start:start + page_size]
+    next_cursor = prev_cursor = None
+    if indices and start + len(indices) < len(order):
+        last = indices[-1]
+        next_cursor = encode_cursor(sort_value(last), ids[last], start + len(indices) - 1)
+    if indices and start > 0:
+        first = indices[0]
+        prev_cursor = encode_cursor(sort_value(first), ids[first], start)
+    records = snapshot.records(indices)
+    if distances is not None:
+        for record, i in zip(records, indices):
+            record.distance = distances.get(i)
+    return KeysetPage(records, start, next_cursor, prev_cursor)
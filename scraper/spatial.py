@@ -0,0 +1,113 @@
+import math
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy
+except ImportError:  # distances are computed in pure Python without it
+    numpy = None
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# Grid cell side in degrees of latitude (~22 km)
+GRID_CELL_DEG = 0.2
+
+# Radius choices offered on the results page, in km
+RADIUS_CHOICES = (10, 30, 50, 100, 200)
+# Larger radii from the query string are clamped to this
+MAX_RADIUS_KM = max(RADIUS_CHOICES)
+
+
+def haversine_km(lat: float, lon: float, lats: Sequence[float], lons: Sequence[float]) -> List[float]:
+    """Distanze in km da (lat, lon) a ciascun punto; con numpy in un solo passaggio vettoriale."""
+    if numpy is not None:
+        lat2 = numpy.radians(numpy.asarray(lats, dtype=numpy.float64))
+        lon2 = numpy.radians(numpy.asarray(lons, dtype=numpy.float64))
+        lat1, lon1 = math.radians(lat), math.radians(lon)
+        a = (numpy.sin((lat2 - lat1) / 2) ** 2
+             + math.cos(lat1) * numpy.cos(lat2) * numpy.sin((lon2 - lon1) / 2) ** 2)
+        return (2 * EARTH_RADIUS_KM * numpy.arcsin(numpy.sqrt(numpy.minimum(a, 1.0)))).tolist()
+
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    cos_lat1 = math.cos(lat1)
+    distances = []
+    for lat2, lon2 in zip(lats, lons):
+        lat2, lon2 = math.radians(lat2), math.radians(lon2)
+        a = math.sin((lat2 - lat1) / 2) ** 2 + cos_lat1 * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+        distances.append(2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0))))
+    return distances
+
+
+def parse_radius(value: Optional[str]) -> Optional[float]:
+    """Raggio in km dalla query string: None se manca o non è un numero finito non negativo, al più MAX_RADIUS_KM."""
+    try:
+        radius = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(radius) or radius < 0:
+        return None
+    return min(radius, MAX_RADIUS_KM)
+
+
+def rows_mask(rows: Iterable[int], size: int) -> int:
+    """Bitmap (come quelle di FacetIndex) con accesi i bit delle righe `rows`."""
+    bits = bytearray((size + 7) // 8)
+    for i in rows:
+        bits[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(bits, 'little')
+
+
+class GridIndex:
+    """
+    Indice a griglia sulle coordinate delle righe di una ricerca: per un
+    raggio si guardano solo le celle che toccano il suo riquadro, e la
+    distanza esatta si calcola sui candidati.
+    """
+
+    def __init__(self, lats: array, lons: array, cell: float = GRID_CELL_DEG):
+        self.lats = lats
+        self.lons = lons
+        self.cell = cell
+        self.cells: Dict[Tuple[int, int], array] = {}
+        for i, (lat, lon) in enumerate(zip(lats, lons)):
+            if math.isnan(lat) or math.isnan(lon):
+                continue
+            key = (math.floor(lat / cell), math.floor(lon / cell))
+            rows = self.cells.get(key)
+            if rows is None:
+                rows = self.cells[key] = array('I')
+            rows.append(i)
+
+    def candidates(self, lat: float, lon: float, radius_km: float) -> array:
+        """Righe nelle celle che intersecano il riquadro del cerchio."""
+        dlat = radius_km / KM_PER_DEGREE
+        dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+        rows = array('I')
+        for y in range(math.floor((lat - dlat) / self.cell), math.floor((lat + dlat) / self.cell) + 1):
+            for x in range(math.floor((lon - dlon) / self.cell), math.floor((lon + dlon) / self.cell) + 1):
+                found = self.cells.get((y, x))
+                if found is not None:
+                    rows.extend(found)
+        return rows
+
+    def distances(self, lat: float, lon: float, radius_km: Optional[float] = None) -> Dict[int, float]:
+        """Riga -> distanza in km, per le righe entro `radius_km` (tutte quelle localizzate se None)."""
+        if radius_km is None:
+            rows = array('I')
+            for found in self.cells.values():
+                rows.extend(found)
+        else:
+            rows = self.candidates(lat, lon, radius_km)
+        if not rows:
+            return {}
+        if numpy is not None:
+            # Zero-copy views on the snapshot's columns, gathered by row
+            index = numpy.frombuffer(rows, dtype=numpy.uint32)
+            lats = numpy.frombuffer(self.lats, dtype=numpy.float64)[index]
+            lons = numpy.frombuffer(self.lons, dtype=numpy.float64)[index]
+        else:
+            lats = [self.lats[i] for i in rows]
+            lons = [self.lons[i] for i in rows]
+        found = haversine_km(lat, lon, lats, lons)
+        return {i: d for i, d in zip(rows, found) if radius_km is None or d <= radius_km}
@@ -1,5 +1,8 @@
 import re
 
+_PUNCTUATION_RE = re.compile(r'[.,;:!?()\[\]{}"\']')
+_SPACES_RE = re.compile(r'\s+')
+
 def normalize_text(text: str) -> str:
     """
     Normalizes text: lowercase, removes punctuation, collapses spaces.
@@ -10,9 +13,9 @@ def normalize_text(text: str) -> str:
     s = text.lower()
     # Remove punctuation (keep alphanumeric and spaces)
     # Using regex to replace typical punctuation with space to avoid merging words
-    s = re.sub(r'[.,;:!?()\[\]{}"\']', ' ', s)
+    s = _PUNCTUATION_RE.sub(' ', s)
     # Collapse multiple spaces
-    s = re.sub(r'\s+', ' ', s)
+    s = _SPACES_RE.sub(' ', s)
     return s.strip()
 
 KEYWORDS_STRONG = [
@@ -3,8 +3,14 @@ from . import views
 
 urlpatterns = [
     path('', views.search_view, name='search'),
+    path('search/job/<int:pk>/', views.search_job_view, name='search_job'),
+    path('search/job/<int:pk>/results/', views.search_job_results, name='search_job_results'),
     path('results/', views.results_view, name='results'),
+    path('results/live/', views.live_results_view, name='live_results'),
+    path('results/live/events/', views.live_results_events, name='live_results_events'),
     path('results/map/', views.map_view, name='map_view'),
+    path('local/', views.local_search_view, name='local_search'),
+    path('export/<int:pk>/<str:fmt>/', views.export_view, name='export_search'),
     
     # New Persistence Features
     path('history/', views.history_view, name='history'),
@@ -14,6 +20,10 @@ urlpatterns = [
     # Actions
     path('api/toggle_favorite/', views.toggle_favorite, name='toggle_favorite'),
     path('api/save_search/', views.save_search, name='save_search'),
+    path('api/search_job/<int:pk>/', views.search_job_status, name='search_job_status'),
+    path('api/local_search/', views.local_search_api, name='local_search_api'),
+    path('api/results/<int:search_id>/details/', views.result_details, name='result_details'),
+    path('api/results/<int:search_id>/map/', views.map_data, name='map_data'),
     path('api/delete_history/<int:pk>/', views.delete_history, name='delete_history'),
     path('api/delete_saved/<int:pk>/', views.delete_saved_search, name='delete_saved_search'),
 ]
@@ -1,11 +1,24 @@
 import json
-from datetime import datetime
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, JsonResponse
+from urllib.parse import urlencode
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.core import serializers
-from .services import run_search
-from .models import GeoCache
-from .cities_data import ITALIAN_CITIES
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.db.models import F
+from .export import EXPORT_FORMATS, available_formats, export_filename, iter_export
+from .jobs import fail_stale_jobs, submit_search, tracking
+from .local_search import search_listings
+from .favorites import mark_favorites, toggle_favorite as _toggle_favorite
+from .clusters import map_features
+from .facets import FacetIndex, apply_filters, facet_options, get_facet_index, selected_filters
+from .pagination import DEFAULT_SORT, keyset_page
+from .records import ResultRow
+from .gazetteer import get_gazetteer
+from .snapshot import DETAIL_FIELDS, load_snapshot, results_version, snapshot_page
+from .spatial import RADIUS_CHOICES, parse_radius, rows_mask
+from .services import SearchProgress, iter_search
+from .models import Item, SearchJob
 
 def search_view(request):
     if request.method == 'POST':
@@ -13,78 +26,196 @@ def search_view(request):
         limit = int(request.POST.get('limit', 35))
         title_only = request.POST.get('title_only') == 'on'
         shippable_only = request.POST.get('shippable_only') == 'on'
+        incremental = request.POST.get('incremental') == 'on'
         if query:
-            items_list = run_search(query, limit=limit, title_only=title_only, shippable_only=shippable_only)
-            
-            # Save results to session
-            request.session['search_results'] = items_list
-            request.session['search_query'] = query
-            request.session['total_results'] = len(items_list) # Simplified count
-            
-            return redirect('results')
+            if request.POST.get('live') == 'on':
+                # Stream rows into the results page while the crawl runs
+                params = {'query': query, 'limit': limit, 'title_only': int(title_only), 'shippable_only': int(shippable_only)}
+                return redirect(f"{reverse('live_results')}?{urlencode(params)}")
+
+            # Crawl in the background, the browser polls the job page
+            job = submit_search(query, limit=limit, title_only=title_only, shippable_only=shippable_only,
+                                incremental=incremental)
+            return redirect('search_job', pk=job.pk)
     return render(request, 'scraper/search.html')
 
+def search_job_view(request, pk):
+    # A job left queued/running by a restart would otherwise spin forever
+    fail_stale_jobs(pk)
+    job = get_object_or_404(SearchJob, pk=pk)
+    return render(request, 'scraper/search_job.html', {'job': job})
+
+def search_job_status(request, pk):
+    fail_stale_jobs(pk)
+    job = get_object_or_404(SearchJob, pk=pk)
+    return JsonResponse({
+        'status': job.status,
+        'pages_done': job.pages_done,
+        'pages_total': job.pages_total,
+        'items_count': job.items_count,
+        'pages_failed': job.pages_failed,
+        'error': job.error,
+    })
+
+def search_job_results(request, pk):
+    job = get_object_or_404(SearchJob, pk=pk, status=SearchJob.STATUS_DONE)
+
+    # The rows live in Item, the session only remembers which search to show
+    request.session['search_id'] = job.search_query_id
+
+    return redirect('results')
+
+def _search_params(params):
+    return {
+        'query': params.get('query', ''),
+        'limit': int(params.get('limit', 35)),
+        'title_only': params.get('title_only') == '1',
+        'shippable_only': params.get('shippable_only') == '1',
+    }
+
+def live_results_view(request):
+    params = _search_params(request.GET)
+    if not params['query']:
+        return redirect('search')
+    context = {
+        'search': {'query': params['query'], 'total_results': 0},
+        'items': [],
+        'page_start': 0,
+        # Rows arrive over SSE, nothing to cache
+        'fragment_key': 'live',
+        'fragment_timeout': 0,
+        'stream_url': f"{reverse('live_results_events')}?{request.GET.urlencode()}",
+    }
+    return render(request, 'scraper/results.html', context)
+
+def live_results_events(request):
+    """
+    Server-Sent Events: una riga renderizzata per ogni annuncio, appena la
+    sua pagina Hades arriva. A fine crawl i risultati finiscono in un
+    SearchJob, così ordinamento e mappa funzionano come per i job.
+    """
+    params = _search_params(request.GET)
+    if not params['query']:
+        return JsonResponse({'status': 'error', 'message': 'Missing query'}, status=400)
+
+    job = SearchJob.objects.create(status=SearchJob.STATUS_RUNNING, **params)
+
+    def sse(event, data):
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    def events():
+        progress = SearchProgress()
+        items_count = 0
+        # iter_search saves the rows as Item while they stream
+        stream = iter_search(progress=progress, **params)
+        try:
+            with tracking(job.pk, progress):
+                for item in stream:
+                    items_count += 1
+                    # Streamed rows carry their description inline, there's no snapshot yet
+                    context = {'item': ResultRow.from_dict(item), 'description': item.get('description'),
+                               'row_number': items_count}
+                    yield sse('item', {
+                        'row': render_to_string('scraper/_result_row.html', context),
+                        'card': render_to_string('scraper/_result_card.html', context),
+                    })
+            job.status = SearchJob.STATUS_DONE
+            last = sse('done', {'count': items_count, 'results_url': reverse('search_job_results', args=[job.pk])})
+        except GeneratorExit:
+            # Client went away: stop the crawl, and don't leave the job running forever
+            stream.close()
+            job.status = SearchJob.STATUS_FAILED
+            job.error = "Client disconnected"
+            raise
+        except Exception as e:
+            job.status = SearchJob.STATUS_FAILED
+            job.error = str(e)
+            last = sse('failed', {'message': str(e)})
+        finally:
+            job.pages_done = progress.pages_done
+            job.pages_total = progress.pages_total
+            job.pages_failed = len(progress.failed_pages)
+            job.items_count = items_count
+            job.search_query_id = progress.search_id
+            job.save()
+        # Only once the job is saved, or the redirect to results_url could race it
+        yield last
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+# Columns each page actually renders; the LISTING_FIELDS ones are joined in from Listing
+RESULT_FIELDS = (
+    'subito_id', 'title', 'price_str', 'price_num', 'date_pub', 'date_pub_iso', 'region', 'province', 'town',
+    'condition', 'shipping_cost', 'shippable', 'image_url', 'url', 'defect_flag', 'defect_reason', 'previous_price',
+)
+LISTING_FIELDS = ('subito_id', 'title', 'date_pub', 'image_url', 'url', 'description', 'defect_reason', 'previous_price')
+
+RESULTS_FRAGMENT_TIMEOUT = 60 * 60
+
+def _with_listing(items, fields):
+    return items.annotate(**{f: F(f'listing__{f}') for f in fields if f in LISTING_FIELDS})
+
+def _current_search(request):
+    search_id = request.session.get('search_id')
+    if search_id is None:
+        return None
+    return SearchQuery.objects.filter(pk=search_id).first()
+
 def results_view(request):
-    # Get items from session
-    items_data = request.session.get('search_results', [])
-    query = request.session.get('search_query', 'Unknown')
-    total_results = request.session.get('total_results', 0)
-    
-    # Process items (restore datetime objects for sorting/filtering/display)
-    # We essentially treat them as objects to match template usage as much as possible, 
-    # but they are dicts, so we can access them as such. However, Django templates 
-    # access dict keys via dot notation, so {{ item.title }} works for dicts too.
-    
-    processed_items = []
-    for item in items_data:
-        # Clone to avoid modifying session data in place (though session is re-saved only on modify)
-        # But we need to parse dates
-        new_item = item.copy()
-        if new_item.get('date_pub_iso'):
-            try:
-                new_item['date_pub_iso'] = datetime.fromisoformat(new_item['date_pub_iso'])
-            except:
-                pass
-        processed_items.append(new_item)
-
-    # Filter by shipping if requested on results page
-    shippable_param = request.GET.get('shippable')
-    if shippable_param == 'true':
-        processed_items = [i for i in processed_items if i.get('shippable')]
-    elif shippable_param == 'false':
-        processed_items = [i for i in processed_items if not i.get('shippable')]
-    
-    # Mark favorites
-    favorite_ids = set(Favorite.objects.values_list('subito_id', flat=True))
-    for item in processed_items:
-        if item.get('subito_id') in favorite_ids:
-            item['is_favorite'] = True
-    
-    # Simple server-side sorting (In-Memory)
-    sort_by = request.GET.get('sort')
-    
-    def get_price(i):
-        return i.get('price_num') or 0.0
-
-    def get_date(i):
-        # We need to handle potential string/datetime mismatch if logic fails, but we parsed above
-        d = i.get('date_pub_iso')
-        if not d:
-            return datetime.min
-        return d
-
-    if sort_by == 'price_asc':
-        processed_items.sort(key=get_price)
-    elif sort_by == 'price_desc':
-        processed_items.sort(key=get_price, reverse=True)
-    elif sort_by == 'date_desc':
-        processed_items.sort(key=get_date, reverse=True)
-    elif sort_by == 'date_asc':
-        processed_items.sort(key=get_date)
+    search = _current_search(request)
+    items = Item.objects.filter(search_query=search) if search else Item.objects.none()
+    items = _with_listing(items, RESULT_FIELDS)
+
+    # Facet filters (shippable included); the counts come from the cached bitmaps
+    selected = selected_filters(request.GET)
+    items = apply_filters(items, selected)
+    facet_index = get_facet_index(search.pk) if search else FacetIndex([])
+
+    # "Within km of near": distances from the snapshot's spatial index, offline place lookup
+    location = {k: request.GET[k].strip() for k in ('near', 'km') if request.GET.get(k, '').strip()}
+    origin = get_gazetteer().find(location['near']) if 'near' in location else None
+    radius = parse_radius(location.get('km'))
+    if radius is None:
+        location.pop('km', None)
+
+    # A finished search pages over its snapshot (stored sort order + facet bitmap), older ones over the DB
+    snapshot = load_snapshot(search.pk) if search else None
+    distances = base = None
+    if snapshot is not None and len(snapshot) == facet_index.size:
+        if origin is not None:
+            distances = snapshot.spatial_index().distances(*origin, radius_km=radius)
+            if radius is not None:
+                base = rows_mask(distances, len(snapshot))
+        mask = facet_index.mask(selected, base=base) if selected or base is not None else None
+        page = snapshot_page(snapshot, sort=request.GET.get('sort'), mask=mask,
+                             after=request.GET.get('after'), before=request.GET.get('before'), distances=distances)
+        rows = page.rows
     else:
-        # Default sort
-        processed_items.sort(key=get_date, reverse=True)
-    
+        page = keyset_page(items, RESULT_FIELDS, sort=request.GET.get('sort'),
+                           after=request.GET.get('after'), before=request.GET.get('before'))
+        rows = [ResultRow.from_dict(row) for row in page.rows]
+
+    # Only this page's rows, against the in-memory favorite ids
+    mark_favorites(rows)
+
+    # Pager links keep sort and filters, and swap the cursor
+    params = request.GET.copy()
+    params.pop('after', None)
+    params.pop('before', None)
+
+    def page_url(key, cursor):
+        if not cursor:
+            return None
+        query = params.copy()
+        query[key] = cursor
+        return f"?{query.urlencode()}"
+
+    # 0 until the search has a snapshot: its rows may still change, so they aren't cached
+    version = results_version(search.pk) if search else 0
+
     # Mock a search object for the template to display the title
     class MockSearch:
         def __init__(self, q, count):
@@ -92,75 +223,93 @@ def results_view(request):
             self.total_results = count
             
     context = {
-        'search': MockSearch(query, total_results),
-        'items': processed_items,
+        'search': MockSearch(search.query if search else 'Unknown', facet_index.mask(selected, base=base).bit_count()),
+        'items': rows,
+        'search_id': search.pk if search else None,
+        'export_formats': available_formats(),
+        'facets': facet_options(facet_index.counts(selected, base=base), selected),
+        # Sort/shipping links keep the other filters
+        'filter_query': urlencode({**selected, **location}),
+        'facet_query': urlencode({**{k: v for k, v in selected.items() if k != 'shippable'}, **location}),
+        'distance_available': distances is not None,
+        'near_unknown': 'near' in location and origin is None,
+        'radius_choices': RADIUS_CHOICES,
+        'page_start': page.start,
+        'page_end': page.start + len(rows),
+        # The rendered rows are cached per search, results version, page and favorites shown
+        'fragment_key': ':'.join([
+            str(search.pk) if search else '-', str(version),
+            request.GET.get('sort') or DEFAULT_SORT, urlencode(sorted({**selected, **location}.items())),
+            str(page.start),
+            ','.join(str(row.id) for row in rows if row.is_favorite),
+        ]),
+        'fragment_timeout': RESULTS_FRAGMENT_TIMEOUT if version else 0,
+        'next_url': page_url('after', page.next_cursor),
+        'prev_url': page_url('before', page.prev_cursor),
     }
     return render(request, 'scraper/results.html', context)
 
 def map_view(request):
-    # Get items from session
-    raw_items = request.session.get('search_results', [])
-    
-    # Geocoding logic
-    # We need to extract locations and coordinates
-    items_data = []
-    
-    for item in raw_items:
-        # ... logic similar to previous but using dict access ...
-        town = (item.get('town') or '').lower().strip()
-        province = (item.get('province') or '').lower().strip()
-        region = (item.get('region') or '').lower().strip()
-        
-        # ... (Geocoding logic remains mostly same, just adapt key access)
-        location_key = f"{town}" or f"{province}"
-        if not location_key and region:
-            location_key = region
-            
-        lat = None
-        lon = None
-        
-        if location_key:
-             # Check DB cache first
-            cached = GeoCache.objects.filter(location_key=location_key).first()
-            if cached:
-                lat = cached.latitude
-                lon = cached.longitude
-            else:
-                 # Check static list
-                if location_key in ITALIAN_CITIES:
-                    coords = ITALIAN_CITIES[location_key]
-                    lat = coords[0]
-                    lon = coords[1]
-                    # Update cache
-                    GeoCache.objects.create(location_key=location_key, latitude=lat, longitude=lon)
-        
-        # Add lat/lon to display item
-        # We create a new dict for display
-        display_item = item.copy()
-        display_item['lat'] = lat
-        display_item['lon'] = lon
-        items_data.append(display_item)
-
-    # Use json.dumps for the script, but we need to serialize dates/floats carefully
-    # The existing template expects 'items_data' generic variable
-    # We can pass the items_data list directly to json_script if clean
-    
-    # Clean for JSON
-    json_items = []
-    for i in items_data:
-        j_item = i.copy()
-        # Remove non-serializable objects if any (datetime)
-        if 'date_pub_iso' in j_item:
-            # It's a string in the session, but we might have parsed it if we reused logic?
-            # In session it is string. In raw_items it is string.
-            pass 
-        json_items.append(j_item)
-        
+    search = _current_search(request)
+    # The markers are loaded from map_data for the visible area and zoom
     context = {
-        'items_data_json': json.dumps(json_items) # Pass as string to be used safely
+        'map_data_url': reverse('map_data', args=[search.pk]) if search else '',
+        'details_url': reverse('result_details', args=[search.pk]) if search else '',
     }
     return render(request, 'scraper/map.html', context)
 
+def map_data(request, search_id):
+    """GeoJSON dei marker (annunci o cluster) nel riquadro `bbox`=ovest,sud,est,nord allo zoom `z`."""
+    try:
+        zoom = int(request.GET.get('z', 6))
+        bbox = tuple(float(v) for v in request.GET['bbox'].split(',')) if request.GET.get('bbox') else None
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid z or bbox'}, status=400)
+    if bbox is not None and len(bbox) != 4:
+        return JsonResponse({'status': 'error', 'message': 'Invalid bbox'}, status=400)
+    get_object_or_404(SearchQuery, pk=search_id)
+    return JsonResponse(map_features(search_id, zoom, bbox), json_dumps_params={'separators': (',', ':')})
+
+def export_view(request, pk, fmt):
+    """Scarica gli annunci di una ricerca, in streaming a blocchi dal DB."""
+    search = get_object_or_404(SearchQuery, pk=pk)
+    if fmt not in available_formats():
+        return JsonResponse({'status': 'error', 'message': f'Unsupported format: {fmt}'}, status=400)
+    content_type, _ = EXPORT_FORMATS[fmt]
+    response = StreamingHttpResponse(iter_export(search.pk, fmt), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(search.query, search.pk, fmt)}"'
+    return response
+
+def result_details(request, search_id):
+    """Campi pesanti di un annuncio (descrizione, link, immagine), chiesti al passaggio del mouse o dalla mappa."""
+    try:
+        item_id = int(request.GET.get('id', ''))
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Missing id'}, status=400)
+
+    snapshot = load_snapshot(search_id)
+    row = snapshot.find(item_id) if snapshot is not None else None
+    if row is not None:
+        return JsonResponse(snapshot.details(row))
+
+    # Search still running, or saved before snapshots: read the Listing
+    details = _with_listing(Item.objects.filter(pk=item_id, search_query_id=search_id), DETAIL_FIELDS)
+    details = details.values(*DETAIL_FIELDS).first()
+    if details is None:
+        return JsonResponse({'status': 'error', 'message': 'Not found'}, status=404)
+    return JsonResponse(details)
+
+def local_search_view(request):
+    """Ricerca full-text negli annunci già scaricati, senza interrogare Subito."""
+    query = request.GET.get('q', '').strip()
+    results = search_listings(query) if query else []
+    return render(request, 'scraper/local_search.html', {'query': query, 'results': results})
+
+def local_search_api(request):
+    query = request.GET.get('q', '').strip()
+    results = search_listings(query) if query else []
+    return JsonResponse({'query': query, 'results': [dict(r, snippet=str(r['snippet'])) for r in results]})
+
 # Persistence Views
 from .models import SearchQuery, Favorite, SavedSearch
 from django.views.decorators.http import require_POST
@@ -187,23 +336,16 @@ def toggle_favorite(request):
         if not subito_id:
             return JsonResponse({'status': 'error', 'message': 'Missing ID'}, status=400)
             
-        fav = Favorite.objects.filter(subito_id=subito_id).first()
-        if fav:
-            fav.delete()
-            return JsonResponse({'status': 'removed'})
-        else:
-            # Create new favorite
-            Favorite.objects.create(
-                subito_id=subito_id,
-                title=data.get('title'),
-                price_str=data.get('price_str'),
-                price_num=data.get('price_num') if data.get('price_num') else None,
-                url=data.get('url'),
-                image_url=data.get('image_url'),
-                town=data.get('town'),
-                region=data.get('region')
-            )
-            return JsonResponse({'status': 'added'})
+        added = _toggle_favorite(subito_id, {
+            'title': data.get('title'),
+            'price_str': data.get('price_str'),
+            'price_num': data.get('price_num') if data.get('price_num') else None,
+            'url': data.get('url'),
+            'image_url': data.get('image_url'),
+            'town': data.get('town'),
+            'region': data.get('region'),
+        })
+        return JsonResponse({'status': 'added' if added else 'removed'})
             
     except Exception as e:
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
@@ -124,3 +124,12 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# External geocoder for the places the offline gazetteer doesn't know (scraper.geocoder).
+# Off by default: set GEOCODER_BACKEND = 'nominatim' and point GEOCODER_URL at a Nominatim-compatible
+# server, ideally your own. The public nominatim.openstreetmap.org allows 1 request/second and
+# wants a User-Agent that identifies the application with contact details.
+GEOCODER_BACKEND = ''
+GEOCODER_URL = ''
+GEOCODER_USER_AGENT = 'subitissimo'
+GEOCODER_RATE = 1.0
@@ -0,0 +1,57 @@
+import os
+
+import django
+import pytest
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'subitissimo_project.settings')
+django.setup()
+
+
+@pytest.fixture(scope='session')
+def django_test_db():
+    from django.test.runner import DiscoverRunner
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    runner = DiscoverRunner(verbosity=0, interactive=False)
+    old_config = runner.setup_databases()
+    yield
+    runner.teardown_databases(old_config)
+    teardown_test_environment()
+
+
+@pytest.fixture
+def db(django_test_db):
+    """Test con il DB di test: ogni test gira in una transazione annullata alla fine."""
+    from django.core.cache import cache
+    from django.db import transaction
+
+    cache.clear()
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+@pytest.fixture
+def search(db):
+    """Una ricerca conclusa da 400 annunci, con il suo snapshot."""
+    from scraper.models import SearchQuery
+    from scraper.services import save_results
+    from scraper.snapshot import store_snapshot
+    from tests.factories import make_items
+
+    search = SearchQuery.objects.create(query='test')
+    save_results(search.pk, make_items(400))
+    store_snapshot(search.pk)
+    return search
+
+
+@pytest.fixture
+def transactional_db(django_test_db):
+    """Per i test con altri thread (che non vedono la transazione di `db`): le tabelle si svuotano alla fine."""
+    from django.core.cache import cache
+    from django.core.management import call_command
+
+    cache.clear()
+    yield
+    call_command('flush', interactive=False, verbosity=0)
@@ -0,0 +1,58 @@
+import random
+from typing import Any, Dict, List, Optional
+
+from scraper.gazetteer import read_gazetteer
+from scraper.normalizer import normalize_page
+
+REGIONS = ('Lazio', 'Sicilia', 'Lombardia', '')
+WORDS = ('iphone', 'bici', 'divano', 'monitor', 'come nuovo', 'graffi', 'tavolo', 'lampada', 'usato', 'ottimo')
+
+
+def hades_ad(i: int, price: Optional[float] = 10.0, date: str = '2026-01-02T10:00:00+01:00', region: str = 'Lazio',
+             province: str = 'Roma', town: str = 'Roma', shippable: bool = True, subject: str = '',
+             body: str = '') -> Dict[str, Any]:
+    """Un annuncio come lo restituisce Hades, con i soli campi che il normalizzatore legge."""
+    features = [
+        {'uri': '/item_condition', 'values': [{'key': '20', 'value': 'Usato - Come nuovo'}]},
+        {'uri': '/item_shipping_type', 'values': [{'key': '1', 'value': 'TuttoSubito'}]},
+        {'uri': '/item_shippable', 'values': [{'key': str(shippable).lower(), 'value': str(shippable).lower()}]},
+    ]
+    if price is not None:
+        features.append({'uri': '/price', 'values': [{'key': f'{price:g}', 'value': f'{price:g} €'}]})
+    return {
+        'urn': f'id:ad:{i}',
+        'subject': subject or f'annuncio {i}',
+        'body': body or f'descrizione {i}',
+        'dates': {'display': 'Oggi', 'display_iso8601': date},
+        'category': {'value': 'Informatica'},
+        'geo': {'region': {'value': region}, 'city': {'value': province}, 'town': {'value': town}},
+        'features': features,
+        'urls': {'default': f'https://www.subito.it/annuncio/{i}.htm'},
+        'images': [{'base_url': f'https://s.sbito.it/img/{i}'}],
+        'favorites': i % 7,
+    }
+
+
+def random_ads(n: int, seed: int = 1, start: int = 0) -> List[Dict[str, Any]]:
+    """
+    Annunci sintetici con prezzi e date mancanti, pari merito (prezzi interi
+    in un intervallo stretto), regioni vuote e luoghi del gazetteer o ignoti.
+    """
+    rnd = random.Random(seed)
+    places = [(name, province) for kind, name, province, _, _ in read_gazetteer() if kind == 'town']
+    ads = []
+    for i in range(start, start + n):
+        town, province = rnd.choice(places) if rnd.random() > 0.05 else ('', '')
+        ads.append(hades_ad(
+            i,
+            price=float(rnd.randint(1, 300)) if rnd.random() > 0.15 else None,
+            date=f'2026-01-{rnd.randint(1, 28):02d}T10:00:00+01:00' if rnd.random() > 0.1 else '',
+            region=rnd.choice(REGIONS), province=province, town=town, shippable=rnd.random() < 0.5,
+            subject=' '.join(rnd.choices(WORDS, k=4)), body=' '.join(rnd.choices(WORDS, k=20)),
+        ))
+    return ads
+
+
+def make_items(n: int, seed: int = 1) -> List[Dict[str, Any]]:
+    """Annunci normalizzati, pronti per services.save_results."""
+    return normalize_page(random_ads(n, seed))
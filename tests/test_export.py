@@ -0,0 +1,92 @@
+import csv
+import io
+import json
+
+import pytest
+from django.test import Client
+
+from scraper import export
+from scraper.export import EXPORT_FIELDS, available_formats, export_rows, iter_export
+
+# Small blocks, so the 400 rows span several Parquet row groups and Arrow batches
+CHUNK = 64
+
+needs_pyarrow = pytest.mark.skipif(export.pyarrow is None, reason="pyarrow is not installed")
+
+
+def _download(search, fmt):
+    response = Client().get(f'/export/{search.pk}/{fmt}/')
+    assert response.status_code == 200
+    assert response['Content-Type'] == export.EXPORT_FORMATS[fmt][0]
+    assert f'_{search.pk}.{export.EXPORT_FORMATS[fmt][1]}"' in response['Content-Disposition']
+    return b''.join(response.streaming_content)
+
+
+def _chunks(search, fmt):
+    chunks = list(iter_export(search.pk, fmt, chunk_size=CHUNK))
+    return ''.join(chunks).encode() if isinstance(chunks[0], str) else b''.join(chunks)
+
+
+@pytest.fixture
+def expected(search):
+    rows = list(export_rows(search.pk))
+    assert len(rows) == 400
+    return rows
+
+
+def test_csv_round_trip(search, expected):
+    for data in (_download(search, 'csv'), _chunks(search, 'csv')):
+        reader = csv.DictReader(io.StringIO(data.decode()))
+        assert tuple(reader.fieldnames) == EXPORT_FIELDS
+        assert list(reader) == [{field: '' if row[field] is None else str(row[field]) for field in EXPORT_FIELDS}
+                                for row in expected]
+
+
+def test_ndjson_round_trip(search, expected):
+    for data in (_download(search, 'ndjson'), _chunks(search, 'ndjson')):
+        rows = [json.loads(line) for line in data.decode().splitlines()]
+        assert rows == [json.loads(json.dumps(row, default=str)) for row in expected]
+
+
+@needs_pyarrow
+def test_parquet_round_trip(search, expected):
+    import pyarrow.parquet
+
+    for data in (_download(search, 'parquet'), _chunks(search, 'parquet')):
+        assert pyarrow.parquet.read_table(io.BytesIO(data)).to_pylist() == expected
+    assert pyarrow.parquet.ParquetFile(io.BytesIO(_chunks(search, 'parquet'))).num_row_groups == 7
+
+
+@needs_pyarrow
+def test_arrow_round_trip(search, expected):
+    import pyarrow.ipc
+
+    for data in (_download(search, 'arrow'), _chunks(search, 'arrow')):
+        table = pyarrow.ipc.open_stream(data).read_all()
+        assert table.column_names == list(EXPORT_FIELDS)
+        assert table.to_pylist() == expected
+
+
+def test_empty_search_exports_only_the_header(db):
+    from scraper.models import SearchQuery
+
+    search = SearchQuery.objects.create(query='niente')
+    assert _download(search, 'csv').decode().splitlines() == [','.join(EXPORT_FIELDS)]
+    assert _download(search, 'ndjson') == b''
+
+
+@pytest.mark.parametrize('fmt', ['xlsx', 'CSV', 'json'])
+def test_unknown_format_is_rejected(search, fmt):
+    response = Client().get(f'/export/{search.pk}/{fmt}/')
+    assert response.status_code == 400
+    assert json.loads(response.content)['status'] == 'error'
+
+
+def test_arrow_formats_need_pyarrow(search, monkeypatch):
+    monkeypatch.setattr(export, 'pyarrow', None)
+    assert available_formats() == ('csv', 'ndjson')
+    assert Client().get(f'/export/{search.pk}/parquet/').status_code == 400
+
+
+def test_unknown_search_is_404(db):
+    assert Client().get('/export/999999/csv/').status_code == 404
@@ -0,0 +1,58 @@
+import pytest
+
+from scraper.facets import FacetIndex, apply_filters, get_facet_index, price_bucket
+from scraper.models import Item
+from scraper.spatial import rows_mask
+
+SELECTIONS = (
+    {},
+    {'region': 'Lazio'},
+    {'region': '-', 'shippable': 'false'},
+    {'price': '100-250', 'shippable': 'true'},
+    {'price': '-'},
+    {'region': 'Nowhere'},
+)
+
+
+def _facet_rows(search):
+    fields = [name for name in FacetIndex.FIELDS if name != 'price'] + ['price_num']
+    rows = list(Item.objects.filter(search_query=search).order_by('id').values(*fields))
+    for row in rows:
+        row['price'] = price_bucket(row['price_num'])
+        row['shippable'] = 'true' if row['shippable'] else 'false'
+        for name in FacetIndex.FIELDS:
+            row[name] = row[name] or '-'
+    return rows
+
+
+def _matches(row, selected, exclude=None):
+    return all(row[name] == value for name, value in selected.items() if name != exclude)
+
+
+@pytest.mark.parametrize('selected', SELECTIONS)
+def test_counts_match_a_scan_of_the_items(search, selected):
+    rows = _facet_rows(search)
+    counts = get_facet_index(search.pk).counts(selected)
+    for name in FacetIndex.FIELDS:
+        expected = {}
+        for row in rows:
+            if _matches(row, selected, exclude=name):
+                expected[row[name]] = expected.get(row[name], 0) + 1
+        assert counts[name] == expected, name
+
+
+@pytest.mark.parametrize('selected', SELECTIONS)
+def test_mask_agrees_with_the_db_filters(search, selected):
+    index = get_facet_index(search.pk)
+    ids = list(Item.objects.filter(search_query=search).order_by('id').values_list('id', flat=True))
+    in_mask = {ids[i] for i in range(index.size) if index.mask(selected) >> i & 1}
+    filtered = apply_filters(Item.objects.filter(search_query=search), selected)
+    assert in_mask == set(filtered.values_list('id', flat=True))
+
+
+def test_base_mask_narrows_mask_and_counts(search):
+    index = get_facet_index(search.pk)
+    base = rows_mask(range(0, index.size, 3), index.size)
+    assert index.mask({}, base=base) == base
+    assert index.mask({'region': 'Lazio'}, base=base) == base & index.bitmaps['region'].get('Lazio', 0)
+    assert sum(index.counts({}, base=base)['shippable'].values()) == base.bit_count()
@@ -0,0 +1,76 @@
+import pytest
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from scraper import favorites
+from scraper.favorites import FAVORITES_VERSION, favorite_ids, mark_favorites, toggle_favorite
+from scraper.models import CacheVersion, Favorite
+
+
+@pytest.fixture
+def fresh(db, monkeypatch):
+    # The DB is rolled back after every test, the process-local copy is not
+    monkeypatch.setattr(favorites, '_ids', frozenset())
+    monkeypatch.setattr(favorites, '_version', None)
+
+
+def _fields(subito_id):
+    return {'title': subito_id, 'url': f'https://www.subito.it/{subito_id}.htm'}
+
+
+def _version():
+    return CacheVersion.objects.get(name=FAVORITES_VERSION).value
+
+
+def _added_elsewhere(subito_id):
+    """Quello che fa un altro processo: scrive nel DB senza toccare la nostra copia."""
+    with transaction.atomic():
+        Favorite.objects.create(subito_id=subito_id, **_fields(subito_id))
+        favorites._bump_version()
+
+
+def test_toggle_bumps_the_version(fresh):
+    assert favorite_ids() == frozenset()
+    assert toggle_favorite('a', _fields('a')) is True
+    assert _version() == 1
+    assert favorite_ids() == {'a'}
+    assert toggle_favorite('a', _fields('a')) is False
+    assert _version() == 2
+    assert favorite_ids() == frozenset()
+    assert not Favorite.objects.exists()
+
+
+def test_unchanged_version_is_served_from_memory(fresh):
+    toggle_favorite('a', _fields('a'))
+    favorite_ids()
+    with CaptureQueriesContext(connection) as queries:
+        assert favorite_ids() == {'a'}
+    assert len(queries) == 1
+    assert 'scraper_favorite' not in queries[0]['sql']
+
+
+def test_stale_copy_reloads(fresh):
+    toggle_favorite('a', _fields('a'))
+    assert favorite_ids() == {'a'}
+    _added_elsewhere('b')
+    assert favorite_ids() == {'a', 'b'}
+
+
+def test_toggle_after_a_change_elsewhere_reloads(fresh):
+    toggle_favorite('a', _fields('a'))
+    _added_elsewhere('b')
+    # Our bump is not the next one after our copy: it can't be patched in place
+    toggle_favorite('c', _fields('c'))
+    assert favorites._version is None
+    assert favorite_ids() == {'a', 'b', 'c'}
+
+
+def test_mark_favorites(fresh):
+    class Row:
+        def __init__(self, subito_id):
+            self.subito_id = subito_id
+
+    toggle_favorite('a', _fields('a'))
+    rows = [Row('a'), Row('b')]
+    mark_favorites(rows)
+    assert [row.is_favorite for row in rows] == [True, False]
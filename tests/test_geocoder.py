@@ -0,0 +1,139 @@
+import asyncio
+import json
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from django.utils import timezone
+
+from scraper import geo, geocoder
+from scraper.geocoder import NominatimGeocoder
+from scraper.models import GeoCache, Item, SearchQuery
+from scraper.normalizer import normalize_page
+from scraper.services import save_results
+from scraper.snapshot import load_snapshot, store_snapshot
+from tests.factories import hades_ad
+
+pytestmark = pytest.mark.skipif(geocoder.httpx is None, reason="httpx not installed")
+
+BORGO = (44.1, 11.2)
+
+
+class StubNominatim(ThreadingHTTPServer):
+    """Un /search alla Nominatim: trova solo i luoghi in `known`, e risponde 429 a quelli in `throttle` una volta."""
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.known = {'Borgo Sperduto': BORGO}
+        self.throttle = set()
+        self.requests = []  # (monotonic time, q)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_port}'
+
+    def queries(self):
+        return [q for _, q in self.requests]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        q = parse_qs(urlparse(self.path).query)['q'][0]
+        self.server.requests.append((time.monotonic(), q))
+        town = q.split(',')[0]
+        if town in self.server.throttle:
+            self.server.throttle.discard(town)
+            self.send_response(429)
+            self.send_header('Retry-After', '1')
+            self.end_headers()
+            return
+        coords = self.server.known.get(town)
+        body = json.dumps([{'lat': str(coords[0]), 'lon': str(coords[1])}] if coords else []).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def stub():
+    server = StubNominatim()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def queue(stub, transactional_db):
+    geo._resolved.clear()
+    yield geocoder.set_geocoder(NominatimGeocoder(stub.url, rate=50))
+    geocoder.set_geocoder(None)
+    geocoder._configured = False
+    geo._resolved.clear()
+
+
+def _save_search(towns):
+    search = SearchQuery.objects.create(query='geo')
+    ads = [hades_ad(i, town=town, province='Bologna', region='Emilia-Romagna') for i, town in enumerate(towns)]
+    save_results(search.pk, normalize_page(ads))
+    store_snapshot(search.pk)
+    return search
+
+
+def test_hit_updates_geocache_items_and_snapshot(queue, stub):
+    search = _save_search(['Borgo Sperduto', 'Bologna'] * 3)
+    queue.join(10)
+
+    assert stub.queries() == ['Borgo Sperduto, Bologna, Emilia-Romagna']  # Bologna is in the gazetteer
+    cached = GeoCache.objects.get(location_key='borgo sperduto')
+    assert cached.found and (cached.latitude, cached.longitude) == BORGO
+    items = Item.objects.filter(search_query=search, town='Borgo Sperduto')
+    assert set(items.values_list('latitude', 'longitude')) == {BORGO}
+    assert BORGO[0] in set(load_snapshot(search.pk).columns['latitude'])
+
+    # The next search gets it from GeoCache, without asking again
+    _save_search(['Borgo Sperduto'])
+    queue.join(10)
+    assert len(stub.requests) == 1
+
+
+def test_miss_is_cached_until_its_ttl(queue, stub):
+    search = _save_search(['Nowhere'])
+    queue.join(10)
+    cached = GeoCache.objects.get(location_key='nowhere')
+    assert not cached.found and cached.latitude is None
+    # The province fallback stays
+    assert Item.objects.filter(search_query=search).values_list('latitude', flat=True).get() is not None
+
+    _save_search(['Nowhere'])
+    queue.join(10)
+    assert len(stub.requests) == 1
+
+    GeoCache.objects.filter(location_key='nowhere').update(
+        updated_at=timezone.now() - geo.GEO_NEGATIVE_TTL - timedelta(minutes=1))
+    geo._resolved.clear()
+    _save_search(['Nowhere'])
+    queue.join(10)
+    assert len(stub.requests) == 2
+
+
+def test_requests_respect_the_rate_and_retry_after(stub):
+    places = {f'place {i}': (f'Paese {i}', 'Bologna', '') for i in range(5)}
+    found = asyncio.run(NominatimGeocoder(stub.url, rate=10).geocode_many(places))
+    assert found == {key: None for key in places}
+    times = sorted(t for t, _ in stub.requests)
+    assert all(b - a >= 0.09 for a, b in zip(times, times[1:]))
+
+    stub.requests.clear()
+    stub.throttle.add('Borgo Sperduto')
+    found = asyncio.run(NominatimGeocoder(stub.url, rate=10).geocode_many({'borgo': ('Borgo Sperduto', '', '')}))
+    assert found == {'borgo': BORGO}
+    (first, _), (retry, _) = stub.requests
+    assert retry - first >= 1.0
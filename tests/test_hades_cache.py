@@ -0,0 +1,166 @@
+import asyncio
+
+import pytest
+
+from scraper import hades_cache
+from scraper.fetchers import HadesFetcher, HadesResponse
+from scraper.hades_cache import (MODE_LIVE, MODE_RECORD, MODE_REPLAY, CachedFetcher, HadesCache,
+                                 cache_key)
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class CountingFetcher(HadesFetcher):
+    backend = 'http'
+
+    def __init__(self):
+        self.calls = []
+
+    async def get(self, params):
+        self.calls.append(params)
+        return HadesResponse(200, {'start': params['start'], 'items': [{'urn': f"id:ad:{params['start']}"}]}, {})
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(hades_cache.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def make_cache(tmp_path):
+    caches = []
+
+    def make(**kwargs):
+        cache = HadesCache(tmp_path / 'hades.sqlite3', **kwargs)
+        caches.append(cache)
+        return cache
+
+    yield make
+    for cache in caches:
+        cache._db.close()
+
+
+def _page(start, size=0):
+    return HadesResponse(200, {'start': start, 'padding': 'x' * size}, {})
+
+
+def test_cache_key_ignores_other_params():
+    assert cache_key({'q': 'bici', 'start': 0, 'lim': 30, 't': 123}) == cache_key({'lim': '30', 'start': '0', 'q': 'bici'})
+    assert cache_key({'q': 'bici', 'start': 0}) != cache_key({'q': 'bici', 'start': 30})
+
+
+def test_entries_expire_after_ttl(clock, make_cache):
+    cache = make_cache(ttl=60)
+    cache.put('a', _page(0))
+    clock.now += 59
+    assert cache.get('a').payload == {'start': 0, 'padding': ''}
+    clock.now += 1
+    assert cache.get('a') is None
+
+
+def test_errors_are_not_stored(clock, make_cache):
+    cache = make_cache()
+    cache.put('a', HadesResponse(503, None, {}))
+    cache.put('b', HadesResponse(200, None, {}))
+    assert cache.stats()['entries'] == 0
+    assert cache.stats()['stores'] == 0
+
+
+def test_lru_eviction_keeps_under_max_bytes(clock, make_cache):
+    cache = make_cache()
+    cache.put('a', _page(0, 1000))
+    size = cache.stats()['bytes']
+    # Room for three of these pages
+    cache.max_bytes = 3 * size + size // 2
+    for key in 'bc':
+        clock.now += 1
+        cache.put(key, _page(0, 1000))
+    clock.now += 1
+    assert cache.get('a') is not None  # 'b' is now the least recently used
+
+    clock.now += 1
+    cache.put('d', _page(0, 1000))
+    assert cache.get('b') is None
+    assert all(cache.get(key) is not None for key in 'acd')
+    stats = cache.stats()
+    assert stats['entries'] == 3
+    assert stats['bytes'] <= cache.max_bytes
+    assert stats['evictions'] == 1
+
+
+def test_expired_entries_are_evicted_first(clock, make_cache):
+    cache = make_cache(ttl=10)
+    cache.put('old', _page(0))
+    clock.now += 10
+    cache.put('new', _page(30))
+    assert cache.stats()['entries'] == 1
+    assert cache.stats()['evictions'] == 1
+
+
+def test_stats_counters(clock, make_cache):
+    cache = make_cache()
+    assert cache.get('a') is None
+    cache.put('a', _page(0))
+    cache.put('b', _page(30))
+    assert cache.get('a') is not None
+    assert cache.get('a') is not None
+    assert cache.get('c') is None
+    stats = cache.stats()
+    assert stats['mode'] == MODE_LIVE
+    assert (stats['hits'], stats['misses'], stats['stores'], stats['entries']) == (2, 2, 2, 2)
+    assert stats['bytes'] > 0
+
+    cache.clear()
+    assert cache.stats()['entries'] == 0
+    assert cache.stats()['bytes'] == 0
+
+
+def test_cache_survives_reopening(clock, make_cache):
+    make_cache().put('a', _page(0))
+    assert make_cache().get('a').payload['start'] == 0
+
+
+def test_live_mode_serves_repeats_from_cache(clock, make_cache):
+    inner = CountingFetcher()
+    fetcher = CachedFetcher(inner, make_cache())
+    first = asyncio.run(fetcher.get({'q': 'bici', 'start': 0, 'lim': 30}))
+    again = asyncio.run(fetcher.get({'q': 'bici', 'start': 0, 'lim': 30}))
+    assert first.payload == again.payload
+    assert len(inner.calls) == 1
+    assert fetcher.backend == 'http'
+
+
+def test_record_then_replay(clock, make_cache):
+    inner = CountingFetcher()
+    recorder = CachedFetcher(inner, make_cache(mode=MODE_RECORD, ttl=1))
+    params = [{'q': 'bici', 'start': start, 'lim': 30} for start in (0, 30)]
+    for p in params * 2:
+        asyncio.run(recorder.get(p))
+    # Record always asks Hades, and what it stores never expires
+    assert len(inner.calls) == 4
+
+    clock.now += 24 * 3600
+    replay = CachedFetcher(None, make_cache(mode=MODE_REPLAY))
+    assert replay.backend == 'cache'
+    for p in params:
+        r = asyncio.run(replay.get(p))
+        assert r.ok
+        assert r.payload['start'] == p['start']
+    missing = asyncio.run(replay.get({'q': 'bici', 'start': 60, 'lim': 30}))
+    assert missing.status == 504
+    assert len(inner.calls) == 4
+
+
+def test_replay_ignores_expiry_of_live_entries(clock, make_cache):
+    make_cache(ttl=60).put(cache_key({'q': 'bici', 'start': 0}), _page(0))
+    clock.now += 3600
+    replay = CachedFetcher(None, make_cache(mode=MODE_REPLAY))
+    assert asyncio.run(replay.get({'q': 'bici', 'start': 0})).ok
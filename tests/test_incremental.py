@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from scraper import services
+from scraper.fetchers import HadesFetcher, HadesResponse
+from scraper.models import CrawlState, Item, Listing
+from tests.factories import hades_ad, random_ads
+
+LIMIT = 10
+
+
+class FakeHades(HadesFetcher):
+    """Hades finto: gli annunci in ordine datedesc, e gli offset chiesti."""
+
+    backend = 'http'
+
+    def __init__(self, ads):
+        self.ads = ads
+        self.failing = set()
+        self.starts = []
+
+    async def get(self, params):
+        start = int(params['start'])
+        self.starts.append(start)
+        if start in self.failing:
+            return HadesResponse(500, None, {})
+        return HadesResponse(200, {'count_all': len(self.ads), 'items': self.ads[start:start + int(params['lim'])]}, {})
+
+
+class InlinePool:
+    def run(self, coro):
+        return asyncio.run(coro)
+
+
+@pytest.fixture
+def hades(db, monkeypatch):
+    hades = FakeHades(random_ads(100))
+
+    async def fetch_first_page(stack, search_url, params0):
+        return hades, await hades.get(params0)
+
+    monkeypatch.setattr(services, '_fetch_first_page', fetch_first_page)
+    monkeypatch.setattr(services, 'get_pool', InlinePool)
+    return hades
+
+
+def _run():
+    return services.run_search('bici', limit=LIMIT, incremental=True)
+
+
+def test_first_run_crawls_everything(hades):
+    results = _run()
+    assert len(results) == 100
+    assert sorted(hades.starts) == list(range(0, 100, LIMIT))
+    state = CrawlState.objects.get(query='bici')
+    assert Item.objects.filter(search_query_id=state.search_query_id).count() == 100
+
+
+def test_second_run_stops_at_known_ads_and_carries_the_rest(hades):
+    _run()
+    first_id = CrawlState.objects.get().search_query_id
+    hades.ads[:0] = [hades_ad(1000 + i, price=99.0) for i in range(3)]
+    # A known ad on the first page changes price: it is fetched again, so it is fresh
+    hades.ads[5] = dict(hades.ads[5], features=hades_ad(0, price=1.0)['features'])
+    hades.starts.clear()
+
+    results = _run()
+    # Page 0 has new ads, page 1 is all known: nothing after it is requested
+    assert hades.starts == [0, LIMIT]
+    assert [r['subito_id'] for r in results] == [ad['urn'] for ad in hades.ads]
+    assert Listing.objects.get(subito_id=hades.ads[5]['urn']).price_num == 1.0
+
+    state = CrawlState.objects.get()
+    assert state.search_query_id != first_id
+    items = Item.objects.filter(search_query_id=state.search_query_id)
+    assert items.count() == 103
+    # The older ads are carried over from the previous result, not downloaded
+    last = hades.ads[-1]['urn']
+    assert items.get(listing__subito_id=last).price_num == \
+        Item.objects.get(search_query_id=first_id, listing__subito_id=last).price_num
+
+
+def test_failed_page_keeps_the_previous_state(hades):
+    _run()
+    first_id = CrawlState.objects.get().search_query_id
+    hades.ads[:0] = [hades_ad(1000 + i) for i in range(2 * LIMIT)]
+    hades.failing.add(LIMIT)
+
+    _run()
+    assert CrawlState.objects.get().search_query_id == first_id
+
+    # Once the page answers again the state moves on
+    hades.failing.clear()
+    _run()
+    assert CrawlState.objects.get().search_query_id != first_id
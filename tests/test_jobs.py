@@ -0,0 +1,75 @@
+import json
+from datetime import timedelta
+
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from scraper import jobs
+from scraper.jobs import JOB_STALE_AFTER, JOB_STALE_ERROR, fail_stale_jobs, tracking
+from scraper.models import SearchJob
+from scraper.services import SearchProgress
+
+
+def _job(status, age):
+    job = SearchJob.objects.create(query='bici', status=status)
+    # update() skips auto_now
+    SearchJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(seconds=age))
+    return job
+
+
+def _status(job):
+    return SearchJob.objects.get(pk=job.pk).status
+
+
+def test_jobs_left_by_a_restart_fail(db):
+    queued = _job(SearchJob.STATUS_QUEUED, JOB_STALE_AFTER + 1)
+    running = _job(SearchJob.STATUS_RUNNING, JOB_STALE_AFTER + 1)
+    assert fail_stale_jobs() == 2
+    for job in (queued, running):
+        job.refresh_from_db()
+        assert job.status == SearchJob.STATUS_FAILED
+        assert job.error == JOB_STALE_ERROR
+
+
+def test_recent_and_finished_jobs_are_left_alone(db):
+    recent = _job(SearchJob.STATUS_RUNNING, 10)
+    done = _job(SearchJob.STATUS_DONE, 10 * JOB_STALE_AFTER)
+    assert fail_stale_jobs() == 0
+    assert _status(recent) == SearchJob.STATUS_RUNNING
+    assert _status(done) == SearchJob.STATUS_DONE
+
+
+def test_jobs_alive_in_this_process_are_left_alone(db, monkeypatch):
+    monkeypatch.setattr(jobs, '_ensure_flusher', lambda: None)
+    running = _job(SearchJob.STATUS_RUNNING, JOB_STALE_AFTER + 1)
+    queued = _job(SearchJob.STATUS_QUEUED, JOB_STALE_AFTER + 1)
+    monkeypatch.setattr(jobs, '_queued', {queued.pk})
+    with tracking(running.pk, SearchProgress()):
+        assert fail_stale_jobs() == 0
+    assert fail_stale_jobs() == 1
+    assert _status(running) == SearchJob.STATUS_FAILED
+    assert _status(queued) == SearchJob.STATUS_QUEUED
+
+
+def test_progress_flush_is_a_heartbeat(db):
+    job = _job(SearchJob.STATUS_RUNNING, JOB_STALE_AFTER + 1)
+    progress = SearchProgress()
+    progress.page_done(30)
+    jobs._save_progress(job.pk, progress)
+    assert fail_stale_jobs() == 0
+    job.refresh_from_db()
+    assert job.items_count == 30
+    assert job.status == SearchJob.STATUS_RUNNING
+
+
+def test_job_views_report_a_stale_job_as_failed(db):
+    stale = _job(SearchJob.STATUS_RUNNING, JOB_STALE_AFTER + 1)
+    other = _job(SearchJob.STATUS_RUNNING, JOB_STALE_AFTER + 1)
+    data = json.loads(Client().get(reverse('search_job_status', args=[stale.pk])).content)
+    assert data['status'] == SearchJob.STATUS_FAILED
+    assert data['error'] == JOB_STALE_ERROR
+    # Only the job asked for
+    assert _status(other) == SearchJob.STATUS_RUNNING
+    assert Client().get(reverse('search_job', args=[other.pk])).status_code == 200
+    assert _status(other) == SearchJob.STATUS_FAILED
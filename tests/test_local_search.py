@@ -0,0 +1,100 @@
+import pytest
+from django.db import connection
+
+from scraper.local_search import FTS_TABLE, fts_query, search_listings
+from scraper.models import Listing
+
+
+def _listing(subito_id, title, description=''):
+    return Listing.objects.create(subito_id=subito_id, title=title, description=description,
+                                  url=f'https://www.subito.it/{subito_id}.htm')
+
+
+def _ids(text):
+    return [row['subito_id'] for row in search_listings(text)]
+
+
+def _fts_rows(match):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def test_insert_is_indexed(db):
+    listing = _listing('a', 'Bicicletta da corsa', 'telaio in carbonio')
+    assert _fts_rows('carbonio') == [listing.pk]
+    assert _ids('bici') == ['a']
+
+
+def test_update_reindexes(db):
+    listing = _listing('a', 'Bicicletta da corsa', 'telaio in carbonio')
+    listing.title = 'Divano letto'
+    listing.description = 'tessuto grigio'
+    listing.save()
+    assert _fts_rows('carbonio') == []
+    assert _ids('bicicletta') == []
+    assert _ids('divano grigio') == ['a']
+
+
+def test_price_update_keeps_the_entry(db):
+    listing = _listing('a', 'Bicicletta da corsa')
+    Listing.objects.filter(pk=listing.pk).update(price_num=50)
+    assert _ids('bicicletta') == ['a']
+
+
+def test_delete_removes_from_index(db):
+    _listing('a', 'Bicicletta da corsa')
+    _listing('b', 'Bicicletta da bambino')
+    Listing.objects.filter(subito_id='a').delete()
+    assert _ids('bicicletta') == ['b']
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('integrity-check')")
+
+
+def test_title_ranks_above_description(db):
+    _listing('desc', 'Tavolo', 'si regala lampada')
+    _listing('title', 'Lampada da terra', 'ottone')
+    assert _ids('lampada') == ['title', 'desc']
+
+
+def test_snippet_is_escaped_and_highlighted(db):
+    _listing('a', 'Schermo 27 pollici', 'monitor con <script>alert(1)</script>')
+    snippet = search_listings('monitor')[0]['snippet']
+    assert '<script>' not in snippet
+    assert '&lt;script&gt;' in snippet
+    assert '<mark>' in snippet
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('iPhone 13', '"iphone" "13"*'),
+    ('bici', '"bici"*'),
+    ('', ''),
+    ('"*:^()-', ''),
+    ('NOT bici OR', '"not" "bici" "or"*'),
+    ('title:bici', '"title" "bici"*'),
+])
+def test_fts_query_quotes_every_term(text, expected):
+    assert fts_query(text) == expected
+
+
+@pytest.mark.parametrize('text', [
+    'bici"', '"bici', 'bici*', 'bici AND', 'NOT bici', 'bici OR', 'title:bici', 'NEAR(bici corsa)',
+    '(bici', 'bici)', '^bici', '-bici', 'bici + corsa', "bici'", '{title}: bici',
+])
+def test_fts_syntax_in_user_input_is_escaped(db, text):
+    _listing('a', 'Bici da corsa', 'title not near')
+    # No OperationalError from the MATCH, and operators are plain words
+    rows = search_listings(text)
+    assert all(row['subito_id'] == 'a' for row in rows)
+
+
+def test_operators_match_as_words(db):
+    _listing('a', 'Bici da corsa')
+    _listing('b', 'Bici or not', 'near')
+    assert _ids('bici or') == ['b']
+    assert _ids('not') == ['b']
+
+
+def test_only_punctuation_finds_nothing(db):
+    _listing('a', 'Bici da corsa')
+    assert search_listings('"*()') == []
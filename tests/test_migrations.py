@@ -0,0 +1,60 @@
+from importlib import import_module
+
+import pytest
+from django.apps import apps
+
+from scraper.gazetteer import get_gazetteer, read_gazetteer
+from scraper.models import Item, SearchQuery
+from scraper.services import save_results
+from tests.factories import make_items
+
+item_coordinates = import_module('scraper.migrations.0016_item_coordinates')
+
+
+def _places():
+    rows = list(read_gazetteer())
+    towns = [(name, province) for kind, name, province, _, _ in rows if kind == 'town']
+    provinces = [name for kind, name, _, _, _ in rows if kind == 'province']
+    regions = [name for kind, name, _, _, _ in rows if kind == 'region']
+    places = [(town, province, '') for town, province in towns]
+    places += [(town.upper(), '', '') for town, _ in towns]
+    places += [('Nowhere', province, '') for province in provinces]
+    places += [('', '', region) for region in regions]
+    places += [(towns[0][0], provinces[-1], ''), ('', 'Monza Brianza', ''), ('', '', ''), (None, None, None),
+               ('Forlì', 'Forlì-Cesena', 'Emilia-Romagna'), ('Atlantide', 'Nessuna', 'Mu')]
+    return places
+
+
+def test_frozen_lookup_matches_the_gazetteer():
+    frozen = item_coordinates.read_places()
+    gazetteer = get_gazetteer()
+    for place in _places():
+        assert item_coordinates.resolve(frozen, *place) == gazetteer.resolve(*place), place
+
+
+def test_backfill_locates_items_in_batches(db, monkeypatch):
+    monkeypatch.setattr(item_coordinates, 'BATCH_SIZE', 7)
+    search = SearchQuery.objects.create(query='test')
+    save_results(search.pk, make_items(50))
+    Item.objects.update(latitude=None, longitude=None)
+
+    item_coordinates.locate_items(apps, None)
+    gazetteer = get_gazetteer()
+    for item in Item.objects.all():
+        coords = gazetteer.resolve(item.town, item.province, item.region)
+        assert (item.latitude, item.longitude) == (coords if coords else (None, None))
+    assert Item.objects.filter(latitude__isnull=False).count() > 40
+
+
+def test_backfill_without_gazetteer_file(db, monkeypatch, tmp_path):
+    monkeypatch.setattr(item_coordinates, 'GAZETTEER_PATH', tmp_path / 'missing.tsv')
+    search = SearchQuery.objects.create(query='test')
+    save_results(search.pk, make_items(5))
+    Item.objects.update(latitude=None, longitude=None)
+    item_coordinates.locate_items(apps, None)
+    assert not Item.objects.filter(latitude__isnull=False).exists()
+
+
+@pytest.mark.parametrize('name, expected', [('Forlì-Cesena', 'forli cesena'), ('Bozen', 'bolzano'), (None, '')])
+def test_frozen_normalize_place(name, expected):
+    assert item_coordinates.normalize_place(name) == expected
@@ -0,0 +1,71 @@
+import pytest
+
+from scraper.facets import apply_filters, get_facet_index
+from scraper.models import Item
+from scraper.pagination import SORTS, keyset_page
+from scraper.snapshot import load_snapshot, snapshot_page
+from scraper.views import RESULT_FIELDS, _with_listing
+
+PAGE_SIZE = 61
+
+FILTERS = (
+    {},
+    {'region': 'Lazio'},
+    {'region': '-', 'shippable': 'true'},
+    {'price': '50-100'},
+    {'price': '-'},
+    {'region': 'Nowhere'},
+)
+
+
+def _pages(search, sort, selected):
+    """Coppie di pagine (DB, snapshot) in avanti fino all'ultima, poi indietro fino alla prima."""
+    queryset = apply_filters(_with_listing(Item.objects.filter(search_query=search), RESULT_FIELDS), selected)
+    snapshot = load_snapshot(search.pk)
+    mask = get_facet_index(search.pk).mask(selected) if selected else None
+
+    def both(**cursor):
+        return (keyset_page(queryset, RESULT_FIELDS, sort, page_size=PAGE_SIZE, **cursor),
+                snapshot_page(snapshot, sort, mask, page_size=PAGE_SIZE, **cursor))
+
+    db_page, snap_page = both()
+    forward = [(db_page, snap_page)]
+    while db_page.next_cursor:
+        db_page, snap_page = both(after=db_page.next_cursor)
+        forward.append((db_page, snap_page))
+    backward = []
+    while db_page.prev_cursor:
+        db_page, snap_page = both(before=db_page.prev_cursor)
+        backward.append((db_page, snap_page))
+    return forward, backward
+
+
+@pytest.mark.parametrize('selected', FILTERS)
+@pytest.mark.parametrize('sort', sorted(SORTS))
+def test_db_and_snapshot_pages_agree(search, sort, selected):
+    forward, backward = _pages(search, sort, selected)
+    for db_page, snap_page in forward + backward:
+        assert [row['id'] for row in db_page.rows] == [row.id for row in snap_page.rows]
+        assert db_page.start == snap_page.start
+        assert db_page.next_cursor == snap_page.next_cursor
+        assert db_page.prev_cursor == snap_page.prev_cursor
+
+    ids = [row['id'] for db_page, _ in forward for row in db_page.rows]
+    assert len(ids) == len(set(ids)) == get_facet_index(search.pk).mask(selected).bit_count()
+    if backward:
+        assert backward[-1][0].start == 0
+
+
+def test_sort_order_puts_missing_values_lowest(search):
+    forward, _ = _pages(search, 'price_asc', {})
+    prices = [row['price_num'] for db_page, _ in forward for row in db_page.rows]
+    missing = prices.count(None)
+    assert missing and prices[:missing] == [None] * missing
+    assert prices[missing:] == sorted(prices[missing:])
+
+
+def test_invalid_cursor_falls_back_to_first_page(search):
+    snapshot = load_snapshot(search.pk)
+    first = snapshot_page(snapshot, 'price_desc', page_size=PAGE_SIZE)
+    bogus = snapshot_page(snapshot, 'price_desc', after='not-a-cursor', page_size=PAGE_SIZE)
+    assert [row.id for row in bogus.rows] == [row.id for row in first.rows]
@@ -0,0 +1,151 @@
+import asyncio
+from email.utils import formatdate
+
+import pytest
+
+from scraper import rate_limit
+from scraper.fetchers import HadesFetcher, HadesResponse
+from scraper.rate_limit import (RATE_DECREASE, RATE_INCREASE, RETRY_BASE_DELAY, AdaptiveRateLimiter,
+                                RetryingFetcher, is_retryable, retry_after_seconds)
+
+
+class FakeClock:
+    """time.monotonic e asyncio.sleep finti: dormire fa solo avanzare l'orologio."""
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+class ScriptedFetcher(HadesFetcher):
+    backend = 'http'
+
+    def __init__(self, clock, answers):
+        self.clock = clock
+        self.answers = list(answers)
+        self.calls = []
+
+    async def get(self, params):
+        self.calls.append(self.clock.now)
+        answer = self.answers.pop(0) if self.answers else 200
+        if isinstance(answer, Exception):
+            raise answer
+        if isinstance(answer, tuple):
+            return HadesResponse(answer[0], None, answer[1])
+        return HadesResponse(answer, {'items': []} if answer == 200 else None, {})
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit.time, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(rate_limit.asyncio, 'sleep', clock.sleep)
+    # Backoff always takes the whole window
+    monkeypatch.setattr(rate_limit.random, 'uniform', lambda a, b: b)
+    return clock
+
+
+def _acquire(limiter, clock, n):
+    """Istanti (finti) in cui partono n richieste di fila."""
+    async def run():
+        starts = []
+        for _ in range(n):
+            await limiter.acquire()
+            starts.append(clock.now)
+        return starts
+    return asyncio.run(run())
+
+
+def test_burst_then_steady_rate(clock):
+    limiter = AdaptiveRateLimiter(rate=2.0, min_rate=0.5, max_rate=10.0, burst=3)
+    starts = _acquire(limiter, clock, 7)
+    assert starts[:3] == [100.0] * 3
+    gaps = [b - a for a, b in zip(starts[2:], starts[3:])]
+    assert gaps == pytest.approx([0.5] * 4)
+
+
+def test_additive_increase_up_to_max(clock):
+    limiter = AdaptiveRateLimiter(rate=1.0, min_rate=0.5, max_rate=2.0)
+    for _ in range(3):
+        limiter.on_success()
+    assert limiter.rate == pytest.approx(1.0 + 3 * RATE_INCREASE)
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.rate == 2.0
+
+
+def test_multiplicative_decrease_down_to_min(clock):
+    limiter = AdaptiveRateLimiter(rate=8.0, min_rate=0.5, max_rate=10.0)
+    limiter.on_throttle()
+    assert limiter.rate == pytest.approx(8.0 * RATE_DECREASE)
+    for _ in range(20):
+        limiter.on_throttle()
+    assert limiter.rate == 0.5
+
+
+def test_retry_after_pauses_every_request(clock):
+    limiter = AdaptiveRateLimiter(rate=10.0, burst=4)
+    limiter.on_throttle(retry_after=7)
+    assert _acquire(limiter, clock, 1) == [107.0]
+
+
+@pytest.mark.parametrize('status, retryable', [(429, True), (500, True), (503, True), (404, False), (403, False)])
+def test_is_retryable(status, retryable):
+    assert is_retryable(status) is retryable
+
+
+def test_retry_after_seconds(monkeypatch):
+    assert retry_after_seconds({'Retry-After': '12'}) == 12.0
+    assert retry_after_seconds({'retry-after': '-3'}) == 0.0
+    assert retry_after_seconds({}) is None
+    assert retry_after_seconds({'Retry-After': 'soon'}) is None
+    monkeypatch.setattr(rate_limit.time, 'time', lambda: 1_700_000_000.0)
+    assert retry_after_seconds({'Retry-After': formatdate(1_700_000_030.0, usegmt=True)}) == pytest.approx(30.0)
+
+
+@pytest.mark.parametrize('failure', [429, 502, ConnectionError('reset')])
+def test_retries_transient_failures_and_slows_down(clock, failure):
+    limiter = AdaptiveRateLimiter(rate=4.0, burst=1)
+    inner = ScriptedFetcher(clock, [failure, failure, 200])
+    response = asyncio.run(RetryingFetcher(inner, limiter).get({}))
+    assert response.ok
+    assert len(inner.calls) == 3
+    # Two halvings, then one additive step
+    assert limiter.rate == pytest.approx(4.0 * RATE_DECREASE ** 2 + RATE_INCREASE)
+    # Jittered exponential backoff between the attempts
+    assert RETRY_BASE_DELAY in clock.sleeps and 2 * RETRY_BASE_DELAY in clock.sleeps
+
+
+def test_waits_for_retry_after(clock):
+    inner = ScriptedFetcher(clock, [(429, {'Retry-After': '20'}), 200])
+    response = asyncio.run(RetryingFetcher(inner, AdaptiveRateLimiter(rate=4.0, burst=1)).get({}))
+    assert response.ok
+    assert inner.calls[1] - inner.calls[0] >= 20
+
+
+def test_gives_up_after_max_retries(clock):
+    inner = ScriptedFetcher(clock, [503] * 10)
+    # A bucket big enough that only the backoff sleeps
+    limiter = AdaptiveRateLimiter(rate=1000.0, max_rate=1000.0, burst=100)
+    response = asyncio.run(RetryingFetcher(inner, limiter, attempts=3).get({}))
+    assert response.status == 503
+    assert len(inner.calls) == 4
+    # Doubling backoff, and none after the last attempt
+    assert clock.sleeps == [RETRY_BASE_DELAY, 2 * RETRY_BASE_DELAY, 4 * RETRY_BASE_DELAY]
+
+
+@pytest.mark.parametrize('status', [403, 404])
+def test_blocked_and_client_errors_are_not_retried(clock, status):
+    limiter = AdaptiveRateLimiter(rate=4.0)
+    inner = ScriptedFetcher(clock, [status, 200])
+    response = asyncio.run(RetryingFetcher(inner, limiter).get({}))
+    assert response.status == status
+    assert len(inner.calls) == 1
+    assert limiter.rate == 4.0
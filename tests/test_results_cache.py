@@ -0,0 +1,43 @@
+from django.test import Client
+
+from scraper.models import Item, SearchQuery
+from scraper.services import save_results
+from scraper.snapshot import store_snapshot
+from tests.factories import make_items
+
+
+def _render(search):
+    client = Client()
+    session = client.session
+    session['search_id'] = search.pk
+    session.save()
+    response = client.get('/results/')
+    assert response.status_code == 200
+    return response.content.decode()
+
+
+def _detail_links(search):
+    return [f'?id={pk}"' for pk in Item.objects.filter(search_query=search).values_list('id', flat=True)]
+
+
+def test_searches_without_snapshot_dont_share_fragments(db):
+    # Saved but never snapshotted: both are served from the DB with results version 0
+    first, second = (SearchQuery.objects.create(query=q) for q in ('uno', 'due'))
+    save_results(first.pk, make_items(20, seed=1))
+    save_results(second.pk, make_items(20, seed=2))
+
+    _render(first)
+    html = _render(second)
+    assert any(link in html for link in _detail_links(second))
+    assert not any(link in html for link in _detail_links(first))
+
+
+def test_rebuilt_snapshot_renders_fresh_rows(db):
+    search = SearchQuery.objects.create(query='tre')
+    save_results(search.pk, make_items(20, seed=3))
+    store_snapshot(search.pk)
+    assert '999 €' not in _render(search)
+
+    Item.objects.filter(search_query=search).update(price_str='999 €', price_num=999.0)
+    store_snapshot(search.pk)
+    assert '999 €' in _render(search)
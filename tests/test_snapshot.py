@@ -0,0 +1,67 @@
+import pytest
+
+from scraper import snapshot as snapshots
+from scraper.models import Item, SearchSnapshot
+from scraper.snapshot import (
+    SORT_FIELDS, Snapshot, build_snapshot, load_snapshot, results_version, store_snapshot,
+)
+
+
+def test_bytes_round_trip(search):
+    built = build_snapshot(search.pk)
+    data, heavy = built.to_bytes()
+    loaded = Snapshot.from_bytes(data, lambda: heavy)
+
+    assert len(loaded) == len(built) == Item.objects.filter(search_query=search).count()
+    assert loaded.rows(range(len(loaded))) == built.rows(range(len(built)))
+    for name in SORT_FIELDS:
+        assert list(loaded.order(name)) == list(built.argsort(name))
+
+
+def test_rows_match_the_db(search):
+    loaded = load_snapshot(search.pk)
+    items = Item.objects.filter(search_query=search).order_by('id')
+    expected = list(items.values('id', 'price_num', 'date_pub_iso', 'shippable', 'region', 'latitude'))
+    fields = ('id', 'price_num', 'date_pub_iso', 'shippable', 'region', 'latitude')
+    got = loaded.rows(range(len(loaded)), fields)
+    for row, db_row in zip(got, expected):
+        db_row['region'] = db_row['region'] or ''
+        assert {**row, 'region': row['region'] or ''} == db_row
+
+
+def test_heavy_columns_load_on_demand(search):
+    loaded = load_snapshot(search.pk)
+    assert 'description' not in loaded.columns
+    item = Item.objects.filter(search_query=search).select_related('listing').order_by('?').first()
+    row = loaded.find(item.pk)
+    assert loaded.details(row) == {'url': item.listing.url, 'image_url': item.listing.image_url,
+                                   'description': item.listing.description}
+    assert loaded.find(-1) is None
+
+
+def test_other_format_versions_are_rejected(search, monkeypatch):
+    monkeypatch.setattr(snapshots, 'SNAPSHOT_VERSION', snapshots.SNAPSHOT_VERSION - 1)
+    data, _ = build_snapshot(search.pk).to_bytes()
+    monkeypatch.undo()
+    with pytest.raises(ValueError):
+        Snapshot.from_bytes(data)
+
+    # load_snapshot rebuilds it from the Items
+    SearchSnapshot.objects.filter(search_query=search).update(data=data)
+    snapshots._loaded.clear()
+    assert len(load_snapshot(search.pk)) == Item.objects.filter(search_query=search).count()
+
+
+def test_a_rebuild_elsewhere_invalidates_the_loaded_copy(search):
+    first = load_snapshot(search.pk)
+    assert load_snapshot(search.pk) is first
+    version = results_version(search.pk)
+
+    # Another process rebuilt it: only the shared version tells
+    SearchSnapshot.objects.filter(search_query=search).update(version=version + 1)
+    assert load_snapshot(search.pk) is not first
+    assert results_version(search.pk) == version + 1
+
+    store_snapshot(search.pk)
+    assert results_version(search.pk) not in (version, version + 1)
+
@@ -0,0 +1,88 @@
+import math
+import random
+from array import array
+
+import pytest
+from django.test import Client
+
+from scraper import spatial
+from scraper.gazetteer import get_gazetteer
+from scraper.snapshot import DISTANCE_SORT, load_snapshot, snapshot_page
+from scraper.spatial import MAX_RADIUS_KM, GridIndex, haversine_km, parse_radius
+
+BOLOGNA = (44.4949, 11.3426)
+
+
+def _points(n=3000, seed=7):
+    rnd = random.Random(seed)
+    lats = array('d', (rnd.uniform(37.0, 46.5) for _ in range(n)))
+    lons = array('d', (rnd.uniform(7.0, 18.5) for _ in range(n)))
+    lats[0] = lons[0] = math.nan  # an ad without a place
+    return lats, lons
+
+
+def _brute_force(lats, lons, lat, lon, radius):
+    found = {}
+    for i, (lat2, lon2) in enumerate(zip(lats, lons)):
+        if math.isnan(lat2):
+            continue
+        d = haversine_km(lat, lon, [lat2], [lon2])[0]
+        if radius is None or d <= radius:
+            found[i] = d
+    return found
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('30', 30.0), ('0', 0.0), ('12.5', 12.5), (str(MAX_RADIUS_KM + 1), MAX_RADIUS_KM), ('200000', MAX_RADIUS_KM),
+    ('nan', None), ('inf', None), ('-inf', None), ('-1', None), ('abc', None), ('', None), (None, None),
+])
+def test_parse_radius(value, expected):
+    assert parse_radius(value) == expected
+
+
+@pytest.mark.parametrize('radius', [0, 10, 30, 200, None])
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_grid_index_matches_brute_force(radius, use_numpy, monkeypatch):
+    if not use_numpy:
+        monkeypatch.setattr(spatial, 'numpy', None)
+    elif spatial.numpy is None:
+        pytest.skip("numpy not installed")
+    lats, lons = _points()
+    found = GridIndex(lats, lons).distances(*BOLOGNA, radius)
+    expected = _brute_force(lats, lons, *BOLOGNA, radius)
+    assert set(found) == set(expected)
+    assert all(found[i] == pytest.approx(expected[i]) for i in found)
+
+
+def test_distance_sort_pages_nearest_first(search):
+    snapshot = load_snapshot(search.pk)
+    distances = snapshot.spatial_index().distances(*BOLOGNA)
+    seen, after = [], None
+    while True:
+        page = snapshot_page(snapshot, DISTANCE_SORT, after=after, distances=distances, page_size=53)
+        seen += [row.id for row in page.rows]
+        if not page.next_cursor:
+            break
+        after = page.next_cursor
+    ids = snapshot.columns['id']
+    located = sorted(distances, key=lambda i: (distances[i], i))
+    assert seen[:len(located)] == [ids[i] for i in located]
+    assert sorted(seen) == list(ids)
+
+
+@pytest.mark.parametrize('km', ['nan', 'inf', '-1', '200000', '30', ''])
+def test_results_view_survives_any_radius(search, km):
+    client = Client()
+    session = client.session
+    session['search_id'] = search.pk
+    session.save()
+    response = client.get('/results/', {'near': 'Bologna', 'km': km})
+    assert response.status_code == 200
+
+    # Without a usable radius every ad is shown, sorted by distance on request
+    radius = parse_radius(km)
+    snapshot = load_snapshot(search.pk)
+    expected = len(snapshot)
+    if radius is not None:
+        expected = len(snapshot.spatial_index().distances(*get_gazetteer().find('Bologna'), radius))
+    assert response.context['search'].total_results == expected